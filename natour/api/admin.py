@@ -3,7 +3,8 @@ Module for Django admin registration of models.
 """
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Role, CustomUser, Point, PointReview, Terms, Photo
+from .models import (Role, CustomUser, Point, PointReview, Terms, Photo, OutboundEmail,
+                     MailingJob, PendingAssetDeletion)
 
 # Basic registration
 admin.site.register(Role)
@@ -12,6 +13,9 @@ admin.site.register(Point)
 admin.site.register(PointReview)
 admin.site.register(Terms)
 admin.site.register(Photo)
+admin.site.register(OutboundEmail)
+admin.site.register(MailingJob)
+admin.site.register(PendingAssetDeletion)
 
 
 class PointInline(admin.TabularInline):
@@ -10,3 +10,6 @@ class ApiConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'natour.api'
+
+    def ready(self):
+        from natour.api import signals  # pylint: disable=import-outside-toplevel,unused-import
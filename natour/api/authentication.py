@@ -0,0 +1,178 @@
+"""
+Authentication classes for the Natour API.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Short, so role renames and other changes without invalidation settle quickly.
+AUTH_USER_TIMEOUT = 60
+
+# Fields of the user kept in the cache; the others are loaded on access.
+AUTH_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'role_id')
+
+# Claims ClaimsJWTAuthentication needs to skip the database.
+AUTHORIZATION_CLAIMS = ('role', 'is_staff')
+
+# A revocation must outlive every token issued before it, refresh tokens
+# included: access tokens minted from a refresh token keep its iat and claims.
+REVOCATION_TIMEOUT = int(max(
+    api_settings.ACCESS_TOKEN_LIFETIME,
+    api_settings.REFRESH_TOKEN_LIFETIME,
+    *getattr(settings, 'REMEMBER_ME_JWT', {}).values(),
+).total_seconds())
+
+
+def _auth_user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def _revocation_key(user_id):
+    return f'revoked_tokens:{user_id}'
+
+
+def _cached_fields(user):
+    """
+    Returns what the cache keeps of an authenticated user: never its password
+    hash, only the digest the revoke token claim is compared with.
+    """
+    fields = {name: getattr(user, name) for name in AUTH_USER_FIELDS}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        fields['password_digest'] = get_md5_hash_password(user.password)
+    return fields
+
+
+def _user_from_fields(model, fields):
+    """
+    Builds a user from its cached fields, with the other fields deferred, so
+    they are loaded only if a view reads them and saves only write the loaded
+    ones.
+    """
+    concrete = [field.attname for field in model._meta.concrete_fields  # pylint: disable=protected-access
+                if field.attname in fields]
+    return model.from_db('default', concrete, [fields[name] for name in concrete])
+
+
+def forget_authenticated_user(user_id):
+    """
+    Drops the cached user of the authentication once the current transaction
+    commits, so the next request loads it again.
+    """
+    transaction.on_commit(lambda: cache.delete(_auth_user_key(user_id)))
+
+
+def revoke_user_tokens(user_id):
+    """
+    Rejects, in ClaimsJWTAuthentication, every token of a user issued until
+    now. Used when the user is deactivated, deleted or changes role, since the
+    claims of those tokens no longer hold.
+    """
+    revoked_at = int(time.time())
+    transaction.on_commit(
+        lambda: cache.set(_revocation_key(user_id), revoked_at, timeout=REVOCATION_TIMEOUT))
+
+
+class ClaimsUser(TokenUser):
+    """
+    User built from the verified claims of a token, with the role name.
+    """
+
+    @property
+    def role(self):
+        """
+        Name of the role of the user.
+        """
+        return self.token.get('role')
+
+    @property
+    def email(self):
+        """
+        E-mail of the user.
+        """
+        return self.token.get('email', '')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication serving the user from the cache instead of loading it
+    from the database on every request. Only AUTH_USER_FIELDS are cached.
+
+    The cached entry is dropped whenever the user is saved or deleted (status
+    changes, profile and password updates, deletions), and expires after
+    AUTH_USER_TIMEOUT anyway.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = _auth_user_key(user_id)
+        fields = cache.get(key)
+        if fields is None:
+            user = (self.user_model.objects
+                    .filter(**{api_settings.USER_ID_FIELD: user_id})
+                    .first())
+            if user is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            fields = _cached_fields(user)
+            cache.set(key, fields, timeout=AUTH_USER_TIMEOUT)
+        else:
+            user = _user_from_fields(self.user_model, fields)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != fields['password_digest']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    Opt-in JWT authentication that trusts the role and is_staff claims of the
+    token and builds a ClaimsUser without touching the database, for
+    read-only endpoints.
+
+    Tokens issued before a revocation of their user are rejected. Tokens
+    without the authorization claims fall back to CachedJWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in AUTHORIZATION_CLAIMS):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        revoked_at = cache.get(_revocation_key(user_id))
+        if revoked_at is not None and validated_token.get('iat', 0) <= revoked_at:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsUser(validated_token)
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """
+    Documents the JWT authentication classes of the API as the jwtAuth scheme.
+    """
+    target_class = 'natour.api.authentication.CachedJWTAuthentication'
+    match_subclasses = True
@@ -0,0 +1,30 @@
+"""
+Authentication backends for the Natour API.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from natour.api.utils.password_pool import verify_password, spend_hashing_time
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend checking passwords in the bounded hashing pool, used by the
+    token obtain view and the admin login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)  # pylint: disable=protected-access
+        except UserModel.DoesNotExist:
+            spend_hashing_time(password)
+            return None
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,41 @@
+"""
+Management command to delete the stored images no photo refers to.
+"""
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.photo_gc import LISTING_PAGE_SIZE, collect_orphan_photos
+
+
+class Command(BaseCommand):
+    """
+    Deletes the images left in the photo storage by deleted or replaced photos.
+    """
+    help = ("Deletes the stored images of deleted photos and, with --delete-orphans, "
+            "any stored image no photo refers to.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=LISTING_PAGE_SIZE,
+            help="Images listed from the storage per page."
+        )
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help="Also sweep the storage listing for images no photo refers to."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only count what would be deleted."
+        )
+
+    def handle(self, *args, **options):
+        stats = collect_orphan_photos(options['page_size'], options['dry_run'],
+                                      options['delete_orphans'])
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(
+            f"{prefix}Recorded deletions: {stats.pending_deleted} deleted, "
+            f"{stats.pending_failed} failed.")
+        if not options['delete_orphans']:
+            return
+        self.stdout.write(
+            f"{prefix}Storage listing: {stats.listed} images, {stats.orphans} orphans, "
+            f"{stats.orphans_deleted} deleted, {stats.orphans_failed} failed.")
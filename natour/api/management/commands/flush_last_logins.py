@@ -0,0 +1,30 @@
+"""
+Management command to flush the buffered login timestamps to the database.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.last_login import flush_last_logins
+
+
+class Command(BaseCommand):
+    """
+    Flushes the login timestamps buffered in Redis to CustomUser.last_login.
+    """
+    help = "Flushes the login timestamps buffered in Redis to the users table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running, flushing every N seconds (default: flush once and exit)."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            users = flush_last_logins()
+            self.stdout.write(f"Last login of {users} users flushed.")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,30 @@
+"""
+Management command to flush the buffered point views to the database.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.view_counter import flush_views
+
+
+class Command(BaseCommand):
+    """
+    Flushes the point views buffered in Redis to Point.views.
+    """
+    help = "Flushes the point views buffered in Redis to the points table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running, flushing every N seconds (default: flush once and exit)."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            points, views = flush_views()
+            self.stdout.write(f"{views} views flushed to {points} points.")
+            if not interval:
+                break
+            time.sleep(interval)
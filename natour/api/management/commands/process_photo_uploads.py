@@ -0,0 +1,40 @@
+"""
+Management command to upload the staged photo images.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.photo_uploads import UPLOAD_BATCH_SIZE, process_pending_uploads
+
+
+class Command(BaseCommand):
+    """
+    Uploads the images staged by the photo views to the photo storage.
+    """
+    help = "Uploads the staged photo images and deletes the images they replace."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running, uploading every N seconds (default: upload once and exit)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=UPLOAD_BATCH_SIZE,
+            help="Photos uploaded per batch."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            total_uploaded = total_failed = 0
+            while True:
+                uploaded, failed = process_pending_uploads(options['batch_size'])
+                total_uploaded += uploaded
+                total_failed += failed
+                if uploaded + failed < options['batch_size']:
+                    break
+            self.stdout.write(f"{total_uploaded} photos uploaded, {total_failed} failed.")
+            if not interval:
+                break
+            time.sleep(interval)
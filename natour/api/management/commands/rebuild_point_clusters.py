@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the precomputed map clusters.
+"""
+# pylint: disable=no-member
+from django.core.management.base import BaseCommand
+
+from natour.api.models import Point
+from natour.api.methods.point_clusters import rebuild_clusters
+from natour.api.utils.response_cache import bump_generation, MAP_NAMESPACE
+
+
+class Command(BaseCommand):
+    """
+    Recomputes every map cluster from the points table.
+    """
+    help = "Rebuilds the map clusters of every zoom level from the points table."
+
+    def handle(self, *args, **options):
+        created = rebuild_clusters(Point.objects.all())
+        bump_generation(MAP_NAMESPACE)
+        self.stdout.write(self.style.SUCCESS(f"{created} clusters rebuilt."))
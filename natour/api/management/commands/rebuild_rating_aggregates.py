@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the rating aggregates of every point.
+"""
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Recomputes rating sums, counts, averages and histograms from the reviews.
+    """
+    help = "Rebuilds the rating aggregates of every point from the reviews table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Amount of points updated per query."
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rating aggregates rebuilt for {updated} points."))
@@ -0,0 +1,17 @@
+"""
+Management command to reconcile the points_count of every user.
+"""
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.points_count import reconcile_points_count
+
+
+class Command(BaseCommand):
+    """
+    Recomputes CustomUser.points_count where it drifted from the points table.
+    """
+    help = "Fixes the points_count of users that drifted from the points table."
+
+    def handle(self, *args, **options):
+        corrected = reconcile_points_count()
+        self.stdout.write(self.style.SUCCESS(f"points_count corrected for {corrected} users."))
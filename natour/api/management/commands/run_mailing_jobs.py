@@ -0,0 +1,40 @@
+"""
+Management command to send the pending mass mailings.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.mailing import MAILING_CHUNK_SIZE, run_pending_mailings
+
+
+class Command(BaseCommand):
+    """
+    Sends the pending mass mailings, resuming interrupted ones.
+    """
+    help = "Sends the pending mass mailings, resuming the interrupted ones from their checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running, checking for mailings every N seconds (default: run once and exit)."
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=MAILING_CHUNK_SIZE,
+            help="Users loaded and emails sent per chunk."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.perf_counter()
+            sent = run_pending_mailings(options['chunk_size'])
+            if sent:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{sent} mailing emails sent in {elapsed:.1f}s ({sent / elapsed:.1f}/s).")
+            else:
+                self.stdout.write("No mailing emails sent.")
+            if not interval:
+                break
+            time.sleep(interval)
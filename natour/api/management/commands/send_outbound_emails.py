@@ -0,0 +1,40 @@
+"""
+Management command to deliver the emails of the outbox.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from natour.api.methods.email_outbox import DELIVERY_BATCH_SIZE, deliver_due_emails
+
+
+class Command(BaseCommand):
+    """
+    Delivers the due emails stored in the outbox by the views.
+    """
+    help = "Delivers the due emails of the outbox, retrying the failed ones with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running, delivering every N seconds (default: deliver once and exit)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DELIVERY_BATCH_SIZE,
+            help="Emails sent per batch."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = deliver_due_emails(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            self.stdout.write(f"{total_sent} emails sent, {total_failed} failed.")
+            if not interval:
+                break
+            time.sleep(interval)
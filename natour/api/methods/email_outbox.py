@@ -0,0 +1,158 @@
+"""
+Module for sending emails through a durable outbox instead of inside requests.
+
+Views store the email with enqueue_email(), in their own transaction, and
+return at once; the send_outbound_emails command delivers the due emails,
+retrying failures with exponential backoff and dead-lettering them after
+MAX_ATTEMPTS.
+
+Workers claim emails by marking them as sending for SEND_LEASE, then send
+them outside of any transaction. Emails of a worker that died meanwhile are
+claimed again once their lease expires, so an email may be sent twice but is
+never lost.
+"""
+# pylint: disable=no-member
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from natour.api.models import EmailStatus, OutboundEmail
+from natour.api.utils.metrics import OUTBOUND_EMAILS
+
+logger = logging.getLogger("django")
+
+DEFAULT_SENDER = "natourproject@gmail.com"
+DELIVERY_BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 6 * 60 * 60
+# How long a claimed email is left to its worker.
+SEND_LEASE = timedelta(minutes=5)
+
+
+def enqueue_email(subject, body, to, html_content=None, from_email=DEFAULT_SENDER):
+    """
+    Stores an email in the outbox. Called inside a transaction, the email is
+    only sent if that transaction commits.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_content or '',
+        from_email=from_email,
+        to=list(to),
+    )
+
+
+def retry_delay(attempts):
+    """
+    Returns how long to wait before the next attempt after the given amount of
+    failed attempts.
+    """
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def _record_success(email):
+    # The contents may carry codes and passwords, so they are not kept.
+    email.status = EmailStatus.SENT
+    email.sent_at = timezone.now()
+    email.body = ''
+    email.html_body = ''
+    email.last_error = ''
+    email.save(update_fields=['status', 'sent_at', 'body', 'html_body', 'last_error'])
+    OUTBOUND_EMAILS.labels(result='sent').inc()
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = EmailStatus.DEAD
+        email.body = ''
+        email.html_body = ''
+        logger.error(
+            "Outbound email ID %s to %s dead-lettered after %s attempts. Error: %s",
+            email.id, email.to, email.attempts, str(error)
+        )
+        OUTBOUND_EMAILS.labels(result='dead').inc()
+    else:
+        email.status = EmailStatus.PENDING
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        logger.warning(
+            "Outbound email ID %s to %s failed (attempt %s), retrying at %s. Error: %s",
+            email.id, email.to, email.attempts, email.next_attempt_at, str(error)
+        )
+        OUTBOUND_EMAILS.labels(result='retry').inc()
+    # The contents of dead emails are not kept either.
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at',
+                              'body', 'html_body'])
+
+
+def claim_due_emails(batch_size=DELIVERY_BATCH_SIZE):
+    """
+    Marks up to batch_size due emails (or emails whose lease expired) as being
+    sent by this worker and returns them. Rows locked by other workers are
+    skipped, so several workers may run at once.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[EmailStatus.PENDING, EmailStatus.SENDING],
+                    next_attempt_at__lte=now)
+            [:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            status=EmailStatus.SENDING, next_attempt_at=now + SEND_LEASE)
+    return emails
+
+
+def deliver_due_emails(batch_size=DELIVERY_BATCH_SIZE):
+    """
+    Sends up to batch_size due emails of the outbox over one connection.
+
+    Returns (sent, failed).
+    """
+    emails = claim_due_emails(batch_size)
+    if not emails:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:  # pylint: disable=broad-except
+        for email in emails:
+            _record_failure(email, e)
+        return 0, len(emails)
+
+    sent = 0
+    try:
+        for email in emails:
+            try:
+                _build_message(email, connection).send()
+            except Exception as e:  # pylint: disable=broad-except
+                _record_failure(email, e)
+            else:
+                _record_success(email)
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, len(emails) - sent
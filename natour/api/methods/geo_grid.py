@@ -0,0 +1,118 @@
+"""
+Module for mapping coordinates to cells of a fixed latitude/longitude grid.
+
+Each point is stored with the ids of the cells containing it in a fine and a
+coarse grid, so a bounding box can be translated into a few contiguous ranges
+of cell ids and resolved through an index instead of scanning the whole
+points table. Tall boxes use the coarse grid to keep the ranges few.
+"""
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+CELL_DEGREES = 0.1
+# The coarse grid has MAX_BBOX_ROWS rows, so any box fits in it.
+COARSE_CELL_DEGREES = 3.0
+
+# Above this amount of fine grid rows a bounding box is resolved with the
+# coarse grid, since the OR of row ranges stops paying off.
+MAX_BBOX_ROWS = 60
+
+# Points returned for a bounding box; zoomed out maps should use the clusters.
+MAX_BBOX_POINTS = 500
+
+
+def _row(latitude, degrees):
+    """
+    Returns the grid row for a latitude, clamped to the valid range.
+    """
+    row = math.floor((latitude + 90) / degrees)
+    return min(max(row, 0), int(180 / degrees) - 1)
+
+
+def _column(longitude, degrees):
+    """
+    Returns the grid column for a longitude, clamped to the valid range.
+    """
+    column = math.floor((longitude + 180) / degrees)
+    return min(max(column, 0), int(360 / degrees) - 1)
+
+
+def cell_for(latitude, longitude, degrees=CELL_DEGREES):
+    """
+    Returns the id of the grid cell containing the coordinate, or None when
+    the coordinate is incomplete.
+    """
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude, degrees) * int(360 / degrees) + _column(longitude, degrees)
+
+
+def coarse_cell_for(latitude, longitude):
+    """
+    Returns the id of the coarse grid cell containing the coordinate.
+    """
+    return cell_for(latitude, longitude, COARSE_CELL_DEGREES)
+
+
+def cell_ranges(min_lat, min_lng, max_lat, max_lng, degrees=CELL_DEGREES):
+    """
+    Returns the list of (first_cell, last_cell) ranges covering a bounding box,
+    one per grid row, or None when the box spans more than MAX_BBOX_ROWS rows.
+    """
+    first_row, last_row = _row(min_lat, degrees), _row(max_lat, degrees)
+    if last_row - first_row + 1 > MAX_BBOX_ROWS:
+        return None
+
+    columns = int(360 / degrees)
+    first_column, last_column = _column(min_lng, degrees), _column(max_lng, degrees)
+    return [
+        (row * columns + first_column, row * columns + last_column)
+        for row in range(first_row, last_row + 1)
+    ]
+
+
+def parse_bbox(params):
+    """
+    Parses 'min_lat', 'min_lng', 'max_lat' and 'max_lng' from query params.
+
+    Returns a (min_lat, min_lng, max_lat, max_lng) tuple.
+    Raises ValueError with a user facing message when the box is invalid.
+    """
+    names = ('min_lat', 'min_lng', 'max_lat', 'max_lng')
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(params[name]) for name in names)
+    except KeyError as e:
+        raise ValueError(
+            "Parâmetros 'min_lat', 'min_lng', 'max_lat' e 'max_lng' são obrigatórios.") from e
+    except (TypeError, ValueError) as e:
+        raise ValueError("Coordenadas devem ser números válidos.") from e
+
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError("Latitudes inválidas para a área informada.")
+    if not (-180 <= min_lng <= max_lng <= 180):
+        raise ValueError("Longitudes inválidas para a área informada.")
+
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """
+    Restricts a Point queryset to the bounding box, using the grid cell ranges
+    to hit the index and the exact coordinates to trim the cell borders.
+    """
+    ranges = cell_ranges(min_lat, min_lng, max_lat, max_lng)
+    if ranges is not None:
+        queryset = queryset.filter(
+            reduce(or_, (Q(geo_cell__range=cells) for cells in ranges)))
+    else:
+        ranges = cell_ranges(min_lat, min_lng, max_lat, max_lng, COARSE_CELL_DEGREES)
+        queryset = queryset.filter(
+            reduce(or_, (Q(geo_coarse_cell__range=cells) for cells in ranges)))
+
+    return queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    )
@@ -0,0 +1,65 @@
+"""
+Module for recording logins without writing the users table per login.
+
+Login timestamps are kept in a Redis hash (one field per user, the latest
+login wins) and periodically flushed to CustomUser.last_login in batched
+UPDATEs (see the flush_last_logins command).
+"""
+# pylint: disable=no-member
+import logging
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from natour.api.models import CustomUser
+from natour.api.utils.redis_buffers import drain, get_redis
+
+logger = logging.getLogger("django")
+
+PENDING_LOGINS_KEY = "last_login:pending"
+FLUSH_BATCH_SIZE = 500
+
+
+def record_login(user):
+    """
+    Sets the last login of a user to now. Falls back to a direct UPDATE when
+    Redis is unavailable, so logins are never dropped.
+    """
+    now = timezone.now()
+    user.last_login = now
+    try:
+        get_redis().hset(PENDING_LOGINS_KEY, user.pk, now.isoformat())
+    except RedisError as e:
+        logger.warning(
+            "Login buffer unavailable, writing last login of user ID %s directly. Error: %s",
+            user.pk, str(e)
+        )
+        CustomUser.objects.filter(pk=user.pk).update(last_login=now)
+
+
+def flush_last_logins():
+    """
+    Writes the buffered login timestamps to CustomUser.last_login.
+
+    Returns the amount of users updated.
+    """
+    with drain(PENDING_LOGINS_KEY) as entries:
+        logins = [(int(user_id), datetime.fromisoformat(moment))
+                  for user_id, moment in entries.items()]
+        if not logins:
+            return 0
+
+        with transaction.atomic():
+            for start in range(0, len(logins), FLUSH_BATCH_SIZE):
+                batch = logins[start:start + FLUSH_BATCH_SIZE]
+                CustomUser.objects.filter(id__in=[user_id for user_id, _moment in batch]).update(
+                    last_login=Case(
+                        *(When(id=user_id, then=Value(moment)) for user_id, moment in batch),
+                        output_field=DateTimeField(),
+                    )
+                )
+
+    return len(logins)
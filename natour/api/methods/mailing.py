@@ -0,0 +1,160 @@
+"""
+Module for mass mailings to every active user.
+
+A mailing is stored as a MailingJob and sent by the run_mailing_jobs command:
+users are streamed in id order, one chunk at a time, through a single mail
+connection, and the job records the last user sent after each chunk. An
+interrupted or failed job resumes from there on the next run, so at most the
+chunk in flight is sent twice.
+
+Only connection-level errors stop a job. An email the server refuses (e.g. a
+bad address) is moved to the outbox, which retries and dead-letters it on its
+own, and the mailing goes on with the next user.
+"""
+# pylint: disable=no-member
+import logging
+import smtplib
+import time
+from itertools import islice
+
+from anymail.exceptions import (AnymailAPIError, AnymailInvalidAddress,
+                                AnymailRecipientsRefused)
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.utils import timezone
+from redis.exceptions import LockError
+
+from natour.api.models import CustomUser, MailingJob, MailingKind, MailingStatus
+from natour.api.methods.email_outbox import enqueue_email
+from natour.api.methods.send_terms_email import build_updated_terms_emails
+from natour.api.utils.metrics import (MAILING_CHUNK_SECONDS, MAILING_EMAILS, MAILING_FAILURES,
+                                      MAILING_REFUSED)
+
+logger = logging.getLogger("django")
+
+MAILING_CHUNK_SIZE = 200
+MAX_ATTEMPTS = 5
+# Renewed after every chunk, so only a dead worker lets the job go.
+JOB_LOCK_TIMEOUT = 300
+
+# Errors of a single email the server (SMTP, or the Brevo API through anymail)
+# refuses; anything else is taken for a connection-level error.
+REFUSED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                  AnymailRecipientsRefused, AnymailInvalidAddress, AnymailAPIError)
+# Statuses of an API error that only concern the email sent.
+REFUSED_API_STATUSES = {400, 422}
+
+MAILING_BUILDERS = {
+    MailingKind.UPDATED_TERMS: build_updated_terms_emails,
+}
+
+
+def start_mailing(kind):
+    """
+    Creates a mailing job. Called inside a transaction, the mailing only
+    starts if that transaction commits.
+    """
+    return MailingJob.objects.create(kind=kind)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _is_refused(error):
+    if isinstance(error, AnymailAPIError):
+        return error.status_code in REFUSED_API_STATUSES
+    return isinstance(error, REFUSED_ERRORS)
+
+
+def _send_chunk(job, messages):
+    """
+    Sends the emails of a chunk one by one, moving the ones the server refuses
+    to the outbox. Other errors (connection, authentication) are raised.
+    """
+    for msg in messages:
+        try:
+            msg.send()
+        except REFUSED_ERRORS as e:
+            if not _is_refused(e):
+                raise
+            MAILING_REFUSED.labels(kind=job.kind).inc()
+            logger.warning(
+                "Mailing job ID %s (%s) email to %s refused, moved to the outbox. Error: %s",
+                job.id, job.kind, msg.to, str(e)
+            )
+            html = next((content for content, mimetype in msg.alternatives
+                         if mimetype == 'text/html'), None)
+            enqueue_email(msg.subject, msg.body, msg.to, html_content=html,
+                          from_email=msg.from_email)
+
+
+def run_mailing_job(job, chunk_size=MAILING_CHUNK_SIZE):
+    """
+    Sends the rest of a mailing job, unless another worker is running it.
+
+    Returns the amount of emails sent.
+    """
+    lock = cache.lock(f'mailing_job:{job.id}:lock', timeout=JOB_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+
+    build_emails = MAILING_BUILDERS[job.kind]
+    sent = 0
+    try:
+        job.refresh_from_db()
+        if job.status != MailingStatus.PENDING:
+            return 0
+
+        users = (CustomUser.objects
+                 .filter(is_active=True, id__gt=job.last_user_id)
+                 .order_by('id')
+                 .only('id', 'username', 'email')
+                 .iterator(chunk_size=chunk_size))
+        with get_connection() as connection:
+            for chunk in _chunks(users, chunk_size):
+                started = time.perf_counter()
+                _send_chunk(job, build_emails(chunk, connection))
+                MAILING_CHUNK_SECONDS.labels(kind=job.kind).observe(
+                    time.perf_counter() - started)
+                MAILING_EMAILS.labels(kind=job.kind).inc(len(chunk))
+
+                sent += len(chunk)
+                job.last_user_id = chunk[-1].id
+                job.sent += len(chunk)
+                job.save(update_fields=['last_user_id', 'sent', 'updated_at'])
+                lock.extend(JOB_LOCK_TIMEOUT, replace_ttl=True)
+
+        job.status = MailingStatus.DONE
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+        logger.info("Mailing job ID %s (%s) done, %s emails sent.", job.id, job.kind, job.sent)
+    except Exception as e:  # pylint: disable=broad-except
+        MAILING_FAILURES.labels(kind=job.kind).inc()
+        job.attempts += 1
+        job.last_error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = MailingStatus.FAILED
+        job.save(update_fields=['attempts', 'last_error', 'status', 'updated_at'])
+        logger.error(
+            "Mailing job ID %s (%s) stopped after user ID %s (attempt %s). Error: %s",
+            job.id, job.kind, job.last_user_id, job.attempts, str(e)
+        )
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass
+    return sent
+
+
+def run_pending_mailings(chunk_size=MAILING_CHUNK_SIZE):
+    """
+    Runs every pending mailing job, oldest first.
+
+    Returns the amount of emails sent.
+    """
+    return sum(run_mailing_job(job, chunk_size)
+               for job in MailingJob.objects.filter(status=MailingStatus.PENDING))
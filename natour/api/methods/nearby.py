@@ -0,0 +1,124 @@
+"""
+Module for finding the points closest to a coordinate.
+
+Candidates are prefiltered through the grid cell index around the origin and
+then ranked in a single vectorized haversine pass with NumPy.
+"""
+import math
+
+import numpy as np
+from django.utils import timezone
+
+from natour.api.methods.geo_grid import filter_bbox
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 200.0
+MAX_NEAREST = 50
+
+# Initial search radius of the k-nearest mode, doubled until enough
+# candidates are found or MAX_RADIUS_KM is reached.
+INITIAL_NEAREST_RADIUS_KM = 5.0
+
+WEEK_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Returns the great-circle distances, in kilometers, from one coordinate to
+    arrays of coordinates.
+    """
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lat2, lng2 = np.radians(latitudes), np.radians(longitudes)
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _bbox_around(latitude, longitude, radius_km):
+    """
+    Returns the (min_lat, min_lng, max_lat, max_lng) box enclosing a circle.
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+
+    return (max(latitude - lat_delta, -90.0), max(longitude - lng_delta, -180.0),
+            min(latitude + lat_delta, 90.0), min(longitude + lng_delta, 180.0))
+
+
+def is_open(week_start, week_end, open_time, close_time, moment):
+    """
+    Checks if a point with the given opening days and hours is open at a
+    moment. Day and hour intervals may wrap around (e.g. friday to monday,
+    22:00 to 02:00).
+    """
+    day = moment.weekday()
+    first_day, last_day = WEEK_DAYS.index(week_start), WEEK_DAYS.index(week_end)
+    if first_day <= last_day:
+        open_day = first_day <= day <= last_day
+    else:
+        open_day = day >= first_day or day <= last_day
+
+    now = moment.time()
+    if open_time <= close_time:
+        open_hour = open_time <= now <= close_time
+    else:
+        open_hour = now >= open_time or now <= close_time
+
+    return open_day and open_hour
+
+
+def _candidates(queryset, latitude, longitude, radius_km, open_now):
+    """
+    Returns the ids and distances of the points of the queryset inside the
+    radius, as two NumPy arrays.
+    """
+    fields = ['id', 'latitude', 'longitude']
+    if open_now:
+        fields += ['week_start', 'week_end', 'open_time', 'close_time']
+
+    rows = list(filter_bbox(queryset, *_bbox_around(latitude, longitude, radius_km))
+                .values_list(*fields))
+
+    if open_now:
+        moment = timezone.localtime()
+        rows = [row for row in rows if is_open(*row[3:], moment)]
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    coordinates = np.array([row[1:3] for row in rows], dtype=np.float64)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    distances = haversine_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+
+    inside = distances <= radius_km
+    return ids[inside], distances[inside]
+
+
+def find_nearby(queryset, latitude, longitude, radius_km=None, k=None, open_now=False):
+    """
+    Finds the points of a queryset closest to a coordinate.
+
+    With radius_km, every point within the radius is returned; with k, the k
+    nearest points (up to MAX_RADIUS_KM away); with both, the k nearest inside
+    the radius.
+
+    Returns a list of (point_id, distance_km) ordered by distance.
+    """
+    if radius_km is not None:
+        ids, distances = _candidates(queryset, latitude, longitude, radius_km, open_now)
+    else:
+        radius = INITIAL_NEAREST_RADIUS_KM
+        while True:
+            ids, distances = _candidates(queryset, latitude, longitude, radius, open_now)
+            if len(ids) >= k or radius >= MAX_RADIUS_KM:
+                break
+            radius = min(radius * 2, MAX_RADIUS_KM)
+
+    if k is not None and len(ids) > k:
+        nearest = np.argpartition(distances, k - 1)[:k]
+        ids, distances = ids[nearest], distances[nearest]
+
+    order = np.argsort(distances, kind='stable')
+    return [(int(ids[i]), float(distances[i])) for i in order]
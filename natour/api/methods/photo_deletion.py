@@ -0,0 +1,59 @@
+"""
+Module for deleting photos in bulk.
+
+The stored images are deleted concurrently (see PhotoStorage.destroy_many);
+then the photos whose image is gone are deleted from the database in a single
+query. Images other photos still share (see deduplication in photo_uploads)
+are kept. A photo whose image could not be deleted is kept, so it can be
+deleted again later, and reported as failed.
+"""
+# pylint: disable=no-member
+import logging
+
+from django.db import transaction
+
+from natour.api.methods.photo_gc import referenced_public_ids
+from natour.api.models import PendingAssetDeletion, Photo
+from natour.api.utils.photo_storage import get_photo_storage
+
+logger = logging.getLogger("django")
+
+
+def delete_photos(photos):
+    """
+    Deletes photos and their stored images.
+
+    Returns a list with, for each photo, {'id', 'deleted', 'detail'}.
+
+    The photos stay locked until they are deleted, so the upload worker can not
+    start sharing their images meanwhile.
+    """
+    photos = list(photos)
+    photo_ids = [photo.id for photo in photos]
+    public_ids = {photo.public_id for photo in photos if photo.public_id}
+
+    with transaction.atomic():
+        list(Photo.objects.select_for_update().filter(id__in=photo_ids).values_list('id'))
+        shared = referenced_public_ids(public_ids, exclude_photo_ids=photo_ids)
+        errors = get_photo_storage().destroy_many(public_ids - shared)
+
+        deleted_ids = []
+        results = []
+        for photo in photos:
+            error = errors.get(photo.public_id) if photo.public_id else None
+            if error is None:
+                deleted_ids.append(photo.id)
+                results.append({'id': photo.id, 'deleted': True, 'detail': None})
+            else:
+                logger.error("Failed to delete stored image of photo ID %s: %s",
+                             photo.id, str(error))
+                results.append({'id': photo.id, 'deleted': False,
+                                'detail': f'Erro ao excluir a imagem: {error}'})
+
+        Photo.objects.filter(id__in=deleted_ids).delete()
+        # Deleted above or still shared, the garbage collector has nothing to do.
+        PendingAssetDeletion.objects.filter(
+            public_id__in=[photo.public_id for photo in photos
+                           if photo.id in deleted_ids and photo.public_id]).delete()
+    logger.info("Deleted %s of %s photos: %s", len(deleted_ids), len(photos), deleted_ids)
+    return results
@@ -0,0 +1,130 @@
+"""
+Module for deleting stored images no photo refers to anymore.
+
+Photos deleted by cascades (of points and users) or images left behind by the
+upload worker are recorded as PendingAssetDeletion rows. collect_orphan_photos
+deletes those and, when asked to, walks the paged listing of the storage and
+deletes every image no Photo refers to, catching what escaped the records.
+"""
+# pylint: disable=no-member
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from natour.api.models import PendingAssetDeletion, Photo
+from natour.api.utils.photo_storage import get_photo_storage
+
+logger = logging.getLogger("django")
+
+LISTING_PAGE_SIZE = 500
+PENDING_BATCH_SIZE = 100
+# Younger images may belong to uploads not saved to their photo yet.
+ORPHAN_MIN_AGE = timedelta(hours=24)
+
+
+@dataclass
+class CollectionStats:
+    """
+    Counters of a garbage collection run.
+    """
+    pending_deleted: int = 0
+    pending_failed: int = 0
+    listed: int = 0
+    orphans: int = 0
+    orphans_deleted: int = 0
+    orphans_failed: int = 0
+
+
+def enqueue_asset_deletions(*public_ids):
+    """
+    Records stored images to be deleted by the garbage collector.
+    """
+    public_ids = {public_id for public_id in public_ids if public_id}
+    PendingAssetDeletion.objects.bulk_create(
+        [PendingAssetDeletion(public_id=public_id) for public_id in public_ids],
+        ignore_conflicts=True,
+    )
+
+
+def referenced_public_ids(public_ids, exclude_photo_ids=()):
+    """
+    Returns which of the given public_ids some photo, other than the excluded
+    ones, still shows or is about to replace. Deduplicated photos share their
+    stored image, so it may only be deleted once no photo refers to it.
+    """
+    public_ids = list(public_ids)
+    photos = Photo.objects.exclude(id__in=list(exclude_photo_ids))
+    return (set(photos.filter(public_id__in=public_ids).values_list('public_id', flat=True))
+            | set(photos.filter(replaced_public_id__in=public_ids)
+                  .values_list('replaced_public_id', flat=True)))
+
+
+def delete_pending_assets(storage, stats, dry_run=False):
+    """
+    Deletes the recorded images, keeping the failed ones for the next run.
+    """
+    last_id = 0
+    while True:
+        batch = list(PendingAssetDeletion.objects
+                     .filter(id__gt=last_id).order_by('id')[:PENDING_BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].id
+
+        # A public_id may have been reused by a photo meanwhile (deduplication).
+        in_use = referenced_public_ids(pending.public_id for pending in batch)
+        to_delete = [pending for pending in batch if pending.public_id not in in_use]
+        if dry_run:
+            stats.pending_deleted += len(to_delete)
+            continue
+
+        errors = storage.destroy_many(pending.public_id for pending in to_delete)
+        failed = [pending for pending in to_delete if errors[pending.public_id] is not None]
+        for pending in failed:
+            PendingAssetDeletion.objects.filter(id=pending.id).update(
+                attempts=F('attempts') + 1, last_error=str(errors[pending.public_id]))
+        PendingAssetDeletion.objects.filter(id__in=[pending.id for pending in batch]).exclude(
+            id__in=[pending.id for pending in failed]).delete()
+        stats.pending_deleted += len(to_delete) - len(failed)
+        stats.pending_failed += len(failed)
+
+
+def delete_orphan_assets(storage, stats, page_size=LISTING_PAGE_SIZE, dry_run=False):
+    """
+    Deletes, page by page of the storage listing, the images older than
+    ORPHAN_MIN_AGE that no photo refers to.
+    """
+    older_than = timezone.now() - ORPHAN_MIN_AGE
+    for page in storage.list_assets(page_size):
+        stats.listed += len(page)
+        candidates = [public_id for public_id, created_at in page
+                      if created_at is None or created_at < older_than]
+        orphans = set(candidates) - referenced_public_ids(candidates)
+        stats.orphans += len(orphans)
+        if dry_run or not orphans:
+            continue
+
+        errors = storage.destroy_many(orphans)
+        for public_id, error in errors.items():
+            if error is None:
+                stats.orphans_deleted += 1
+            else:
+                stats.orphans_failed += 1
+                logger.error("Failed to delete orphan image '%s'. Error: %s", public_id, str(error))
+
+
+def collect_orphan_photos(page_size=LISTING_PAGE_SIZE, dry_run=False, delete_orphans=False):
+    """
+    Runs a garbage collection of the stored images and returns its stats. The
+    sweep of the storage listing only runs with delete_orphans.
+    """
+    storage = get_photo_storage()
+    stats = CollectionStats()
+    delete_pending_assets(storage, stats, dry_run)
+    if delete_orphans:
+        delete_orphan_assets(storage, stats, page_size, dry_run)
+    logger.info("Photo garbage collection%s: %s", " (dry run)" if dry_run else "", stats)
+    return stats
@@ -0,0 +1,312 @@
+"""
+Module for uploading photos outside of the requests.
+
+The views stage the received image on disk and mark the photo as pending;
+the process_photo_uploads command uploads the staged images to the photo
+storage and only then deletes the images they replace. Before the upload,
+the images are normalized (downsized, re-encoded and stripped of metadata) in
+a process pool. Failed uploads are retried on the next runs, up to
+MAX_UPLOAD_ATTEMPTS; images that can not be decoded fail at once.
+
+Photos are deduplicated by content: a photo whose received image has the same
+SHA-256 as an uploaded photo (or, with PHOTO_PERCEPTUAL_DEDUP, whose normalized
+image has the same perceptual hash as a photo of the same point or user)
+reuses its stored image instead of uploading a copy. A stored image is only deleted once no photo refers to it
+(see referenced_public_ids).
+"""
+# pylint: disable=no-member
+import hashlib
+import logging
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from natour.api.models import Photo, UploadStatus
+from natour.api.methods.photo_gc import enqueue_asset_deletions, referenced_public_ids
+from natour.api.utils.image_normalization import InvalidImage, normalize_images
+from natour.api.utils.metrics import PHOTOS_DEDUPLICATED
+from natour.api.utils.photo_storage import get_photo_storage
+
+logger = logging.getLogger("django")
+
+UPLOAD_BATCH_SIZE = 20
+MAX_UPLOAD_ATTEMPTS = 5
+# Uploads claimed for longer than this are taken over, their worker is dead.
+UPLOAD_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def stage_upload(uploaded_file):
+    """
+    Writes an uploaded image to the staging directory and returns
+    (its path, its SHA-256).
+    """
+    directory = Path(settings.PHOTO_STAGING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{uuid.uuid4().hex}{Path(uploaded_file.name).suffix.lower()}'
+    digest = hashlib.sha256()
+    with open(path, 'wb') as staged:
+        for chunk in uploaded_file.chunks():
+            staged.write(chunk)
+            digest.update(chunk)
+    return str(path), digest.hexdigest()
+
+
+def discard_staged(path):
+    """
+    Deletes a staged image, if still there.
+    """
+    if path:
+        Path(path).unlink(missing_ok=True)
+
+
+def _claim(photo):
+    """
+    Marks a photo as being uploaded, unless another worker got it first. The
+    update time is matched too, so a stale upload reclaimed by another worker
+    in the meantime is not claimed twice.
+    """
+    return Photo.objects.filter(
+        id=photo.id, staged_file=photo.staged_file, upload_status=photo.upload_status,
+        updated_at=photo.updated_at
+    ).update(upload_status=UploadStatus.UPLOADING, updated_at=timezone.now()) == 1
+
+
+def _release(photo):
+    """
+    Gives a claimed photo back to the next runs of the worker.
+    """
+    Photo.objects.filter(
+        id=photo.id, staged_file=photo.staged_file, upload_status=UploadStatus.UPLOADING
+    ).update(upload_status=UploadStatus.PENDING)
+
+
+def _destroy(storage, public_id):
+    try:
+        storage.destroy(public_id)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Failed to delete stored image '%s', left to the garbage collector. "
+                     "Error: %s", public_id, str(e))
+        enqueue_asset_deletions(public_id)
+
+
+def _record_failure(photo, error, permanent=False):
+    attempts = photo.upload_attempts + 1
+    failed = permanent or attempts >= MAX_UPLOAD_ATTEMPTS
+    updated = Photo.objects.filter(id=photo.id, staged_file=photo.staged_file).update(
+        upload_status=UploadStatus.FAILED if failed else UploadStatus.PENDING,
+        upload_attempts=attempts,
+        upload_error=str(error),
+        staged_file='' if failed else photo.staged_file,
+        updated_at=timezone.now(),
+    )
+    logger.error(
+        "Failed to upload image of photo ID %s (attempt %s). Error: %s",
+        photo.id, attempts, str(error)
+    )
+    if updated and failed:
+        discard_staged(photo.staged_file)
+
+
+def _complete(photo, **image):
+    """
+    Makes a claimed photo show a stored image, given as its Photo fields.
+
+    Returns the public_id of the image it replaces ('' when none), or None when
+    the photo was deleted or got another image meanwhile.
+    """
+    with transaction.atomic():
+        current = Photo.objects.select_for_update().filter(id=photo.id).first()
+        if current is None or current.staged_file != photo.staged_file:
+            return None
+        replaced_public_id = current.replaced_public_id
+        for field, value in image.items():
+            setattr(current, field, value)
+        current.upload_status = UploadStatus.READY
+        current.staged_file = ''
+        current.replaced_public_id = ''
+        current.upload_attempts = 0
+        current.upload_error = ''
+        current.save()
+    return replaced_public_id
+
+
+def _release_replaced(storage, public_id):
+    """
+    Deletes a replaced stored image, unless other photos still share it.
+    """
+    if public_id and not referenced_public_ids([public_id]):
+        _destroy(storage, public_id)
+
+
+def upload_photo(photo, storage, upload_path=None, perceptual_hash=''):
+    """
+    Uploads the staged image of a claimed photo, or upload_path (its normalized
+    copy) when given. When the photo was deleted or got another image
+    meanwhile, the uploaded image is deleted instead.
+
+    Returns whether the photo now shows the uploaded image.
+    """
+    try:
+        resource = storage.upload(upload_path or photo.staged_file)
+    except Exception as e:  # pylint: disable=broad-except
+        _record_failure(photo, e)
+        return False
+
+    image_url, variants = storage.urls(resource)
+    replaced_public_id = _complete(
+        photo, image=resource, public_id=resource.public_id, image_url=image_url,
+        variants=variants, perceptual_hash=perceptual_hash)
+    if replaced_public_id is None:
+        _destroy(storage, resource.public_id)
+        return False
+
+    _release_replaced(storage, replaced_public_id)
+    discard_staged(photo.staged_file)
+    logger.info("Image of photo ID %s uploaded: %s", photo.id, resource.public_id)
+    return True
+
+
+def reuse_duplicate(photo, storage, **lookup):
+    """
+    Makes a claimed photo share the stored image of an uploaded photo matching
+    lookup (content_hash or perceptual_hash, first, then any other filters),
+    instead of uploading a copy.
+
+    Returns None when there is no such photo, or the hash to match is empty,
+    else whether the claimed photo now shows the shared image.
+    """
+    if not all(lookup.values()):
+        return None
+    with transaction.atomic():
+        # Locked, so a concurrent delete_photos can not delete the image meanwhile.
+        source = (Photo.objects.select_for_update()
+                  .filter(upload_status=UploadStatus.READY, **lookup)
+                  .exclude(id=photo.id)
+                  .exclude(public_id__isnull=True).exclude(public_id='')
+                  .order_by('id').first())
+        if source is None:
+            return None
+        replaced_public_id = _complete(
+            photo, image=source.image, public_id=source.public_id,
+            image_url=source.image_url, variants=source.variants,
+            perceptual_hash=source.perceptual_hash)
+    if replaced_public_id is None:
+        return False
+
+    _release_replaced(storage, replaced_public_id)
+    discard_staged(photo.staged_file)
+    PHOTOS_DEDUPLICATED.labels(match=next(iter(lookup)).removesuffix('_hash')).inc()
+    logger.info("Photo ID %s reuses the image of photo ID %s: %s",
+                photo.id, source.id, source.public_id)
+    return True
+
+
+def _claim_pending(batch_size):
+    """
+    Claims up to batch_size photos waiting for their upload, or whose upload
+    went stale, and returns them.
+    """
+    stale_before = timezone.now() - UPLOAD_CLAIM_TIMEOUT
+    photos = list(
+        Photo.objects
+        .filter(Q(upload_status=UploadStatus.PENDING)
+                | Q(upload_status=UploadStatus.UPLOADING, updated_at__lt=stale_before))
+        .exclude(staged_file='')
+        .order_by('updated_at')[:batch_size]
+    )
+    return [photo for photo in photos if _claim(photo)]
+
+
+def _group_by_content(photos, storage):
+    """
+    Makes the photos whose content_hash matches an uploaded photo share its
+    image, and groups the others: the first photo of each hash is uploaded,
+    while its copies in the batch wait for it, to share it. Photos staged
+    without a hash are never taken for copies.
+
+    Returns (outcomes of the reused photos, photos to upload, copies).
+    """
+    outcomes, to_upload, duplicates = [], [], []
+    batch_hashes = set()
+    for photo in photos:
+        reused = reuse_duplicate(photo, storage, content_hash=photo.content_hash)
+        if reused is not None:
+            outcomes.append(reused)
+        elif photo.content_hash and photo.content_hash in batch_hashes:
+            duplicates.append(photo)
+        else:
+            if photo.content_hash:
+                batch_hashes.add(photo.content_hash)
+            to_upload.append(photo)
+    return outcomes, to_upload, duplicates
+
+
+def _upload_normalized(photo, storage, path, digest):
+    """
+    Uploads the normalized copy of a photo's image, unless, with
+    PHOTO_PERCEPTUAL_DEDUP, a photo of the same point or user already shows an
+    image of the same perceptual hash.
+
+    Returns whether the photo now shows the image.
+    """
+    if settings.PHOTO_PERCEPTUAL_DEDUP:
+        # A 64-bit hash can collide across unrelated images, so only photos
+        # of the same point or user are taken for copies.
+        scope = ({'point_id': photo.point_id} if photo.point_id
+                 else {'user_id': photo.user_id})
+        reused = reuse_duplicate(photo, storage, perceptual_hash=digest, **scope)
+        if reused is not None:
+            return reused
+    return upload_photo(photo, storage, path, digest)
+
+
+def _reuse_batch_copies(duplicates, storage):
+    """
+    Makes the copies of images uploaded by the batch share them.
+
+    Returns the outcomes of the copies whose original was uploaded.
+    """
+    outcomes = []
+    for photo in duplicates:
+        reused = reuse_duplicate(photo, storage, content_hash=photo.content_hash)
+        if reused is None:
+            # Its original failed to upload, left to the next runs.
+            _release(photo)
+        else:
+            outcomes.append(reused)
+    return outcomes
+
+
+def process_pending_uploads(batch_size=UPLOAD_BATCH_SIZE):
+    """
+    Uploads up to batch_size pending photos.
+
+    Returns (uploaded, failed).
+    """
+    photos = _claim_pending(batch_size)
+    if not photos:
+        return 0, 0
+
+    storage = get_photo_storage()
+    outcomes, to_upload, duplicates = _group_by_content(photos, storage)
+
+    normalized = normalize_images([photo.staged_file for photo in to_upload])
+    for photo, result in zip(to_upload, normalized):
+        if isinstance(result, Exception):
+            _record_failure(photo, result, permanent=isinstance(result, InvalidImage))
+            outcomes.append(False)
+            continue
+        path, digest = result
+        try:
+            outcomes.append(_upload_normalized(photo, storage, path, digest))
+        finally:
+            discard_staged(path)
+
+    outcomes.extend(_reuse_batch_copies(duplicates, storage))
+    uploaded = sum(outcomes)
+    return uploaded, len(outcomes) - uploaded
@@ -0,0 +1,133 @@
+"""
+Module for maintaining the precomputed map clusters of points.
+
+Points are grouped per zoom level into Web Mercator tiles and per point type.
+Each cluster keeps the amount of points and the sum of their coordinates, so
+adding or removing a point is a constant amount of increments and the
+centroid is read as sum / count.
+"""
+# pylint: disable=no-member
+import math
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from natour.api.models import PointCluster
+
+MIN_CLUSTER_ZOOM = 2
+MAX_CLUSTER_ZOOM = 12
+CLUSTER_ZOOM_LEVELS = range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1)
+
+# Web Mercator is undefined at the poles.
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+
+def tile_for(latitude, longitude, zoom):
+    """
+    Returns the (x, y) Web Mercator tile containing the coordinate at a zoom.
+    """
+    tiles = 2 ** zoom
+    latitude = min(max(latitude, -MAX_MERCATOR_LATITUDE), MAX_MERCATOR_LATITUDE)
+    lat_rad = math.radians(latitude)
+
+    x = int((longitude + 180.0) / 360.0 * tiles)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * tiles)
+    return min(max(x, 0), tiles - 1), min(max(y, 0), tiles - 1)
+
+
+def tile_ranges(min_lat, min_lng, max_lat, max_lng, zoom):
+    """
+    Returns the ((first_x, last_x), (first_y, last_y)) tiles covering a box.
+    """
+    first_x, first_y = tile_for(max_lat, min_lng, zoom)
+    last_x, last_y = tile_for(min_lat, max_lng, zoom)
+    return (first_x, last_x), (first_y, last_y)
+
+
+def cluster_state(point):
+    """
+    Returns what a point contributes to the clusters, or None when it is not
+    shown on the map.
+    """
+    if not (point.is_active and point.status):
+        return None
+    if point.latitude is None or point.longitude is None:
+        return None
+    return (point.point_type, point.latitude, point.longitude)
+
+
+def _apply(state, sign):
+    """
+    Adds (sign=1) or removes (sign=-1) a point contribution on every zoom level.
+    """
+    point_type, latitude, longitude = state
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        tile_x, tile_y = tile_for(latitude, longitude, zoom)
+        key = {'zoom': zoom, 'tile_x': tile_x, 'tile_y': tile_y, 'point_type': point_type}
+        clusters = PointCluster.objects.filter(**key)
+
+        updated = clusters.update(
+            count=F('count') + sign,
+            latitude_sum=F('latitude_sum') + sign * latitude,
+            longitude_sum=F('longitude_sum') + sign * longitude,
+        )
+
+        if sign < 0:
+            clusters.filter(count__lte=0).delete()
+        elif not updated:
+            try:
+                with transaction.atomic():
+                    PointCluster.objects.create(
+                        **key, count=1, latitude_sum=latitude, longitude_sum=longitude)
+            except IntegrityError:
+                clusters.update(
+                    count=F('count') + 1,
+                    latitude_sum=F('latitude_sum') + latitude,
+                    longitude_sum=F('longitude_sum') + longitude,
+                )
+
+
+def update_clusters(previous_state, new_state):
+    """
+    Moves a point between clusters after it was created, edited, approved or
+    deleted. Either state may be None when the point is not shown on the map.
+    """
+    if previous_state == new_state:
+        return
+    with transaction.atomic():
+        if previous_state is not None:
+            _apply(previous_state, -1)
+        if new_state is not None:
+            _apply(new_state, 1)
+
+
+def rebuild_clusters(points):
+    """
+    Recomputes every cluster from the given Point queryset.
+
+    Returns the amount of clusters created.
+    """
+    totals = {}
+    fields = ('point_type', 'latitude', 'longitude', 'is_active', 'status')
+    for point in points.only(*fields).iterator(chunk_size=2000):
+        state = cluster_state(point)
+        if state is None:
+            continue
+        point_type, latitude, longitude = state
+        for zoom in CLUSTER_ZOOM_LEVELS:
+            key = (zoom, *tile_for(latitude, longitude, zoom), point_type)
+            count, latitude_sum, longitude_sum = totals.get(key, (0, 0.0, 0.0))
+            totals[key] = (count + 1, latitude_sum + latitude, longitude_sum + longitude)
+
+    clusters = [
+        PointCluster(zoom=zoom, tile_x=tile_x, tile_y=tile_y, point_type=point_type,
+                     count=count, latitude_sum=latitude_sum, longitude_sum=longitude_sum)
+        for (zoom, tile_x, tile_y, point_type), (count, latitude_sum, longitude_sum)
+        in totals.items()
+    ]
+
+    with transaction.atomic():
+        PointCluster.objects.all().delete()
+        PointCluster.objects.bulk_create(clusters, batch_size=2000)
+
+    return len(clusters)
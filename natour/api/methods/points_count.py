@@ -0,0 +1,37 @@
+"""
+Module for maintaining the denormalized amount of points of each user.
+"""
+# pylint: disable=no-member
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from natour.api.models import CustomUser, Point
+
+
+def change_points_count(user_id, delta):
+    """
+    Atomically adds delta to the points_count of a user.
+    """
+    CustomUser.objects.filter(id=user_id).update(points_count=F('points_count') + delta)
+
+
+def reconcile_points_count():
+    """
+    Fixes the points_count of every user that drifted from the points table.
+
+    Returns the amount of users corrected.
+    """
+    actual = (Point.objects
+              .filter(user=OuterRef('pk'))
+              .order_by()
+              .values('user')
+              .annotate(total=Count('id'))
+              .values('total'))
+
+    drifted = (CustomUser.objects
+               .annotate(actual=Coalesce(Subquery(actual), Value(0)))
+               .exclude(points_count=F('actual'))
+               .values_list('id', flat=True))
+
+    return CustomUser.objects.filter(id__in=list(drifted)).update(
+        points_count=Coalesce(Subquery(actual), Value(0)))
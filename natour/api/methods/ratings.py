@@ -0,0 +1,102 @@
+"""
+Module for maintaining the persisted rating aggregates of points.
+
+Each point stores the sum and amount of its ratings plus a per-star
+histogram, so adding or deleting a review (including cascaded deletions of
+accounts) is a single atomic UPDATE and the average never needs to scan the
+reviews table.
+"""
+# pylint: disable=no-member
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from natour.api.models import Point, PointReview
+
+RATING_STARS = range(1, 6)
+
+
+def average_rating(total, amount):
+    """
+    Returns the SQL expression of the rounded average rating (ties rounded
+    away from zero), the only rounding used for Point.avg_rating. Integer
+    arithmetic, as ROUND() of a float rounds ties to even on PostgreSQL.
+    """
+    return (2 * total + amount) / (2 * amount)
+
+
+def add_rating(point_id, rating):
+    """
+    Adds a rating to the aggregates of a point with F-expression increments.
+    Must run in the same transaction that creates the review.
+    """
+    Point.objects.filter(id=point_id).update(
+        rating_sum=F('rating_sum') + rating,
+        rating_count=F('rating_count') + 1,
+        avg_rating=average_rating(F('rating_sum') + rating, F('rating_count') + 1),
+        **{f'rating_{rating}': F(f'rating_{rating}') + 1},
+    )
+
+
+def remove_rating(point_id, rating):
+    """
+    Removes the rating of a deleted review from the aggregates of a point,
+    the reverse of add_rating.
+    """
+    Point.objects.filter(id=point_id, rating_count__gt=0).update(
+        rating_sum=F('rating_sum') - rating,
+        rating_count=F('rating_count') - 1,
+        avg_rating=Case(
+            When(rating_count=1, then=Value(0)),
+            default=average_rating(F('rating_sum') - rating, F('rating_count') - 1),
+        ),
+        **{f'rating_{rating}': F(f'rating_{rating}') - 1},
+    )
+
+
+def rating_histogram(point):
+    """
+    Returns the amount of ratings of a point per star, as a dict.
+    """
+    return {str(star): getattr(point, f'rating_{star}') for star in RATING_STARS}
+
+
+def rebuild_rating_aggregates(batch_size=1000):
+    """
+    Recomputes the rating aggregates of every point from the reviews table.
+
+    Returns the amount of points with reviews.
+    """
+    totals = (PointReview.objects
+              .order_by()
+              .values('point_id')
+              .annotate(total=Sum('rating'), amount=Count('id'),
+                        **{f'stars_{star}': Count('id', filter=Q(rating=star))
+                           for star in RATING_STARS}))
+
+    fields = ['rating_sum', 'rating_count', *(f'rating_{star}' for star in RATING_STARS)]
+
+    updated = 0
+    with transaction.atomic():
+        Point.objects.update(avg_rating=0, **{field: 0 for field in fields})
+
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            point = Point(id=row['point_id'], rating_sum=row['total'],
+                          rating_count=row['amount'])
+            for star in RATING_STARS:
+                setattr(point, f'rating_{star}', row[f'stars_{star}'])
+            batch.append(point)
+
+            if len(batch) >= batch_size:
+                Point.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Point.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        Point.objects.filter(rating_count__gt=0).update(
+            avg_rating=average_rating(F('rating_sum'), F('rating_count')))
+
+    return updated
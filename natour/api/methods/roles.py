@@ -0,0 +1,38 @@
+"""
+Module for looking up role names without querying the roles table.
+"""
+# pylint: disable=no-member
+from django.core.cache import cache
+
+from natour.api.models import Role
+from natour.api.utils.local_cache import tiered_get, tiered_set, invalidate_local
+
+ROLE_NAME_TIMEOUT = 24 * 60 * 60
+
+
+def _role_name_key(role_id):
+    return f'role_name:{role_id}'
+
+
+def get_role_name(role_id):
+    """
+    Returns the name of a role, or None when it does not exist.
+    """
+    if role_id is None:
+        return None
+    key = _role_name_key(role_id)
+    name = tiered_get(key)
+    if name is None:
+        name = Role.objects.filter(id=role_id).values_list('name', flat=True).first()
+        if name is not None:
+            tiered_set(key, name, timeout=ROLE_NAME_TIMEOUT)
+    return name
+
+
+def forget_role_name(role_id):
+    """
+    Drops the cached name of a role from every tier.
+    """
+    key = _role_name_key(role_id)
+    cache.delete(key)
+    invalidate_local(key)
@@ -1,32 +1,35 @@
 """
-Module for sending emails to users when terms and policies are updated.
+Module for the emails sent to users when terms and policies are updated.
 """
-from smtplib import SMTPException
-
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.contrib.auth import get_user_model
+from django.utils.html import escape
+
+from natour.api.methods.email_outbox import DEFAULT_SENDER
+from natour.api.utils.email_templates import render_email
+
+# Rendered in place of the username, then replaced per user.
+USERNAME_PLACEHOLDER = '__natour_username__'
 
 
-def send_updated_terms_email():
+def build_updated_terms_emails(users, connection):
     """
-    Sends an email to all active users notifying them of updated terms and policies.
+    Builds the updated terms email of each user of a chunk, rendering the
+    template only once for the whole chunk.
     """
-    CustomUser = get_user_model()
-    users = CustomUser.objects.filter(is_active=True)
+    html_template = render_email(
+        'updated_terms.html',
+        {'username': USERNAME_PLACEHOLDER}
+    )
+    messages = []
     for user in users:
-        html_content = render_to_string(
-            'email_templates/updated_terms.html',
-            {'username': user.username}
+        msg = EmailMultiAlternatives(
+            subject="Natour - Atualização dos Termos e Políticas",
+            body=f"Olá, {user.username}! Os termos e políticas do Natour foram atualizados. Por favor, verifique seu email para mais detalhes.",
+            from_email=DEFAULT_SENDER,
+            to=[user.email],
+            connection=connection,
         )
-        try:
-            msg = EmailMultiAlternatives(
-                subject="Natour - Atualização dos Termos e Políticas",
-                body=f"Olá, {user.username}! Os termos e políticas do Natour foram atualizados. Por favor, verifique seu email para mais detalhes.",
-                from_email="natourproject@gmail.com",
-                to=[user.email],
-            )
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
-        except SMTPException as e:
-            print(f"Erro ao enviar email para {user.email}: {str(e)}")
+        msg.attach_alternative(
+            html_template.replace(USERNAME_PLACEHOLDER, escape(user.username)), "text/html")
+        messages.append(msg)
+    return messages
@@ -0,0 +1,85 @@
+"""
+Module for counting point views without writing the points table per view.
+
+Views are incremented atomically in a Redis hash and periodically flushed to
+Point.views as aggregated deltas (see the flush_point_views command).
+"""
+# pylint: disable=no-member
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from redis.exceptions import RedisError
+
+from natour.api.models import Point
+from natour.api.utils.redis_buffers import drain, get_redis, read_fields
+
+logger = logging.getLogger("django")
+
+PENDING_VIEWS_KEY = "point_views:pending"
+FLUSH_BATCH_SIZE = 500
+
+
+def record_view(point_id):
+    """
+    Adds one view to a point. Falls back to a direct atomic UPDATE when Redis
+    is unavailable, so views are never dropped.
+    """
+    try:
+        get_redis().hincrby(PENDING_VIEWS_KEY, point_id, 1)
+    except RedisError as e:
+        logger.warning(
+            "View counter unavailable, writing view of Point ID %s directly. Error: %s",
+            point_id, str(e)
+        )
+        Point.objects.filter(id=point_id).update(views=F('views') + 1)
+
+
+def pending_views(point_ids):
+    """
+    Returns a dict of point id -> views not yet flushed to the database.
+    """
+    try:
+        values = read_fields(PENDING_VIEWS_KEY, point_ids)
+    except RedisError:
+        return {}
+    return {int(point_id): sum(int(value) for value in raw)
+            for point_id, raw in values.items() if raw}
+
+
+def merge_pending_views(points):
+    """
+    Adds the pending views to the 'views' of already loaded points.
+    """
+    points = list(points)
+    pending = pending_views([point.id for point in points])
+    for point in points:
+        if point.id in pending:
+            point.views = (point.views or 0) + pending[point.id]
+    return points
+
+
+def flush_views():
+    """
+    Writes the pending views to Point.views with batched
+    UPDATE ... SET views = views + n statements.
+
+    Returns a (points, views) tuple with the amount flushed.
+    """
+    with drain(PENDING_VIEWS_KEY) as entries:
+        deltas = [(int(point_id), int(views)) for point_id, views in entries.items()]
+        if not deltas:
+            return 0, 0
+
+        with transaction.atomic():
+            for start in range(0, len(deltas), FLUSH_BATCH_SIZE):
+                batch = deltas[start:start + FLUSH_BATCH_SIZE]
+                Point.objects.filter(id__in=[point_id for point_id, _views in batch]).update(
+                    views=Case(
+                        *(When(id=point_id, then=F('views') + views)
+                          for point_id, views in batch),
+                        default=F('views'),
+                    )
+                )
+
+    return len(deltas), sum(views for _point_id, views in deltas)
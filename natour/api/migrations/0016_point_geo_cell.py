@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:00
+# pylint: skip-file
+
+from django.db import migrations, models
+
+from natour.api.methods.geo_grid import cell_for
+
+
+def fill_geo_cell(apps, schema_editor):
+    Point = apps.get_model('api', 'Point')
+    points = Point.objects.exclude(latitude=None).exclude(longitude=None)
+    batch = []
+    for point in points.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        point.geo_cell = cell_for(point.latitude, point.longitude)
+        batch.append(point)
+        if len(batch) >= 2000:
+            Point.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    if batch:
+        Point.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_alter_customuser_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['is_active', 'status', 'geo_cell'], name='point_visible_geo_cell_idx'),
+        ),
+        migrations.RunPython(fill_geo_cell, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:01
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_point_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointCluster',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('tile_x', models.IntegerField()),
+                ('tile_y', models.IntegerField()),
+                ('point_type', models.CharField(choices=[('trail', 'Trilha'), ('water_fall', 'Cachoeira'), ('park', 'Parque'), ('farm', 'Fazenda'), ('other', 'Outro')])),
+                ('count', models.IntegerField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Point Cluster',
+                'verbose_name_plural': 'Point Clusters',
+                'ordering': ['zoom', 'tile_x', 'tile_y', 'point_type'],
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'tile_x', 'tile_y', 'point_type'), name='unique_point_cluster_tile')],
+            },
+        ),
+    ]
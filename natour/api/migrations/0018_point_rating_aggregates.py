@@ -0,0 +1,71 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:06
+# pylint: skip-file
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Point = apps.get_model('api', 'Point')
+    PointReview = apps.get_model('api', 'PointReview')
+    totals = (PointReview.objects
+              .order_by()
+              .values('point_id')
+              .annotate(total=Sum('rating'), amount=Count('id'),
+                        **{f'stars_{star}': Count('id', filter=Q(rating=star))
+                           for star in range(1, 6)}))
+    for row in totals.iterator():
+        Point.objects.filter(id=row['point_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['amount'],
+            **{f'rating_{star}': row[f'stars_{star}'] for star in range(1, 6)},
+        )
+    # Same rounding as natour.api.methods.ratings.average_rating.
+    Point.objects.filter(rating_count__gt=0).update(
+        avg_rating=(2 * F('rating_sum') + F('rating_count')) / (2 * F('rating_count')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_pointcluster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='rating_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
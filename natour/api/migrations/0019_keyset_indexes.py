@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:08
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_point_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['name', 'id'], name='point_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pointreview',
+            index=models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:12
+# pylint: skip-file
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_points_count(apps, schema_editor):
+    CustomUser = apps.get_model('api', 'CustomUser')
+    Point = apps.get_model('api', 'Point')
+    actual = (Point.objects
+              .filter(user=OuterRef('pk'))
+              .order_by()
+              .values('user')
+              .annotate(total=Count('id'))
+              .values('total'))
+    CustomUser.objects.update(points_count=Coalesce(Subquery(actual), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_keyset_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='points_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-points_count', 'id'], name='user_points_count_idx'),
+        ),
+        migrations.RunPython(fill_points_count, migrations.RunPython.noop),
+    ]
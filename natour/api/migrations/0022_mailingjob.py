@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:48
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingJob',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('updated_terms', 'Termos atualizados')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Mailing Job',
+                'verbose_name_plural': 'Mailing Jobs',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
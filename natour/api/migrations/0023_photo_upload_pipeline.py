@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:55
+# pylint: skip-file
+
+import cloudinary.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_mailingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='replaced_public_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='staged_file',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='upload_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='upload_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('uploading', 'Enviando'), ('ready', 'Pronta'), ('failed', 'Falhou')], default='ready', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['upload_status', 'updated_at'], name='photo_upload_status_idx'),
+        ),
+    ]
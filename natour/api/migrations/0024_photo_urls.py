@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:02
+# pylint: skip-file
+
+from django.db import migrations, models
+
+from natour.api.utils.photo_storage import CloudinaryPhotoStorage
+
+
+def fill_photo_urls(apps, schema_editor):
+    # Every image stored before the upload pipeline lives in Cloudinary.
+    Photo = apps.get_model('api', 'Photo')
+    storage = CloudinaryPhotoStorage()
+    photos = []
+    for photo in Photo.objects.exclude(image__isnull=True).exclude(image='').iterator():
+        photo.image_url, photo.variants = storage.urls(photo.image)
+        photos.append(photo)
+    Photo.objects.bulk_update(photos, ['image_url', 'variants'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_photo_upload_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='image_url',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(fill_photo_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:05
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_photo_urls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAssetDeletion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('public_id', models.CharField(max_length=255, unique=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Pending Asset Deletion',
+                'verbose_name_plural': 'Pending Asset Deletions',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
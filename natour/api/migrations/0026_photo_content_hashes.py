@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:15
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_pendingassetdeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['content_hash'], name='photo_content_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['perceptual_hash'], name='photo_perceptual_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['public_id'], name='photo_public_id_idx'),
+        ),
+    ]
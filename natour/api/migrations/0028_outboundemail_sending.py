@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:40
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_point_geo_coarse_cell'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('dead', 'Descartado')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:48
+# pylint: skip-file
+
+from django.db import migrations
+from django.db.models import Q
+
+
+def fill_public_id(apps, schema_editor):
+    Photo = apps.get_model('api', 'Photo')
+    photos = Photo.objects.filter(Q(public_id__isnull=True) | Q(public_id='')).exclude(image=None)
+    batch = []
+    for photo in photos.only('id', 'image').iterator(chunk_size=2000):
+        if not photo.image or not photo.image.public_id:
+            continue
+        photo.public_id = photo.image.public_id
+        batch.append(photo)
+        if len(batch) >= 2000:
+            Photo.objects.bulk_update(batch, ['public_id'])
+            batch = []
+    if batch:
+        Photo.objects.bulk_update(batch, ['public_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_outboundemail_sending'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_public_id, migrations.RunPython.noop),
+    ]
@@ -6,8 +6,11 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
+from natour.api.methods.geo_grid import cell_for, coarse_cell_for
+
 
 class Role(models.Model):
     """
@@ -28,12 +31,37 @@ class Role(models.Model):
         verbose_name_plural = "Roles"
 
 
+class UploadStatus(models.TextChoices):
+    """
+    States of the upload of a photo to the storage.
+    """
+    PENDING = 'pending', 'Pendente'
+    UPLOADING = 'uploading', 'Enviando'
+    READY = 'ready', 'Pronta'
+    FAILED = 'failed', 'Falhou'
+
+
 class Photo(models.Model):
     """
     Model representing a photo associated with a user or a point.
+
+    New images are staged on disk and uploaded by the process_photo_uploads
+    worker; until then the photo keeps its previous image, if any. Photos with
+    the same content share one stored image (see content_hash).
     """
-    image = CloudinaryField('image')
+    image = CloudinaryField('image', blank=True, null=True)
     public_id = models.CharField(max_length=255, blank=True, null=True)
+    image_url = models.CharField(max_length=500, blank=True, default='')
+    variants = models.JSONField(blank=True, default=dict)
+    upload_status = models.CharField(max_length=10, choices=UploadStatus.choices,
+                                     default=UploadStatus.READY)
+    staged_file = models.CharField(max_length=255, blank=True, default='')
+    replaced_public_id = models.CharField(max_length=255, blank=True, default='')
+    upload_attempts = models.PositiveSmallIntegerField(default=0)
+    upload_error = models.TextField(blank=True, default='')
+    # SHA-256 of the received image and difference hash of the stored one.
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    perceptual_hash = models.CharField(max_length=16, blank=True, default='')
     user = models.OneToOneField('CustomUser', on_delete=models.CASCADE,
                                 related_name='photos', null=True, blank=True)
     point = models.ForeignKey(
@@ -52,10 +80,37 @@ class Photo(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        # Images uploaded through the admin skip the worker, which keeps
+        # public_id in step with the image; the garbage collector relies on it.
+        public_id = getattr(self.image, 'public_id', None)
+        if public_id and public_id != self.public_id:
+            self.public_id = public_id
+            Photo.objects.filter(pk=self.pk).update(public_id=public_id)  # pylint: disable=no-member
+
+    def url(self, variant=None):
+        """
+        Returns the stored URL of the image, or of one of its variants.
+        """
+        if not self.image:
+            return None
+        if variant and variant in self.variants:
+            return self.variants[variant]
+        return self.image_url or self.image.url
 
     def __str__(self):
         return f"Photo for {'User' if self.user else 'Point'} {self.user or self.point}"
 
+    class Meta:
+        """
+        Meta options for the Photo model.
+        """
+        indexes = [
+            models.Index(fields=['upload_status', 'updated_at'], name='photo_upload_status_idx'),
+            models.Index(fields=['content_hash'], name='photo_content_hash_idx'),
+            models.Index(fields=['perceptual_hash'], name='photo_perceptual_hash_idx'),
+            models.Index(fields=['public_id'], name='photo_public_id_idx'),
+        ]
+
 
 class CustomUser(AbstractUser):
     """
@@ -71,6 +126,7 @@ class CustomUser(AbstractUser):
         null=True)
     email = models.EmailField(unique=True, db_index=True)
     deactivation_reason = models.TextField(blank=True, null=True)
+    points_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -84,6 +140,9 @@ class CustomUser(AbstractUser):
         ordering = ["id"]
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            models.Index(fields=['-points_count', 'id'], name='user_points_count_idx'),
+        ]
 
 
 class PointTypes(models.TextChoices):
@@ -129,6 +188,13 @@ class Point(models.Model):
         default=0, blank=False, null=True,
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
     is_active = models.BooleanField(default=False)
     description = models.TextField(blank=False, null=False)
     week_start = models.CharField(
@@ -152,6 +218,8 @@ class Point(models.Model):
     link = models.URLField(blank=True, null=True)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    geo_cell = models.IntegerField(blank=True, null=True, editable=False)
+    geo_coarse_cell = models.IntegerField(blank=True, null=True, editable=False)
     zip_code = models.CharField(max_length=20, blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
     neighborhood = models.CharField(max_length=100, blank=True, null=True)
@@ -162,6 +230,14 @@ class Point(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        self.geo_cell = cell_for(self.latitude, self.longitude)
+        self.geo_coarse_cell = coarse_cell_for(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geo_cell', 'geo_coarse_cell'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.name)
 
@@ -172,6 +248,42 @@ class Point(models.Model):
         ordering = ["name"]
         verbose_name = "Point"
         verbose_name_plural = "Points"
+        indexes = [
+            models.Index(fields=['is_active', 'status', 'geo_cell'],
+                         name='point_visible_geo_cell_idx'),
+            models.Index(fields=['is_active', 'status', 'geo_coarse_cell'],
+                         name='point_visible_coarse_cell_idx'),
+            models.Index(fields=['name', 'id'], name='point_name_id_idx'),
+        ]
+
+
+class PointCluster(models.Model):
+    """
+    Model representing the points of one type inside a map tile at a zoom level.
+    """
+    id = models.AutoField(primary_key=True)
+    zoom = models.PositiveSmallIntegerField()
+    tile_x = models.IntegerField()
+    tile_y = models.IntegerField()
+    point_type = models.CharField(choices=PointTypes.choices)
+    count = models.IntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.count} {self.point_type} at z{self.zoom}/{self.tile_x}/{self.tile_y}"
+
+    class Meta:
+        """
+        Meta options for the PointCluster model.
+        """
+        ordering = ["zoom", "tile_x", "tile_y", "point_type"]
+        verbose_name = "Point Cluster"
+        verbose_name_plural = "Point Clusters"
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'tile_x', 'tile_y', 'point_type'],
+                                    name='unique_point_cluster_tile'),
+        ]
 
 
 class PointReview(models.Model):
@@ -210,6 +322,9 @@ class PointReview(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Point Review"
         verbose_name_plural = "Point Reviews"
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+        ]
 
 
 class Terms(models.Model):
@@ -231,3 +346,114 @@ class Terms(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Term"
         verbose_name_plural = "Terms"
+
+
+class EmailStatus(models.TextChoices):
+    """
+    Delivery states of an outbound email.
+    """
+    PENDING = 'pending', 'Pendente'
+    SENDING = 'sending', 'Enviando'
+    SENT = 'sent', 'Enviado'
+    DEAD = 'dead', 'Descartado'
+
+
+class OutboundEmail(models.Model):
+    """
+    Model representing an email waiting to be delivered by the outbox worker.
+    """
+    id = models.BigAutoField(primary_key=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField()
+    status = models.CharField(max_length=10, choices=EmailStatus.choices,
+                              default=EmailStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
+
+    class Meta:
+        """
+        Meta options for the OutboundEmail model.
+        """
+        ordering = ["next_attempt_at", "id"]
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_status_due_idx'),
+        ]
+
+
+class MailingKind(models.TextChoices):
+    """
+    Mass mailings sent to every active user.
+    """
+    UPDATED_TERMS = 'updated_terms', 'Termos atualizados'
+
+
+class MailingStatus(models.TextChoices):
+    """
+    States of a mass mailing.
+    """
+    PENDING = 'pending', 'Pendente'
+    DONE = 'done', 'Concluído'
+    FAILED = 'failed', 'Falhou'
+
+
+class MailingJob(models.Model):
+    """
+    Model representing a mass mailing, sent in chunks of users ordered by id
+    and resumed after the last user sent when interrupted.
+    """
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=30, choices=MailingKind.choices)
+    status = models.CharField(max_length=10, choices=MailingStatus.choices,
+                              default=MailingStatus.PENDING)
+    last_user_id = models.BigIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.kind} mailing #{self.id} ({self.status}, {self.sent} sent)"
+
+    class Meta:
+        """
+        Meta options for the MailingJob model.
+        """
+        ordering = ["created_at"]
+        verbose_name = "Mailing Job"
+        verbose_name_plural = "Mailing Jobs"
+
+
+class PendingAssetDeletion(models.Model):
+    """
+    Model representing a stored image left behind by a deleted or replaced
+    photo, deleted from the storage by the collect_orphan_photos command.
+    """
+    id = models.BigAutoField(primary_key=True)
+    public_id = models.CharField(max_length=255, unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pending deletion of {self.public_id}"
+
+    class Meta:
+        """
+        Meta options for the PendingAssetDeletion model.
+        """
+        ordering = ["created_at"]
+        verbose_name = "Pending Asset Deletion"
+        verbose_name_plural = "Pending Asset Deletions"
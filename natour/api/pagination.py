@@ -1,8 +1,35 @@
 """
 Module for handling pagination in API responses.
 """
+import base64
+import binascii
+import json
+from functools import cached_property, partial
 
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CountedPaginator(DjangoPaginator):
+    """
+    Django paginator that trusts a total computed beforehand instead of
+    running its own COUNT(*).
+    """
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return super().count
 
 
 class CustomPagination(PageNumberPagination):
@@ -12,3 +39,178 @@ class CustomPagination(PageNumberPagination):
     page_size = 15
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        """
+        Paginates the queryset, reusing 'count' as the total when provided.
+        """
+        self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination:
+    """
+    Cursor (keyset) pagination over a fixed ordering.
+
+    Instead of OFFSET, each page continues from the ordering values of the
+    last row of the previous page, so deep pages cost the same as the first
+    one. Cursors are opaque strings; the total count is only computed when
+    requested with ?count=true.
+    """
+    page_size = 15
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def __init__(self, ordering):
+        """
+        Args:
+            ordering (tuple): Ordering fields ending in a unique one,
+                e.g. ('name', 'id') or ('-created_at', 'id').
+        """
+        self.ordering = tuple(ordering)
+        self.request = None
+        self.page = []
+        self.has_next = False
+        self.has_previous = False
+        self.count = None
+
+    @staticmethod
+    def wants_cursor(request):
+        """
+        Returns True when the request asks for cursor pagination.
+        """
+        return KeysetPagination.cursor_query_param in request.query_params
+
+    @staticmethod
+    def wants_count(request):
+        """
+        Returns True when the request asks for the total count.
+        """
+        value = request.query_params.get(KeysetPagination.count_query_param, '')
+        return value.lower() == 'true'
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, instance, reverse):
+        """
+        Builds the opaque cursor pointing after (or before) an instance.
+        """
+        values = []
+        for name, _descending in self._fields():
+            value = getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, model):
+        """
+        Returns the (values, reverse) pair stored in a cursor.
+        Raises NotFound when the cursor is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw_values, reverse = payload['v'], bool(payload['r'])
+            if len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [model._meta.get_field(name).to_python(value)  # pylint: disable=protected-access
+                      for (name, _descending), value in zip(self._fields(), raw_values)]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError) as e:
+            raise NotFound("Cursor inválido.") from e
+        return values, reverse
+
+    def get_page_size(self, request):
+        """
+        Returns the page size requested, bounded by max_page_size.
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def _after(self, values, reverse):
+        """
+        Builds the filter selecting the rows after the cursor values.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, count=None):
+        """
+        Returns the rows of the page selected by the request cursor.
+
+        Args:
+            count (int, optional): Total already known by the caller, returned
+                instead of running COUNT(*) when ?count=true is requested.
+        """
+        self.request = request
+        size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        if self.wants_count(request):
+            self.count = queryset.count() if count is None else count
+
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor, queryset.model)
+            queryset = queryset.filter(self._after(values, reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        rows = list(queryset.order_by(*ordering)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_next, self.has_previous = has_more, bool(cursor)
+
+        self.page = rows
+        return rows
+
+    def _link(self, instance, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(instance, reverse))
+
+    def get_next_link(self):
+        """
+        Returns the URL of the next page, if any.
+        """
+        if not (self.has_next and self.page):
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """
+        Returns the URL of the previous page, if any.
+        """
+        if not (self.has_previous and self.page):
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        """
+        Returns the page response with the next/previous cursor links.
+        """
+        body = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        return Response(body)
@@ -49,6 +49,15 @@ login_schema = extend_schema(
                     value={'error': 'E-mail ou senha incorretos.'}
                 )
             ]
+        ),
+        503: OpenApiResponse(
+            description='Password hashing pool saturated',
+            examples=[
+                OpenApiExample(
+                    'Busy',
+                    value={'error': 'Muitas tentativas de login no momento. Tente novamente em instantes.'}
+                )
+            ]
         )
     }
 )
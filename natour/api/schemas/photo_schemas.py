@@ -4,14 +4,15 @@ Schema definitions for Photo views.
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
 from drf_spectacular.openapi import OpenApiParameter
 
-from natour.api.serializers.photo import PhotoSerializer
+from natour.api.serializers.photo import PhotoSerializer, PhotoUploadStatusSerializer
 
 
 # Create photo schema
 create_photo_schema = extend_schema(
     tags=['Photos'],
     summary='Upload photo',
-    description='Upload a photo for a user or point.',
+    description='Upload a photo for a user or point. The image is uploaded in the background; '
+                'follow it on the upload status endpoint.',
     request={
         'multipart/form-data': {
             'type': 'object',
@@ -39,9 +40,9 @@ create_photo_schema = extend_schema(
         )
     ],
     responses={
-        201: OpenApiResponse(
-            response=PhotoSerializer,
-            description='Photo uploaded successfully'
+        202: OpenApiResponse(
+            response=PhotoUploadStatusSerializer,
+            description='Photo accepted, the image is uploaded in the background'
         ),
         400: OpenApiResponse(
             description='Bad request - invalid file or validation errors',
@@ -84,6 +85,10 @@ update_photo_schema = extend_schema(
             response=PhotoSerializer,
             description='Photo updated successfully'
         ),
+        202: OpenApiResponse(
+            response=PhotoUploadStatusSerializer,
+            description='New image accepted, uploaded in the background'
+        ),
         404: OpenApiResponse(
             description='Photo not found',
             examples=[
@@ -134,28 +139,75 @@ get_photo_schema = extend_schema(
     }
 )
 
+# Photo upload status schema
+get_photo_upload_status_schema = extend_schema(
+    tags=['Photos'],
+    summary='Photo upload status',
+    description='Retrieve the upload status of a photo: pending, uploading, ready or failed.',
+    parameters=[
+        OpenApiParameter(
+            name='photo_id',
+            type=int,
+            location=OpenApiParameter.PATH,
+            description='ID of the photo'
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=PhotoUploadStatusSerializer,
+            description='Upload status retrieved successfully'
+        ),
+        404: OpenApiResponse(description='Photo not found'),
+        401: OpenApiResponse(description='Authentication required')
+    }
+)
+
 # Delete photo schema
 delete_photo_schema = extend_schema(
     tags=['Photos'],
-    summary='Delete photo',
-    description='Delete a photo by ID.',
+    summary='Delete photos',
+    description='Delete several photos and their stored images, reporting the result of each id.',
     request={
         'application/json': {
             'type': 'object',
             'properties': {
-                'photo_id': {'type': 'integer', 'description': 'ID of the photo to delete'}
+                'ids': {'type': 'array', 'items': {'type': 'integer'},
+                        'description': 'IDs of the photos to delete'},
+                'public_ids': {'type': 'array', 'items': {'type': 'string'},
+                               'description': 'Public IDs of the images, in the order of ids '
+                                              '(empty for photos without an image)'}
             },
-            'required': ['photo_id']
+            'required': ['ids', 'public_ids']
         }
     },
     responses={
-        204: OpenApiResponse(description='Photo deleted successfully'),
-        404: OpenApiResponse(
-            description='Photo not found',
+        200: OpenApiResponse(
+            description='Every photo deleted',
             examples=[
                 OpenApiExample(
-                    'Photo not found',
-                    value={'detail': 'Foto não encontrada.'}
+                    'Deleted',
+                    value={'results': [{'id': 1, 'deleted': True, 'detail': None}]}
+                )
+            ]
+        ),
+        207: OpenApiResponse(
+            description='Some photos could not be deleted and were kept',
+            examples=[
+                OpenApiExample(
+                    'Partially deleted',
+                    value={'results': [
+                        {'id': 1, 'deleted': True, 'detail': None},
+                        {'id': 2, 'deleted': False, 'detail': 'Erro ao excluir a imagem: timeout'}
+                    ]}
+                )
+            ]
+        ),
+        400: OpenApiResponse(
+            description='Missing, unknown or mismatched ids',
+            examples=[
+                OpenApiExample(
+                    'Unknown id',
+                    value={'detail': 'ID inexistente.'}
                 )
             ]
         ),
@@ -4,13 +4,17 @@ Schema definitions for Point views.
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
 from drf_spectacular.openapi import OpenApiParameter
 
+from natour.api.methods.geo_grid import MAX_BBOX_POINTS
 from natour.api.serializers.point import (
     CreatePointSerializer, 
     PointInfoSerializer,
     PointOnMapSerializer,
+    PointMarkerSerializer,
+    PointClusterSerializer,
     PointApprovalSerializer,
     PointStatusUser,
-    PointMapSearchSerializer
+    PointMapSearchSerializer,
+    NearbyPointSerializer
 )
 
 
@@ -54,6 +58,13 @@ get_point_info_schema = extend_schema(
             type=int,
             location=OpenApiParameter.PATH,
             description='ID of the point to retrieve'
+        ),
+        OpenApiParameter(
+            name='photo_variant',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            enum=['thumbnail', 'card', 'full'],
+            description='Serve the photos in this size variant instead of the original images'
         )
     ],
     responses={
@@ -92,6 +103,25 @@ get_all_points_schema = extend_schema(
             type=int,
             location=OpenApiParameter.QUERY,
             description='Number of items per page'
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description='Opaque cursor for keyset pagination (empty for the first page), used instead of page'
+        ),
+        OpenApiParameter(
+            name='count',
+            type=bool,
+            location=OpenApiParameter.QUERY,
+            description='With cursor pagination, also return the total count'
+        ),
+        OpenApiParameter(
+            name='photo_variant',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            enum=['thumbnail', 'card', 'full'],
+            description='Serve the photos in this size variant instead of the original images'
         )
     ],
     responses={
@@ -117,6 +147,125 @@ show_points_on_map_schema = extend_schema(
     }
 )
 
+# Show points in bounding box schema
+show_points_in_bbox_schema = extend_schema(
+    tags=['Points'],
+    summary='Get points inside a map viewport',
+    description='Get the active and approved points inside a latitude/longitude bounding box, '
+                f'ordered by name and limited to {MAX_BBOX_POINTS} points. Zoomed out maps '
+                'should use the clusters endpoint instead.',
+    parameters=[
+        OpenApiParameter(
+            name='min_lat',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Southern latitude of the viewport',
+            required=True
+        ),
+        OpenApiParameter(
+            name='min_lng',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Western longitude of the viewport',
+            required=True
+        ),
+        OpenApiParameter(
+            name='max_lat',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Northern latitude of the viewport',
+            required=True
+        ),
+        OpenApiParameter(
+            name='max_lng',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Eastern longitude of the viewport',
+            required=True
+        ),
+        OpenApiParameter(
+            name='X-Result-Truncated',
+            type=str,
+            location=OpenApiParameter.HEADER,
+            description="'true' when the viewport has more points than the ones returned",
+            response=[200]
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=PointMarkerSerializer(many=True),
+            description='Viewport points retrieved successfully'
+        ),
+        400: OpenApiResponse(
+            description='Bad request - missing or invalid bounding box',
+            examples=[
+                OpenApiExample(
+                    'Missing coordinates',
+                    value={'detail': "Parâmetros 'min_lat', 'min_lng', 'max_lat' e 'max_lng' são obrigatórios."}
+                )
+            ]
+        ),
+        401: OpenApiResponse(description='Authentication required')
+    }
+)
+
+# Show point clusters schema
+show_point_clusters_schema = extend_schema(
+    tags=['Points'],
+    summary='Get point clusters for map display',
+    description=('Get the precomputed clusters of active and approved points for a zoom level, '
+                 'one entry per map tile and point type. The bounding box is optional.'),
+    parameters=[
+        OpenApiParameter(
+            name='zoom',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            description='Map zoom level (clamped to the precomputed levels, 2 to 12)',
+            required=True
+        ),
+        OpenApiParameter(
+            name='min_lat',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Southern latitude of the viewport'
+        ),
+        OpenApiParameter(
+            name='min_lng',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Western longitude of the viewport'
+        ),
+        OpenApiParameter(
+            name='max_lat',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Northern latitude of the viewport'
+        ),
+        OpenApiParameter(
+            name='max_lng',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Eastern longitude of the viewport'
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=PointClusterSerializer(many=True),
+            description='Map clusters retrieved successfully'
+        ),
+        400: OpenApiResponse(
+            description='Bad request - invalid zoom or bounding box',
+            examples=[
+                OpenApiExample(
+                    'Invalid zoom',
+                    value={'detail': "Parâmetro 'zoom' deve ser um número inteiro."}
+                )
+            ]
+        ),
+        401: OpenApiResponse(description='Authentication required')
+    }
+)
+
 # Point approval schema
 point_approval_schema = extend_schema(
     tags=['Points'],
@@ -195,6 +344,71 @@ search_point_schema = extend_schema(
     }
 )
 
+# Search nearby points schema
+search_nearby_points_schema = extend_schema(
+    tags=['Points'],
+    summary='Search points near a coordinate',
+    description=('Search the active and approved points closest to a coordinate, ordered by '
+                 'distance. Use "radius" for every point within a distance, "k" for the k '
+                 'nearest points, or both. Defaults to a 10 km radius.'),
+    parameters=[
+        OpenApiParameter(
+            name='lat',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Latitude of the origin',
+            required=True
+        ),
+        OpenApiParameter(
+            name='lng',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Longitude of the origin',
+            required=True
+        ),
+        OpenApiParameter(
+            name='radius',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            description='Search radius in kilometers (max 200)'
+        ),
+        OpenApiParameter(
+            name='k',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            description='Amount of nearest points to return (max 50)'
+        ),
+        OpenApiParameter(
+            name='point_type',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description='Only return points of this type'
+        ),
+        OpenApiParameter(
+            name='open_now',
+            type=bool,
+            location=OpenApiParameter.QUERY,
+            description='Only return points open at the current time'
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=NearbyPointSerializer(many=True),
+            description='Nearby points retrieved successfully'
+        ),
+        400: OpenApiResponse(
+            description='Bad request - missing or invalid search parameters',
+            examples=[
+                OpenApiExample(
+                    'Missing coordinates',
+                    value={'detail': "Parâmetros 'lat' e 'lng' são obrigatórios."}
+                )
+            ]
+        ),
+        401: OpenApiResponse(description='Authentication required')
+    }
+)
+
 # Change point status schema
 change_point_status_schema = extend_schema(
     tags=['Points'],
@@ -260,15 +474,6 @@ delete_point_schema = extend_schema(
                 )
             ]
         ),
-        500: OpenApiResponse(
-            description='Email sending error',
-            examples=[
-                OpenApiExample(
-                    'Email error',
-                    value={'detail': 'Erro ao enviar email: SMTP error'}
-                )
-            ]
-        ),
         401: OpenApiResponse(description='Authentication required'),
         403: OpenApiResponse(description='Admin access required')
     }
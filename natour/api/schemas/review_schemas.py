@@ -83,6 +83,18 @@ get_user_reviews_schema = extend_schema(
             type=int,
             location=OpenApiParameter.QUERY,
             description='Number of items per page'
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description='Opaque cursor for keyset pagination (empty for the first page), used instead of page'
+        ),
+        OpenApiParameter(
+            name='count',
+            type=bool,
+            location=OpenApiParameter.QUERY,
+            description='With cursor pagination, also return the total count'
         )
     ],
     responses={
@@ -68,6 +68,30 @@ get_all_users_schema = extend_schema(
             type=int,
             location=OpenApiParameter.QUERY,
             description='Number of items per page'
+        ),
+        OpenApiParameter(
+            name='ordering',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="Sort order: 'username' (default), 'points_count' or '-points_count'"
+        ),
+        OpenApiParameter(
+            name='min_points',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            description='Only users with at least this amount of points'
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description='Opaque cursor for keyset pagination (empty for the first page), used instead of page'
+        ),
+        OpenApiParameter(
+            name='count',
+            type=bool,
+            location=OpenApiParameter.QUERY,
+            description='With cursor pagination, also return the total count'
         )
     ],
     responses={
@@ -229,6 +253,13 @@ get_my_points_schema = extend_schema(
             type=int,
             location=OpenApiParameter.QUERY,
             description='Page number for pagination'
+        ),
+        OpenApiParameter(
+            name='photo_variant',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            enum=['thumbnail', 'card', 'full'],
+            description='Serve the photos in this size variant instead of the original images'
         )
     ],
     responses={
@@ -272,15 +303,6 @@ reset_user_password_schema = extend_schema(
                 )
             ]
         ),
-        500: OpenApiResponse(
-            description='Email sending error',
-            examples=[
-                OpenApiExample(
-                    'Email error',
-                    value={'detail': 'Erro ao enviar email: SMTP error'}
-                )
-            ]
-        ),
         403: OpenApiResponse(description='Admin access required'),
         401: OpenApiResponse(description='Authentication required')
     }
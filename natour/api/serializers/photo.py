@@ -3,7 +3,23 @@ Photo Serializer
 """
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
-from natour.api.models import Photo
+from natour.api.models import Photo, UploadStatus
+from natour.api.methods.photo_uploads import discard_staged, stage_upload
+
+
+def validate_photo_owner(attrs):
+    """
+    Ensures a photo belongs to a user or to a point, not both.
+    """
+    user = attrs.get('user')
+    point = attrs.get('point')
+    if not user and not point:
+        raise serializers.ValidationError(
+            "Foto deve ser atribuida a um usuário ou a um ponto.")
+    if user and point:
+        raise serializers.ValidationError(
+            "Foto só pode ser atribuida a um usuário ou a um ponto, não aos dois.")
+    return attrs
 
 
 class PhotoSerializer(serializers.ModelSerializer):
@@ -32,9 +48,7 @@ class PhotoSerializer(serializers.ModelSerializer):
         """
         Returns the URL of the image if it exists.
         """
-        if obj.image:
-            return obj.image.url
-        return None
+        return obj.url()
 
     @extend_schema_field(serializers.CharField(allow_null=True))
     def get_image_public_id(self, obj):
@@ -46,15 +60,7 @@ class PhotoSerializer(serializers.ModelSerializer):
         return None
 
     def validate(self, attrs):
-        user = attrs.get('user')
-        point = attrs.get('point')
-        if not user and not point:
-            raise serializers.ValidationError(
-                "Foto deve ser atribuida a um usuário ou a um ponto.")
-        if user and point:
-            raise serializers.ValidationError(
-                "Foto só pode ser atribuida a um usuário ou a um ponto, não aos dois.")
-        return attrs
+        return validate_photo_owner(attrs)
 
     def create(self, validated_data):
         photo = super().create(validated_data)
@@ -71,6 +77,75 @@ class PhotoSerializer(serializers.ModelSerializer):
         return photo
 
 
+class PhotoUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer staging the image of a photo for the upload worker.
+    """
+    image = serializers.ImageField(write_only=True)
+
+    class Meta:
+        """
+        Meta options for the PhotoUploadSerializer.
+        """
+        model = Photo
+        fields = ['id', 'image', 'user', 'point', 'upload_status']
+        read_only_fields = ['id', 'upload_status']
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            attrs.setdefault('user', self.instance.user)
+            attrs.setdefault('point', self.instance.point)
+        return validate_photo_owner(attrs)
+
+    def _stage(self, photo, image):
+        photo.staged_file, photo.content_hash = stage_upload(image)
+        photo.upload_status = UploadStatus.PENDING
+        photo.upload_attempts = 0
+        photo.upload_error = ''
+
+    def create(self, validated_data):
+        photo = Photo(**{k: v for k, v in validated_data.items() if k != 'image'})
+        self._stage(photo, validated_data['image'])
+        try:
+            photo.save()
+        except Exception:
+            discard_staged(photo.staged_file)
+            raise
+        return photo
+
+    def update(self, instance, validated_data):
+        image = validated_data.pop('image', None)
+        if image is not None:
+            previous_staged = instance.staged_file
+            # The stored image is kept until the new one is uploaded.
+            instance.replaced_public_id = instance.replaced_public_id or instance.public_id or ''
+            self._stage(instance, image)
+            discard_staged(previous_staged)
+        return super().update(instance, validated_data)
+
+
+class PhotoUploadStatusSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the upload status of a photo.
+    """
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        """
+        Meta options for the PhotoUploadStatusSerializer.
+        """
+        model = Photo
+        fields = ['id', 'upload_status', 'upload_error', 'image_url', 'public_id']
+        read_only_fields = fields
+
+    @extend_schema_field(serializers.CharField(allow_null=True))
+    def get_image_url(self, obj):
+        """
+        Returns the URL of the current image, if any.
+        """
+        return obj.url()
+
+
 class PhotoIDSerializer(serializers.ModelSerializer):
     """
     Serializer for Photo ID.
@@ -3,8 +3,10 @@ Serializers for point-related models.
 """
 
 from rest_framework import serializers
+from drf_spectacular.utils import extend_schema_field
 
-from natour.api.models import Point
+from natour.api.models import Point, PointCluster
+from natour.api.methods.ratings import rating_histogram
 
 
 class CreatePointSerializer(serializers.ModelSerializer):
@@ -73,22 +75,37 @@ class PointInfoSerializer(serializers.ModelSerializer):
     Serializer for getting point information.
     """
     photos = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         """
         Meta class for PointInfoSerializer.
         """
         model = Point
-        fields = ['id', 'is_active', 'name', 'views', 'avg_rating', 'description', 'week_start',
+        fields = ['id', 'is_active', 'name', 'views', 'avg_rating', 'rating_count',
+                  'rating_histogram', 'description', 'week_start',
                   'week_end', 'open_time', 'close_time', 'point_type',
                   'link', 'latitude', 'longitude', 'zip_code', 'city',
                   'neighborhood', 'state', 'street', 'number', 'photos']
         read_only_fields = fields
 
+    @extend_schema_field(serializers.DictField(child=serializers.IntegerField()))
+    def get_rating_histogram(self, obj):
+        """
+        Returns the amount of ratings per star.
+        """
+        return rating_histogram(obj)
+
     def get_photos(self, obj):
+        """
+        Returns the uploaded photos, with the URL of the photo_variant in the
+        context when given.
+        """
+        variant = self.context.get('photo_variant')
         return [
-            {"url": photo.image.url, "public_id": photo.public_id, "id": photo.id}
+            {"url": photo.url(variant), "public_id": photo.public_id, "id": photo.id}
             for photo in obj.photos.all()
+            if photo.image
         ]
 
 
@@ -153,6 +170,66 @@ class PointOnMapSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class PointMarkerSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the marker of a point on the map.
+    """
+
+    class Meta:
+        """
+        Meta class for PointMarkerSerializer.
+        """
+        model = Point
+        fields = ['id', 'name', 'point_type', 'latitude', 'longitude']
+        read_only_fields = fields
+
+
+class PointClusterSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a cluster of points shown on the map.
+    """
+    latitude = serializers.SerializerMethodField()
+    longitude = serializers.SerializerMethodField()
+
+    class Meta:
+        """
+        Meta class for PointClusterSerializer.
+        """
+        model = PointCluster
+        fields = ['zoom', 'tile_x', 'tile_y', 'point_type', 'count', 'latitude', 'longitude']
+        read_only_fields = fields
+
+    @extend_schema_field(serializers.FloatField())
+    def get_latitude(self, obj):
+        """
+        Returns the latitude of the cluster centroid.
+        """
+        return obj.latitude_sum / obj.count
+
+    @extend_schema_field(serializers.FloatField())
+    def get_longitude(self, obj):
+        """
+        Returns the longitude of the cluster centroid.
+        """
+        return obj.longitude_sum / obj.count
+
+
+class NearbyPointSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a point found by a nearby search, with its distance.
+    """
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta:
+        """
+        Meta class for NearbyPointSerializer.
+        """
+        model = Point
+        fields = ['id', 'name', 'point_type', 'latitude', 'longitude',
+                  'city', 'state', 'open_time', 'close_time', 'distance_km']
+        read_only_fields = fields
+
+
 class PointMapSearchSerializer(serializers.ModelSerializer):
     """
     Serializer for searching a point by name.
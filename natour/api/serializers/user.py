@@ -58,8 +58,8 @@ class UserDetailsSerializer(serializers.ModelSerializer):
         """
         Get the URL of the user's photo if it exists.
         """
-        if hasattr(obj, 'photos') and obj.photos:
-            return obj.photos.image.url
+        if hasattr(obj, 'photos') and obj.photos.image:
+            return obj.photos.url()
         return None
 
     def get_masked_email(self, obj):
@@ -90,8 +90,8 @@ class CustomUserInfoSerializer(serializers.ModelSerializer):
         """
         Get the URL of the user's photo if it exists.
         """
-        if hasattr(obj, 'photos') and obj.photos:
-            return obj.photos.image.url
+        if hasattr(obj, 'photos') and obj.photos.image:
+            return obj.photos.url()
         return None
 
 
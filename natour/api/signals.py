@@ -0,0 +1,257 @@
+"""
+Signal handlers keeping derived data in sync with the models.
+"""
+# pylint: disable=no-member,unused-argument
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from natour.api.authentication import forget_authenticated_user, revoke_user_tokens
+from natour.api.models import CustomUser, Photo, Point, PointReview, Role, Terms
+from natour.api.methods.point_clusters import cluster_state, update_clusters
+from natour.api.methods.photo_gc import enqueue_asset_deletions
+from natour.api.methods.photo_uploads import discard_staged
+from natour.api.methods.points_count import change_points_count
+from natour.api.methods.ratings import remove_rating
+from natour.api.methods.roles import forget_role_name
+from natour.api.utils.counting import invalidate_total
+from natour.api.utils.response_cache import (invalidate_namespaces, user_namespace,
+                                             MAP_NAMESPACE, POINT_LISTINGS_NAMESPACE,
+                                             TERMS_NAMESPACE, USERS_NAMESPACE,
+                                             USER_INFO_NAMESPACE)
+
+LISTING_TOTALS = {CustomUser: 'users', Point: 'points', PointReview: 'reviews'}
+
+
+@receiver(pre_save, sender=Point)
+def remember_point_cluster(sender, instance, **kwargs):
+    """
+    Stores the cluster contribution the point had before being saved.
+    """
+    previous = None
+    if instance.pk:
+        previous = (Point.objects
+                    .filter(pk=instance.pk)
+                    .only('point_type', 'latitude', 'longitude', 'is_active', 'status')
+                    .first())
+    instance._previous_cluster_state = cluster_state(previous) if previous else None  # pylint: disable=protected-access
+
+
+@receiver(post_save, sender=Point)
+def refresh_point_clusters(sender, instance, **kwargs):
+    """
+    Moves the point between map clusters after it is created or changed.
+    """
+    previous_state = getattr(instance, '_previous_cluster_state', None)
+    update_clusters(previous_state, cluster_state(instance))
+
+
+@receiver(post_delete, sender=Point)
+def remove_point_from_clusters(sender, instance, **kwargs):
+    """
+    Removes a deleted point, including cascaded deletions, from the clusters.
+    """
+    update_clusters(cluster_state(instance), None)
+
+
+@receiver(post_save, sender=Point)
+def increment_user_points_count(sender, instance, created, **kwargs):
+    """
+    Counts a new point on its author.
+    """
+    if created:
+        change_points_count(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Point)
+def decrement_user_points_count(sender, instance, **kwargs):
+    """
+    Discounts a deleted point, including cascaded deletions, from its author.
+    """
+    change_points_count(instance.user_id, -1)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Point)
+@receiver(post_save, sender=PointReview)
+def invalidate_listing_total_on_create(sender, instance, created, **kwargs):
+    """
+    Drops the cached listing total when a user, point or review is created.
+    """
+    if created:
+        invalidate_total(LISTING_TOTALS[sender])
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Point)
+@receiver(post_delete, sender=PointReview)
+def invalidate_listing_total_on_delete(sender, instance, **kwargs):
+    """
+    Drops the cached listing total when a user, point or review is deleted.
+    """
+    invalidate_total(LISTING_TOTALS[sender])
+
+
+@receiver(post_save, sender=Point)
+def invalidate_point_responses_on_save(sender, instance, created, **kwargs):
+    """
+    Invalidates the cached map, search and point listings after a point is
+    created, edited, approved or toggled, and the users listing, which shows
+    the points count, after a point is created.
+    """
+    invalidate_namespaces(MAP_NAMESPACE, POINT_LISTINGS_NAMESPACE)
+    if created:
+        invalidate_namespaces(USERS_NAMESPACE)
+
+
+@receiver(post_delete, sender=Point)
+def invalidate_point_responses_on_delete(sender, instance, **kwargs):
+    """
+    Invalidates the responses showing a point after it is deleted, including
+    cascaded deletions of accounts.
+    """
+    invalidate_namespaces(MAP_NAMESPACE, POINT_LISTINGS_NAMESPACE, USERS_NAMESPACE)
+
+
+@receiver(post_delete, sender=PointReview)
+def remove_review_rating(sender, instance, **kwargs):
+    """
+    Removes a deleted review, including cascaded deletions of accounts, from
+    the rating aggregates of its point.
+    """
+    remove_rating(instance.point_id, instance.rating)
+
+
+@receiver(post_save, sender=PointReview)
+@receiver(post_delete, sender=PointReview)
+def invalidate_review_responses(sender, instance, **kwargs):
+    """
+    Invalidates the cached point listings, which show the ratings, after a
+    review is added or removed.
+    """
+    invalidate_namespaces(POINT_LISTINGS_NAMESPACE)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def invalidate_photo_responses(sender, instance, **kwargs):
+    """
+    Invalidates the responses showing a photo: the profile of its user or the
+    point listings.
+    """
+    if instance.user_id:
+        invalidate_namespaces(user_namespace(USER_INFO_NAMESPACE, instance.user_id))
+    if instance.point_id:
+        invalidate_namespaces(POINT_LISTINGS_NAMESPACE)
+
+
+@receiver(post_delete, sender=Photo)
+def enqueue_photo_asset_deletion(sender, instance, **kwargs):
+    """
+    Records the stored images of a deleted photo for the garbage collector,
+    since cascades from points and users never delete them.
+    """
+    enqueue_asset_deletions(instance.public_id, instance.replaced_public_id)
+
+
+@receiver(post_delete, sender=Photo)
+def discard_staged_photo(sender, instance, **kwargs):
+    """
+    Deletes the image staged for a photo deleted before its upload.
+    """
+    if instance.staged_file:
+        staged = instance.staged_file
+        transaction.on_commit(lambda: discard_staged(staged))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """
+    Invalidates the users listing and the cached profile of a user after the
+    user changes. Logins, which only touch last_login, are ignored.
+    """
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    invalidate_namespaces(USERS_NAMESPACE, user_namespace(USER_INFO_NAMESPACE, instance.pk))
+
+
+@receiver(post_save, sender=Terms)
+@receiver(post_delete, sender=Terms)
+def invalidate_terms_responses(sender, instance, **kwargs):
+    """
+    Invalidates the cached terms responses after the terms change.
+    """
+    invalidate_namespaces(TERMS_NAMESPACE)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def forget_cached_role_name(sender, instance, **kwargs):
+    """
+    Drops the cached name of a role and the users listing, which shows it,
+    after a role is renamed or deleted.
+    """
+    forget_role_name(instance.id)
+    invalidate_namespaces(USERS_NAMESPACE)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_authentication(sender, instance, **kwargs):
+    """
+    Drops the cached user of the authentication after its status, profile or
+    password changes or it is deleted.
+    """
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    forget_authenticated_user(instance.pk)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_user_authorization(sender, instance, update_fields=None, **kwargs):
+    """
+    Stores the status and role the user had before being saved.
+    """
+    previous = None
+    if instance.pk and update_fields != frozenset({'last_login'}):
+        previous = (CustomUser.objects
+                    .filter(pk=instance.pk)
+                    .values_list('is_active', 'is_staff', 'role_id')
+                    .first())
+    instance._previous_authorization = previous  # pylint: disable=protected-access
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_tokens_on_authorization_change(sender, instance, created, **kwargs):
+    """
+    Revokes the tokens of a user whose claims no longer hold: deactivated,
+    promoted, demoted or moved to another role.
+    """
+    previous = getattr(instance, '_previous_authorization', None)
+    if created or previous is None:
+        return
+    was_active, was_staff, previous_role_id = previous
+    if ((was_active and not instance.is_active)
+            or was_staff != instance.is_staff
+            or previous_role_id != instance.role_id):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_users_total_on_role_change(sender, instance, created, **kwargs):
+    """
+    Drops the cached users total when a user changes role, since the users
+    listing leaves the admins out.
+    """
+    previous = getattr(instance, '_previous_authorization', None)
+    if not created and previous is not None and previous[2] != instance.role_id:
+        invalidate_total(LISTING_TOTALS[CustomUser])
+
+
+@receiver(post_delete, sender=CustomUser)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    """
+    Revokes the tokens of a deleted user.
+    """
+    revoke_user_tokens(instance.pk)
@@ -0,0 +1,78 @@
+"""
+Counting helpers for the paginated admin listings.
+
+Filtered listings are counted once per request. Unfiltered totals are cached
+until a row is created or deleted, and on large PostgreSQL tables they come
+from the planner row estimate (pg_class.reltuples) instead of COUNT(*), when
+the listing covers the whole table.
+"""
+from django.core.cache import cache
+from django.db import connection
+
+TOTAL_CACHE_TIMEOUT = 60 * 10
+
+# Tables with more rows than this, according to the planner, are never
+# counted exactly when unfiltered.
+ESTIMATE_THRESHOLD = 100_000
+
+
+def _total_key(name):
+    return f'count_total:{name}'
+
+
+def table_estimate(model):
+    """
+    Returns the planner row estimate of a model table, or None when the
+    database is not PostgreSQL or the table was never analyzed.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table]  # pylint: disable=protected-access
+        )
+        row = cursor.fetchone()
+
+    if not row or row[0] < 0:
+        return None
+    return row[0]
+
+
+def cached_total(name, queryset):
+    """
+    Returns the (total, estimated) pair of an unfiltered listing, cached under
+    'name' until invalidate_total(name) is called.
+    """
+    key = _total_key(name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # The estimate covers the whole table, so it only fits listings without a WHERE.
+    estimate = None if queryset.query.where else table_estimate(queryset.model)
+    if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+        total = (estimate, True)
+    else:
+        total = (queryset.count(), False)
+
+    cache.set(key, total, timeout=TOTAL_CACHE_TIMEOUT)
+    return total
+
+
+def invalidate_total(name):
+    """
+    Drops the cached total of a listing after rows are created or deleted.
+    """
+    cache.delete(_total_key(name))
+
+
+def count_listing(name, queryset, filtered):
+    """
+    Returns the (total, estimated) pair of a listing: counted once when
+    filtered, from the cached total otherwise.
+    """
+    if filtered:
+        return queryset.count(), False
+    return cached_total(name, queryset)
@@ -0,0 +1,23 @@
+"""
+Rendering of the email templates of templates/email_templates/.
+
+Compiled templates are already kept per process by Django's cached template
+loader (used since TEMPLATES sets no 'loaders'), so this only times renders.
+"""
+import time
+
+from django.template.loader import render_to_string
+
+from natour.api.utils.metrics import EMAIL_RENDER_SECONDS
+
+EMAIL_TEMPLATES_DIR = 'email_templates'
+
+
+def render_email(name, context):
+    """
+    Renders an email template, like render_to_string('email_templates/<name>').
+    """
+    started = time.perf_counter()
+    html = render_to_string(f'{EMAIL_TEMPLATES_DIR}/{name}', context)
+    EMAIL_RENDER_SECONDS.labels(template=name).observe(time.perf_counter() - started)
+    return html
@@ -0,0 +1,136 @@
+"""
+Normalization of the photo images before their upload.
+
+Each image is decoded, turned upright, stripped of its metadata (EXIF, GPS),
+downsized to PHOTO_MAX_DIMENSION and re-encoded as PHOTO_OUTPUT_FORMAT. Its
+perceptual hash is computed on the way, for the deduplication of uploads.
+Decoding and encoding are CPU bound, so they run in a pool of
+PHOTO_NORMALIZE_WORKERS processes (0 runs them in the calling process).
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from natour.api.utils.metrics import PHOTO_BYTES, PHOTO_NORMALIZE_SECONDS
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+# Side of the grid compared by the perceptual hash (HASH_SIZE ** 2 bits).
+HASH_SIZE = 8
+
+_pool = None
+_pool_key = None
+
+
+class InvalidImage(Exception):
+    """
+    Raised when a file can not be decoded as an image.
+    """
+
+
+def perceptual_hash(image):
+    """
+    Returns the difference hash of an image, as hex: each bit tells whether a
+    pixel of its grayscale thumbnail is brighter than its right neighbour, so
+    re-encoded or resized copies of an image get the same hash.
+    """
+    pixels = list(image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE),
+                                            Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + column]
+            value = value << 1 | (left > pixels[row * (HASH_SIZE + 1) + column + 1])
+    return f'{value:0{HASH_SIZE * HASH_SIZE // 4}x}'
+
+
+def _normalize(path, max_dimension, image_format, quality):
+    """
+    Writes the normalized copy of an image next to it and returns
+    (its path, its perceptual hash, seconds spent). Runs in the pool processes.
+    """
+    started = time.perf_counter()
+    source = Path(path)
+    target = source.with_name(f'{source.stem}.normalized.{EXTENSIONS[image_format]}')
+    try:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+                has_alpha = image_format != 'JPEG' and (
+                    'A' in image.getbands() or 'transparency' in image.info)
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+            # Only the color profile is carried over, every other metadata is dropped.
+            image.save(target, image_format, quality=quality,
+                       icc_profile=original.info.get('icc_profile'))
+            digest = perceptual_hash(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, ValueError) as e:
+        target.unlink(missing_ok=True)
+        raise InvalidImage(str(e)) from None
+    return str(target), digest, time.perf_counter() - started
+
+
+def _get_pool(workers):
+    global _pool, _pool_key  # pylint: disable=global-statement
+    key = (os.getpid(), workers)
+    if _pool is None or _pool_key != key:
+        _pool = ProcessPoolExecutor(max_workers=workers,
+                                    mp_context=multiprocessing.get_context('spawn'))
+        _pool_key = key
+    return _pool
+
+
+def _reset_pool():
+    global _pool  # pylint: disable=global-statement
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def normalize_images(paths):
+    """
+    Normalizes several images concurrently.
+
+    Returns, for each path, (the path of its normalized copy, its perceptual
+    hash) or the exception raised normalizing it (InvalidImage when it is not a
+    decodable image).
+    """
+    options = (settings.PHOTO_MAX_DIMENSION, settings.PHOTO_OUTPUT_FORMAT.upper(),
+               settings.PHOTO_OUTPUT_QUALITY)
+    workers = settings.PHOTO_NORMALIZE_WORKERS
+
+    if workers > 0:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_normalize, path, *options) for path in paths]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                outcomes.append(e)
+        if any(isinstance(outcome, BrokenProcessPool) for outcome in outcomes):
+            _reset_pool()
+    else:
+        outcomes = []
+        for path in paths:
+            try:
+                outcomes.append(_normalize(path, *options))
+            except Exception as e:  # pylint: disable=broad-except
+                outcomes.append(e)
+
+    results = []
+    for path, outcome in zip(paths, outcomes):
+        if isinstance(outcome, Exception):
+            results.append(outcome)
+            continue
+        normalized, digest, seconds = outcome
+        PHOTO_NORMALIZE_SECONDS.observe(seconds)
+        PHOTO_BYTES.labels(stage='original').inc(os.path.getsize(path))
+        PHOTO_BYTES.labels(stage='normalized').inc(os.path.getsize(normalized))
+        results.append((normalized, digest))
+    return results
@@ -0,0 +1,189 @@
+"""
+Per-process cache tier in front of the Redis default cache.
+
+Hot, rarely changing values (terms, map snapshots, role names, namespace
+generations) are kept in a bounded LRU dict inside each worker, so reading
+them costs no Redis round-trip nor unpickling. Workers stay coherent through
+a Redis pub/sub channel: invalidating a key publishes its name and a daemon
+thread in every worker drops it from the local tier. The local tier is only
+used while that thread is subscribed; entries also expire after a short TTL
+in case a message is lost.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from natour.api.utils.metrics import TIERED_CACHE_REQUESTS
+from natour.api.utils.redis_buffers import get_redis
+
+logger = logging.getLogger("django")
+
+INVALIDATION_CHANNEL = 'local_cache:invalidate'
+LOCAL_MAX_ENTRIES = 1024
+LOCAL_TTL = 30
+LISTENER_RETRY_DELAY = 1.0
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Thread-safe LRU dict whose entries expire after a TTL.
+    """
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES, ttl=LOCAL_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value of a key, or default when missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries when full.
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Drops a key, if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drops every key.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache()
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+_subscribed = threading.Event()
+
+
+def _listen():
+    """
+    Drops the keys published on the invalidation channel from the local tier,
+    reconnecting whenever the subscription is lost.
+    """
+    while True:
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages published while unsubscribed were lost.
+            local_cache.clear()
+            _subscribed.set()
+            for message in pubsub.listen():
+                local_cache.delete(message['data'].decode())
+        except RedisError as e:
+            logger.warning("Local cache invalidation listener disconnected: %s", str(e))
+        _subscribed.clear()
+        local_cache.clear()
+        time.sleep(LISTENER_RETRY_DELAY)
+
+
+def _local_tier_ready():
+    """
+    Starts the invalidation listener of this process, once per process (the
+    thread does not survive a fork), and tells if it is subscribed.
+    """
+    global _listener_pid  # pylint: disable=global-statement
+    if _listener_pid != os.getpid():
+        with _listener_lock:
+            if _listener_pid != os.getpid():
+                _subscribed.clear()
+                local_cache.clear()
+                threading.Thread(target=_listen, daemon=True,
+                                 name='local-cache-invalidation').start()
+                _listener_pid = os.getpid()
+    return _subscribed.is_set()
+
+
+def wait_until_subscribed(timeout):
+    """
+    Starts the invalidation listener and waits until it is subscribed.
+    """
+    _local_tier_ready()
+    return _subscribed.wait(timeout)
+
+
+def tiered_get(key, default=None):
+    """
+    Returns a value from the local tier, falling back to Redis and keeping
+    what Redis returned locally.
+    """
+    use_local = _local_tier_ready()
+    if use_local:
+        value = local_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            TIERED_CACHE_REQUESTS.labels('local', 'hit').inc()
+            return value
+        TIERED_CACHE_REQUESTS.labels('local', 'miss').inc()
+
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        TIERED_CACHE_REQUESTS.labels('redis', 'miss').inc()
+        return default
+
+    TIERED_CACHE_REQUESTS.labels('redis', 'hit').inc()
+    if use_local:
+        local_cache.set(key, value)
+    return value
+
+
+def keep_local(key, value):
+    """
+    Keeps a value read from Redis in the local tier of this process.
+    """
+    if _local_tier_ready():
+        local_cache.set(key, value)
+
+
+def tiered_set(key, value, timeout=None):
+    """
+    Stores a value in Redis and in the local tier of this process. Other
+    processes pick it up from Redis on their next local miss.
+    """
+    cache.set(key, value, timeout=timeout)
+    keep_local(key, value)
+
+
+def invalidate_local(*keys):
+    """
+    Drops keys from the local tier of every process. The Redis values must
+    have been changed or deleted before, so the workers do not reload them.
+    """
+    for key in keys:
+        local_cache.delete(key)
+        try:
+            get_redis().publish(INVALIDATION_CHANNEL, key)
+        except RedisError as e:
+            logger.error("Failed to publish local cache invalidation of '%s': %s", key, str(e))
@@ -0,0 +1,91 @@
+"""
+Application metrics exported by django_prometheus on /metrics.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    'natour_response_cache_requests_total',
+    'Cached view lookups by namespace and result (hit, stale, miss).',
+    ['namespace', 'result'],
+)
+
+RESPONSE_CACHE_REBUILDS = Counter(
+    'natour_response_cache_rebuilds_total',
+    'Cached view entries rebuilt by the worker holding the rebuild lock.',
+    ['namespace'],
+)
+
+TIERED_CACHE_REQUESTS = Counter(
+    'natour_tiered_cache_requests_total',
+    'Two-tier cache lookups by tier (local, redis) and result (hit, miss).',
+    ['tier', 'result'],
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'natour_password_hash_queue_depth',
+    'Password hashes running or waiting in the login hashing pool.',
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    'natour_password_hash_seconds',
+    'Time logins spend in the hashing pool, waiting included.',
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    'natour_password_hash_rejected_total',
+    'Logins refused because the hashing pool was saturated.',
+)
+
+OUTBOUND_EMAILS = Counter(
+    'natour_outbound_emails_total',
+    'Delivery attempts of the email outbox by result (sent, retry, dead).',
+    ['result'],
+)
+
+MAILING_EMAILS = Counter(
+    'natour_mailing_emails_total',
+    'Emails sent by mass mailings, by kind.',
+    ['kind'],
+)
+
+MAILING_FAILURES = Counter(
+    'natour_mailing_failures_total',
+    'Runs of mass mailings interrupted by an error, by kind.',
+    ['kind'],
+)
+
+MAILING_CHUNK_SECONDS = Histogram(
+    'natour_mailing_chunk_seconds',
+    'Time to build and send one chunk of a mass mailing.',
+    ['kind'],
+)
+
+EMAIL_RENDER_SECONDS = Histogram(
+    'natour_email_render_seconds',
+    'Time to render an email template, by template.',
+    ['template'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25),
+)
+
+PHOTO_NORMALIZE_SECONDS = Histogram(
+    'natour_photo_normalize_seconds',
+    'Time to decode, downsize and re-encode a photo before its upload.',
+)
+
+PHOTO_BYTES = Counter(
+    'natour_photo_bytes_total',
+    'Bytes of the photos received (original) and uploaded (normalized).',
+    ['stage'],
+)
+
+PHOTOS_DEDUPLICATED = Counter(
+    'natour_photos_deduplicated_total',
+    'Photos that reused the stored image of an identical photo instead of uploading it.',
+    ['match'],
+)
+
+MAILING_REFUSED = Counter(
+    'natour_mailing_refused_total',
+    'Emails of mass mailings refused by the mail server and moved to the outbox.',
+    ['kind'],
+)
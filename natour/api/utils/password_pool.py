@@ -0,0 +1,107 @@
+"""
+Bounded pool for the password hashing of logins.
+
+PBKDF2 is deliberately slow, so a burst of logins could occupy every worker
+thread of the server. Hashes run in a small thread pool instead (hashlib
+releases the GIL while hashing) and only a bounded amount of logins may wait
+for it; beyond that they are refused at once instead of starving the other
+requests.
+
+The limits are per process and only matter with threaded workers: gunicorn
+runs with --worker-class gthread and more --threads than
+PASSWORD_HASHING_MAX_PENDING, so logins can hold at most that many threads
+of a worker and the others keep serving. With sync workers each process
+serves a single request and nothing is ever refused.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (check_password, get_hasher, identify_hasher,
+                                         make_password)
+
+from natour.api.utils.metrics import (PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_SECONDS,
+                                      PASSWORD_HASH_REJECTED)
+
+HASHING_WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+# Hashes running plus hashes waiting for a worker.
+MAX_PENDING_HASHES = getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', HASHING_WORKERS * 4)
+# How long a login waits for a free slot before being refused.
+SLOT_TIMEOUT = 2.0
+
+_executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(MAX_PENDING_HASHES)
+
+
+class HashingPoolBusy(Exception):
+    """
+    Raised when too many logins are already waiting for the hashing pool.
+    """
+
+
+def _run(func, *args):
+    """
+    Runs a hashing function in the pool, waiting for its result.
+    """
+    if not _slots.acquire(timeout=SLOT_TIMEOUT):
+        PASSWORD_HASH_REJECTED.inc()
+        raise HashingPoolBusy()
+
+    PASSWORD_HASH_QUEUE_DEPTH.inc()
+    try:
+        started = time.perf_counter()
+        result = _executor.submit(func, *args).result()
+        PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started)
+        return result
+    finally:
+        PASSWORD_HASH_QUEUE_DEPTH.dec()
+        _slots.release()
+
+
+def _must_update(encoded):
+    """
+    Tells if a hash was made with another hasher or a lower cost than the
+    configured ones.
+    """
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def _verify(raw_password, encoded):
+    """
+    Checks a password and, when its hash is outdated, also computes the new
+    hash. Returns (valid, new_encoded or None).
+    """
+    if not check_password(raw_password, encoded):
+        return False, None
+    if _must_update(encoded):
+        return True, make_password(raw_password)
+    return True, None
+
+
+def verify_password(user, raw_password):
+    """
+    Checks the password of a user in the hashing pool, like
+    user.check_password(), and transparently stores it rehashed with the
+    configured hasher and cost when needed.
+
+    Raises HashingPoolBusy when the pool is saturated.
+    """
+    valid, new_encoded = _run(_verify, raw_password, user.password)
+    if new_encoded is not None:
+        user.password = new_encoded
+        user.save(update_fields=['password'])
+    return valid
+
+
+def spend_hashing_time(raw_password):
+    """
+    Hashes a password for nothing, in the pool, so logins of unknown users take
+    as long as the others.
+    """
+    _run(make_password, raw_password)
@@ -0,0 +1,182 @@
+"""
+Storage backends of the photo images.
+
+The backend in use is set by the PHOTO_STORAGE_BACKEND setting: Cloudinary in
+production, or a local directory for development and tests. Both return
+CloudinaryResource objects, which is what Photo.image stores.
+"""
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from cloudinary import CloudinaryResource, api, uploader
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ParseError
+
+IMAGE_RESOURCE_TYPE = 'image'
+# Concurrent remote deletions of destroy_many.
+DESTROY_WORKERS = 8
+
+# Transformations of the image served for each variant, stored with the photo.
+PHOTO_VARIANTS = {
+    'thumbnail': {'width': 150, 'height': 150, 'crop': 'fill', 'gravity': 'auto'},
+    'card': {'width': 600, 'height': 400, 'crop': 'fill', 'gravity': 'auto'},
+    'full': {'width': 1600, 'crop': 'limit'},
+}
+VARIANT_DELIVERY = {'quality': 'auto', 'fetch_format': 'auto'}
+UPLOAD_TYPE = 'upload'
+
+
+class PhotoStorage:
+    """
+    Interface of the photo storage backends.
+    """
+
+    def upload(self, path):
+        """
+        Uploads the image file at path and returns its CloudinaryResource.
+        """
+        raise NotImplementedError
+
+    def destroy(self, public_id):
+        """
+        Deletes a stored image.
+        """
+        raise NotImplementedError
+
+    def list_assets(self, page_size):
+        """
+        Yields pages (lists) of (public_id, created_at) of every image stored
+        by upload.
+        """
+        raise NotImplementedError
+
+    def urls(self, resource):
+        """
+        Returns the canonical URL of a stored image and a dict of variant ->
+        URL for each of PHOTO_VARIANTS.
+        """
+        raise NotImplementedError
+
+    def destroy_many(self, public_ids):
+        """
+        Deletes several stored images concurrently, in a bounded thread pool.
+
+        Returns a dict of public_id -> the exception raised deleting it, or
+        None when deleted.
+        """
+        def attempt(public_id):
+            try:
+                self.destroy(public_id)
+            except Exception as e:  # pylint: disable=broad-except
+                return e
+            return None
+
+        public_ids = list(public_ids)
+        if not public_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(DESTROY_WORKERS, len(public_ids)),
+                                thread_name_prefix='photo-destroy') as pool:
+            return dict(zip(public_ids, pool.map(attempt, public_ids)))
+
+
+class CloudinaryPhotoStorage(PhotoStorage):
+    """
+    Stores the images in Cloudinary, under the PHOTO_STORAGE_FOLDER folder so
+    that the listing leaves the other assets of the account alone.
+    """
+
+    def upload(self, path):
+        return uploader.upload_resource(
+            str(path), type=UPLOAD_TYPE, resource_type=IMAGE_RESOURCE_TYPE,
+            folder=settings.PHOTO_STORAGE_FOLDER)
+
+    def destroy(self, public_id):
+        uploader.destroy(public_id)
+
+    def list_assets(self, page_size):
+        cursor = None
+        while True:
+            options = {'next_cursor': cursor} if cursor else {}
+            page = api.resources(type=UPLOAD_TYPE, resource_type=IMAGE_RESOURCE_TYPE,
+                                 prefix=f'{settings.PHOTO_STORAGE_FOLDER}/',
+                                 max_results=page_size, **options)
+            yield [(resource['public_id'], parse_datetime(resource['created_at']))
+                   for resource in page.get('resources', [])]
+            cursor = page.get('next_cursor')
+            if not cursor:
+                break
+
+    def urls(self, resource):
+        return resource.url, {
+            variant: resource.build_url(**transformation, **VARIANT_DELIVERY)
+            for variant, transformation in PHOTO_VARIANTS.items()
+        }
+
+
+class LocalPhotoStorage(PhotoStorage):
+    """
+    Stores the images in the PHOTO_LOCAL_STORAGE_DIR directory, standing in
+    for Cloudinary in development and tests.
+    """
+
+    @property
+    def directory(self):
+        """
+        Directory of the stored images.
+        """
+        directory = Path(settings.PHOTO_LOCAL_STORAGE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def _path(self, public_id):
+        matches = list(self.directory.glob(f'{public_id}.*'))
+        return matches[0] if matches else None
+
+    def upload(self, path):
+        path = Path(path)
+        public_id = uuid.uuid4().hex
+        image_format = path.suffix.lstrip('.').lower() or None
+        shutil.copyfile(path, self.directory / f'{public_id}.{image_format or "bin"}')
+        return CloudinaryResource(public_id=public_id, format=image_format,
+                                  version=int(time.time()), type=UPLOAD_TYPE,
+                                  resource_type=IMAGE_RESOURCE_TYPE)
+
+    def destroy(self, public_id):
+        path = self._path(public_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def list_assets(self, page_size):
+        paths = sorted(self.directory.iterdir())
+        for start in range(0, len(paths), page_size):
+            yield [(path.stem, datetime.fromtimestamp(path.stat().st_mtime, tz=dt_timezone.utc))
+                   for path in paths[start:start + page_size]]
+
+    def urls(self, resource):
+        url = f'{settings.PHOTO_LOCAL_STORAGE_URL}{resource.public_id}.{resource.format or "bin"}'
+        return url, {variant: url for variant in PHOTO_VARIANTS}
+
+
+def photo_variant_param(request):
+    """
+    Returns the photo variant asked with the photo_variant query parameter,
+    or None for the original images.
+    """
+    variant = request.query_params.get('photo_variant')
+    if variant is not None and variant not in PHOTO_VARIANTS:
+        raise ParseError(
+            f"Parâmetro 'photo_variant' deve ser um de: {', '.join(PHOTO_VARIANTS)}.")
+    return variant
+
+
+def get_photo_storage():
+    """
+    Returns the configured photo storage backend.
+    """
+    return import_string(settings.PHOTO_STORAGE_BACKEND)()
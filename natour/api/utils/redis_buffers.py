@@ -0,0 +1,99 @@
+"""
+Helpers for write-behind buffers kept in Redis hashes.
+
+Requests add to a "pending" hash; a periodic flush renames it to a
+"flushing" hash (atomically, so no increment is lost), writes it to the
+database and only then deletes it. If a flush dies halfway, the next one
+picks the leftover "flushing" hash up again. Flushes of a buffer hold a lock,
+so concurrent flushers never apply the same entries twice.
+"""
+from contextlib import contextmanager
+
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+# Longer than any flush; an expired lock lets a concurrent flush in.
+DRAIN_LOCK_TIMEOUT = 600
+
+
+def get_redis():
+    """
+    Returns the raw Redis client behind the default cache.
+    """
+    return get_redis_connection("default")
+
+
+def flushing_key(key):
+    """
+    Returns the name of the hash holding the entries being flushed.
+    """
+    return f"{key}:flushing"
+
+
+def begin_drain(key):
+    """
+    Moves the pending entries of a hash aside and returns them as a dict of
+    decoded strings. Leftovers of an interrupted flush are returned first.
+    Must run under the lock of drain().
+    """
+    conn = get_redis()
+    target = flushing_key(key)
+
+    # RENAMENX keeps the leftovers when there are some; without pending
+    # entries only the leftovers, if any, are read.
+    if conn.exists(key):
+        conn.renamenx(key, target)
+
+    return {field.decode(): value.decode() for field, value in conn.hgetall(target).items()}
+
+
+def finish_drain(key):
+    """
+    Discards the entries of a drain once they were stored in the database.
+    """
+    get_redis().delete(flushing_key(key))
+
+
+@contextmanager
+def drain(key):
+    """
+    Yields the entries of a buffer to flush (see begin_drain) while holding its
+    flush lock, and discards them once the block completes. Yields nothing to
+    flush when another flush of the buffer is running.
+    """
+    lock = get_redis().lock(f"{key}:lock", timeout=DRAIN_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        yield {}
+        return
+
+    try:
+        entries = begin_drain(key)
+        yield entries
+        if entries:
+            finish_drain(key)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired meanwhile, nothing left to release.
+            pass
+
+
+def read_fields(key, fields):
+    """
+    Returns the pending plus in-flight values of some fields of a buffer, as a
+    dict of field -> list of raw values (missing values are skipped).
+    """
+    if not fields:
+        return {}
+
+    fields = [str(field) for field in fields]
+    pipe = get_redis().pipeline()
+    pipe.hmget(key, fields)
+    pipe.hmget(flushing_key(key), fields)
+    pending, flushing = pipe.execute()
+
+    values = {}
+    for field, *raw in zip(fields, pending, flushing):
+        values[field] = [value for value in raw if value is not None]
+    return values
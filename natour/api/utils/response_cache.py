@@ -0,0 +1,219 @@
+"""
+Versioned caching of API responses.
+
+Each cached response belongs to a namespace with a generation counter kept in
+the cache. Entries are tagged with the generation they were built for, so
+bumping it after a write invalidates every entry of the namespace at once, and
+entries can live long instead of expiring blindly every minute.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from redis.exceptions import LockError
+from rest_framework.response import Response
+
+from natour.api.utils.local_cache import tiered_get, tiered_set, keep_local, invalidate_local
+from natour.api.utils.metrics import RESPONSE_CACHE_REQUESTS, RESPONSE_CACHE_REBUILDS
+
+DEFAULT_TIMEOUT = 60 * 60
+GENERATION_TIMEOUT = None  # Generations never expire.
+
+# How long an expired entry may still be served while it is rebuilt.
+STALE_TIMEOUT = 5 * 60
+# Rebuild lock expiry, in case the worker holding it dies.
+REBUILD_LOCK_TIMEOUT = 30
+# How long other workers wait for an entry of a new generation.
+REBUILD_WAIT = 2.0
+REBUILD_POLL = 0.05
+
+# Map, clusters and search of the visible points.
+MAP_NAMESPACE = 'points_map'
+# Point listings, which also show ratings and view counts.
+POINT_LISTINGS_NAMESPACE = 'point_listings'
+# View counts are buffered without invalidating, so they may lag this long.
+POINT_LISTINGS_TIMEOUT = 5 * 60
+# Terms and policies content.
+TERMS_NAMESPACE = 'terms'
+# Listing of the users, with their roles and points count.
+USERS_NAMESPACE = 'users'
+# Profile of the authenticated user.
+USER_INFO_NAMESPACE = 'user_info'
+
+# Who can share a cached entry: every caller, callers with the same role and
+# staff flag, or only the same user.
+PUBLIC_SCOPE = 'public'
+ROLE_SCOPE = 'role'
+USER_SCOPE = 'user'
+
+
+def _generation_key(namespace):
+    return f'cache_gen:{namespace}'
+
+
+def get_generation(namespace):
+    """
+    Returns the current generation of a namespace.
+    """
+    key = _generation_key(namespace)
+    generation = tiered_get(key)
+    if generation is None:
+        cache.add(key, 1, timeout=GENERATION_TIMEOUT)
+        generation = tiered_get(key, 1)
+    return generation
+
+
+def bump_generation(namespace):
+    """
+    Invalidates every cached response of a namespace immediately.
+    """
+    key = _generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, timeout=GENERATION_TIMEOUT)
+    invalidate_local(key)
+
+
+def user_namespace(namespace, user_id):
+    """
+    Returns the namespace holding the user scoped entries of one user, which
+    is invalidated on its own or along with the whole namespace.
+    """
+    return f'{namespace}:user:{user_id}'
+
+
+def invalidate_namespaces(*namespaces):
+    """
+    Invalidates namespaces once the current transaction commits, so a
+    concurrent request cannot cache the data from before the write.
+    """
+    def bump():
+        for namespace in namespaces:
+            bump_generation(namespace)
+    transaction.on_commit(bump)
+
+
+def _scope_key(scope, user):
+    """
+    Returns the part of the cache key telling who may share the entry.
+    """
+    if scope == USER_SCOPE:
+        return f'user:{user.pk}'
+    if scope == ROLE_SCOPE:
+        return f'role:{getattr(user, "role_id", None)}:{int(bool(user.is_staff))}'
+    return PUBLIC_SCOPE
+
+
+def response_cache_key(namespace, request, scope=PUBLIC_SCOPE):
+    """
+    Builds the cache key of a request inside a namespace.
+    """
+    query = sorted(request.query_params.lists())
+    raw = f'{request.path}?{query}'
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f'resp:{namespace}:{_scope_key(scope, request.user)}:{digest}'
+
+
+def _is_fresh(entry, generation):
+    """
+    Tells if an entry belongs to the current generation and is still fresh.
+    """
+    return entry is not None and entry[0] == generation and entry[1] > time.time()
+
+
+def _wait_for_rebuild(lock, key, generation):
+    """
+    Waits while another worker rebuilds an entry. Returns the rebuilt entry, or
+    None when it is not ready within REBUILD_WAIT.
+    """
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == generation:
+            return entry
+        if not lock.locked():
+            break
+    return None
+
+
+def cached_response(namespace, timeout=DEFAULT_TIMEOUT, local=False, scope=PUBLIC_SCOPE):
+    """
+    Decorator caching successful responses of a DRF function view.
+
+    Must be placed below @api_view/@permission_classes, so authentication and
+    permissions are checked before the cache is read.
+
+    Entries store the namespace generation they were built for and when they
+    stop being fresh. Only the worker holding the rebuild lock of a key runs
+    the view; the others serve the expired entry (stale-while-revalidate) or,
+    when the entry belongs to an older generation, wait briefly for the new one.
+
+    Args:
+        namespace (str): Namespace invalidated by the views that change its data.
+        timeout (int): Time, in seconds, an entry is served as fresh.
+        local (bool): Also keep the entries in the per-process tier, for hot
+            responses shared by every user.
+        scope (str): PUBLIC_SCOPE for responses equal for every caller,
+            ROLE_SCOPE for responses depending on the role and staff flag, or
+            USER_SCOPE for responses of the authenticated user, which are also
+            invalidated per user through user_namespace().
+    """
+    if scope not in (PUBLIC_SCOPE, ROLE_SCOPE, USER_SCOPE):
+        raise ValueError(f"Unknown cache scope '{scope}'.")
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            generation = get_generation(namespace)
+            if scope == USER_SCOPE:
+                generation = (generation,
+                              get_generation(user_namespace(namespace, request.user.pk)))
+            key = response_cache_key(namespace, request, scope)
+
+            entry = tiered_get(key) if local else cache.get(key)
+            if local and not _is_fresh(entry, generation):
+                # The local copy may be older than the one in Redis.
+                entry = cache.get(key)
+                if _is_fresh(entry, generation):
+                    keep_local(key, entry)
+            current = entry is not None and entry[0] == generation
+            if _is_fresh(entry, generation):
+                RESPONSE_CACHE_REQUESTS.labels(namespace, 'hit').inc()
+                return Response(entry[2], status=entry[3])
+
+            lock = cache.lock(f'{key}:lock', timeout=REBUILD_LOCK_TIMEOUT, blocking=False)
+            if not lock.acquire():
+                if current:
+                    RESPONSE_CACHE_REQUESTS.labels(namespace, 'stale').inc()
+                    return Response(entry[2], status=entry[3])
+                entry = _wait_for_rebuild(lock, key, generation)
+                if entry is not None:
+                    RESPONSE_CACHE_REQUESTS.labels(namespace, 'hit').inc()
+                    return Response(entry[2], status=entry[3])
+                lock = None
+
+            RESPONSE_CACHE_REQUESTS.labels(namespace, 'miss').inc()
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    entry = (generation, time.time() + timeout,
+                             response.data, response.status_code)
+                    if local:
+                        tiered_set(key, entry, timeout=timeout + STALE_TIMEOUT)
+                    else:
+                        cache.set(key, entry, timeout=timeout + STALE_TIMEOUT)
+                    RESPONSE_CACHE_REBUILDS.labels(namespace).inc()
+                return response
+            finally:
+                if lock is not None:
+                    try:
+                        lock.release()
+                    except LockError:
+                        pass
+
+        return wrapper
+    return decorator
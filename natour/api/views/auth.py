@@ -2,13 +2,8 @@
 Views for user authentication and management.
 """
 import logging
-import threading
-
-from smtplib import SMTPException
 
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
@@ -22,17 +17,21 @@ from rest_framework import status
 from rest_framework.decorators import permission_classes
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from natour.api.serializers.user import CreateUserSerializer
 from natour.api.models import CustomUser
+from natour.api.methods.roles import get_role_name
+from natour.api.methods.email_outbox import enqueue_email
+from natour.api.methods.last_login import record_login
 from natour.api.utils.get_ip import get_client_ip
+from natour.api.utils.password_pool import verify_password, HashingPoolBusy
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.schemas.auth_schemas import (
     login_schema,
     create_user_schema,
     get_refresh_token_schema
 )
+from natour.api.utils.email_templates import render_email
 
 
 logger = logging.getLogger("django")
@@ -48,10 +47,16 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):  # pylint: disable
 
         token['username'] = user.username
         token['email'] = user.email
-        token['role'] = user.role.name
+        token['role'] = get_role_name(user.role_id)
+        token['is_staff'] = user.is_staff
 
         return token
 
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
 
 class MyTokenObtainPairView(TokenObtainPairView):
     """
@@ -59,6 +64,15 @@ class MyTokenObtainPairView(TokenObtainPairView):
     """
     serializer_class = MyTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except HashingPoolBusy:
+            return Response(
+                {"error": "Muitas tentativas de login no momento. Tente novamente em instantes."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
 
 @create_user_schema
 @api_view(['POST'])
@@ -98,45 +112,21 @@ def create_user(request):
             if serializer.is_valid():
                 user = serializer.save()
 
-                if user.role and user.role.name == 'master':
+                if get_role_name(user.role_id) == 'master':
                     user.is_staff = True
                     user.is_superuser = True
                     user.save(update_fields=['is_staff', 'is_superuser'])
 
-                try:
-                    html_content = render_to_string(
-                        'email_templates/user_registration.html',
-                        {'username': user.username}
-                    )
-
-                    def send_welcome_email():
-                        try:
-                            msg = EmailMultiAlternatives(
-                                subject="Natour - Conta criada com sucesso",
-                                body="Bem-vindo(a) ao Natour!",
-                                from_email="natourproject@gmail.com",
-                                to=[user.email],
-                            )
-                            msg.attach_alternative(html_content, "text/html")
-                            msg.send()
-                            logger.info(
-                                "Welcome email sent successfully to %s (ID: %s).",
-                                user.email, user.id
-                            )
-                        except SMTPException as e:
-                            logger.error(
-                                "Failed to send welcome email to %s (ID: %s): %s",
-                                user.email, user.id, str(e)
-                            )
-
-                    threading.Thread(target=send_welcome_email,
-                                     daemon=True).start()
-
-                except Exception as e:
-                    logger.error(
-                        "Failed to start welcome email thread for user %s (ID: %s): %s",
-                        user.email, user.id, str(e)
-                    )
+                html_content = render_email(
+                    'user_registration.html',
+                    {'username': user.username}
+                )
+                enqueue_email(
+                    subject="Natour - Conta criada com sucesso",
+                    body="Bem-vindo(a) ao Natour!",
+                    to=[user.email],
+                    html_content=html_content,
+                )
 
                 return Response(CreateUserSerializer(user).data, status=status.HTTP_201_CREATED)
 
@@ -179,8 +169,8 @@ def login(request):
 
     try:
         user = (CustomUser.objects
-                .select_related('role')
-                .only('id', 'username', 'email', 'is_active', 'last_login', 'role__name')
+                .only('id', 'username', 'email', 'password', 'is_active', 'is_staff',
+                      'last_login', 'role')
                 .get(email=email))
 
     except ObjectDoesNotExist:
@@ -189,16 +179,25 @@ def login(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
 
-    if user.check_password(password):
+    try:
+        valid_password = verify_password(user, password)
+    except HashingPoolBusy:
+        logger.warning("Login from IP: %s refused, password hashing pool saturated.", ip)
+        return Response(
+            {"error": "Muitas tentativas de login no momento. Tente novamente em instantes."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    if valid_password:
         if not user.is_active:
             return Response(
                 {"error": "Conta desativada."},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        user.save(update_fields=['last_login'])
+        record_login(user)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = MyTokenObtainPairSerializer.get_token(user)
 
         with transaction.atomic():
             if remember_me:
@@ -220,7 +219,7 @@ def login(request):
                 "id": user.id,
                 "username": user.username,
                 "email": user.email,
-                "role": user.role.name,
+                "role": get_role_name(user.role_id),
             },
             "remember_me": remember_me
         }, status=status.HTTP_200_OK)
@@ -249,7 +248,7 @@ def get_refresh_token(request):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        refresh_token = RefreshToken.for_user(user)
+        refresh_token = MyTokenObtainPairSerializer.get_token(user)
 
         return Response({
             "refresh": str(refresh_token),
@@ -4,11 +4,7 @@ Views for managing verification codes in the Natour API.
 # pylint: disable=no-member
 import logging
 
-from smtplib import SMTPException
-
 from django.core.cache import cache
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django_ratelimit.decorators import ratelimit
 from rest_framework.decorators import api_view
 from rest_framework.permissions import AllowAny
@@ -18,6 +14,7 @@ from rest_framework import status
 from rest_framework.decorators import permission_classes
 
 from natour.api.methods.create_code import create_code
+from natour.api.methods.email_outbox import enqueue_email
 from natour.api.models import CustomUser
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.serializers.user import NewUserPasswordSerializer
@@ -27,6 +24,7 @@ from natour.api.schemas.code_schemas import (
     send_password_reset_code_schema,
     verify_password_reset_code_schema
 )
+from natour.api.utils.email_templates import render_email
 
 logger = logging.getLogger("django")
 
@@ -70,31 +68,20 @@ def send_verification_code(request):
     code = create_code()
     cache.set(cache_key, code, timeout=180)
 
-    html_content = render_to_string(
-        'email_templates/validation_code.html',
+    html_content = render_email(
+        'validation_code.html',
         {
             'username': target_username,
             'verification_code': code
         }
     )
 
-    try:
-        msg = EmailMultiAlternatives(
-            subject="Natour - Código de Verificação",
-            body="Código de verificação para sua conta Natour",
-            from_email="natourproject@gmail.com",
-            to=[target_email],
-        )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-    except SMTPException as e:
-        logger.error(
-            "Failed to send verification code email.",
-        )
-        return Response(
-            {"detail": f"Erro ao enviar email: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    enqueue_email(
+        subject="Natour - Código de Verificação",
+        body="Código de verificação para sua conta Natour",
+        to=[target_email],
+        html_content=html_content,
+    )
 
     return Response({
         "detail": "Código de verificação enviado com sucesso. Verifique seu e-mail.",
@@ -156,31 +143,23 @@ def send_password_reset_code(request):
     code = create_code()
     cache.set(cache_key, code, timeout=180)
 
-    html_content = render_to_string(
-        'email_templates/password_code_request.html',
+    html_content = render_email(
+        'password_code_request.html',
         {
             'verification_code': code
         }
     )
 
-    try:
-        msg = EmailMultiAlternatives(
-            subject="Natour - Redefinição de Senha",
-            body="Código de verificação para redefinição de senha",
-            from_email="natourproject@gmail.com",
-            to=[target_email],
-        )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        return Response(
-            {"detail": "Código de redefinição de senha enviado com sucesso."},
-            status=status.HTTP_200_OK
-        )
-    except SMTPException as e:
-        return Response(
-            {"detail": f"Erro ao enviar email: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    enqueue_email(
+        subject="Natour - Redefinição de Senha",
+        body="Código de verificação para redefinição de senha",
+        to=[target_email],
+        html_content=html_content,
+    )
+    return Response(
+        {"detail": "Código de redefinição de senha enviado com sucesso."},
+        status=status.HTTP_200_OK
+    )
 
 
 @verify_password_reset_code_schema
@@ -8,16 +8,17 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticate
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.generics import get_object_or_404
-from cloudinary.uploader import destroy
-from cloudinary.exceptions import Error as CloudinaryError
 
 from natour.api.models import Photo, CustomUser, Point
-from natour.api.serializers.photo import PhotoSerializer, PhotoIDSerializer
+from natour.api.methods.photo_deletion import delete_photos
+from natour.api.serializers.photo import (PhotoSerializer, PhotoIDSerializer,
+                                          PhotoUploadSerializer, PhotoUploadStatusSerializer)
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.schemas.photo_schemas import (
     create_photo_schema,
     update_photo_schema,
     get_photo_schema,
+    get_photo_upload_status_schema,
     delete_photo_schema
 )
 
@@ -42,11 +43,12 @@ def create_photo(request, user_id=None, point_id=None):
         get_object_or_404(Point, id=point_id)
         data['point'] = point_id
     
-    serializer = PhotoSerializer(data=data)
+    serializer = PhotoUploadSerializer(data=data)
     if serializer.is_valid():
         photo = serializer.save()
-        return Response(PhotoSerializer(photo).data, status=status.HTTP_201_CREATED)
-    
+        logger.info("Image of photo ID %s staged for upload.", photo.id)
+        return Response(PhotoUploadStatusSerializer(photo).data, status=status.HTTP_202_ACCEPTED)
+
     log_validation_error("photo_creation", request, serializer.errors)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -69,29 +71,35 @@ def update_photo(request, photo_id, user_id=None, point_id=None):
 
     photo = get_object_or_404(Photo, id=photo_id)
 
-    new_image = data.get('image', None)
-    if new_image:
-        if photo.image:
-            try:
-                public_id = photo.image.public_id
-                destroy(public_id)
-                logger.info("Successfully deleted old image for photo ID %s", photo_id)
-            except CloudinaryError as e:
-                logger.error("Failed to delete old image for photo ID %s: %s", photo_id, str(e))
-                return Response(
-                    {"detail": "Erro ao deletar imagem antiga do Cloudinary."},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-    serializer = PhotoSerializer(photo, data=data, partial=True)
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
+    if data.get('image'):
+        serializer = PhotoUploadSerializer(photo, data=data, partial=True)
+        if serializer.is_valid():
+            photo = serializer.save()
+            logger.info("New image of photo ID %s staged for upload.", photo_id)
+            return Response(PhotoUploadStatusSerializer(photo).data,
+                            status=status.HTTP_202_ACCEPTED)
+    else:
+        serializer = PhotoSerializer(photo, data=data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
     log_validation_error("photo_update", request, serializer.errors)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@get_photo_upload_status_schema
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@api_logger("photo_upload_status")
+def get_photo_upload_status(request, photo_id):
+    """
+    Endpoint to follow the upload of a photo.
+    """
+    photo = get_object_or_404(Photo, id=photo_id)
+    return Response(PhotoUploadStatusSerializer(photo).data, status=status.HTTP_200_OK)
+
+
 @get_photo_schema
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedOrReadOnly])
@@ -131,9 +139,11 @@ def get_photo(request):
 @api_logger("photo_deletion")
 def delete_photo(request):
     """
-    Deletes multiple photos from Cloudinary and the database.
-    Requires both 'ids' and 'public_ids' lists with the same length.
-    Returns 400 Bad Request if any id doesn't exist or if there's a public_id mismatch.
+    Deletes multiple photos from the photo storage and the database.
+    Requires both 'ids' and 'public_ids' lists with the same length; photos
+    without an image (pending or failed uploads) take an empty public_id.
+    Returns 400 Bad Request if any id doesn't exist or if there's a public_id mismatch,
+    otherwise the result of each id (207 Multi-Status when some failed).
     """
     ids = request.data.get('ids', [])
     public_ids = request.data.get('public_ids', [])
@@ -150,18 +160,20 @@ def delete_photo(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    photos = Photo.objects.filter(id__in=ids)  # pylint: disable=no-member
-    if photos.count() != len(ids):
+    photo_map = {photo.id: photo
+                 for photo in Photo.objects.filter(id__in=ids)}  # pylint: disable=no-member
+    if len(photo_map) != len(ids):
         return Response(
             {'detail': 'ID inexistente.'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    photo_map = {photo.id: photo for photo in photos}
-
     for photo_id, public_id in zip(ids, public_ids):
         photo = photo_map.get(photo_id)
-        if not photo or not photo.image or photo.image.public_id != public_id:
+        # A photo whose upload is pending or failed has no image yet, so
+        # it is matched on its id alone, with an empty public_id.
+        expected_public_id = photo.image.public_id if photo.image else ''
+        if (public_id or '') != expected_public_id:
             return Response(
                 {
                     'detail': f'Incompatibilidade ou ausência de ID public para ID photo {photo_id}.'
@@ -169,26 +181,9 @@ def delete_photo(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    for photo_id, public_id in zip(ids, public_ids):
-        photo = photo_map[photo_id]
-        try:
-            destroy(public_id)
-            logger.info("Successfully deleted image from Cloudinary: photo_id=%s", photo_id)
-        except CloudinaryError as e:
-            logger.error("Failed to delete image from Cloudinary for photo ID %s: %s", photo_id, str(e))
-            return Response(
-                {'detail': f'Error deleting Cloudinary image for ID {photo_id}: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
-        try:
-            photo.delete()
-            logger.info("Successfully deleted photo from database: ID=%s", photo_id)
-        except Exception as e:
-            logger.error("Failed to delete photo from database: ID=%s: %s", photo_id, str(e))
-            return Response(
-                {'detail': f'Error deleting photo from database for ID {photo_id}: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-    return Response(status=status.HTTP_204_NO_CONTENT)
+    results = delete_photos(photo_map[photo_id] for photo_id in ids)
+    all_deleted = all(result['deleted'] for result in results)
+    return Response(
+        {'results': results},
+        status=status.HTTP_200_OK if all_deleted else status.HTTP_207_MULTI_STATUS
+    )
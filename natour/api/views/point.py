@@ -4,12 +4,6 @@ Views for managing points in the Natour API.
 # pylint: disable=no-member
 import logging
 
-from smtplib import SMTPException
-
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django.db import transaction
 from django_ratelimit.decorators import ratelimit
 from rest_framework.decorators import api_view
@@ -17,23 +11,34 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.generics import get_object_or_404
-from rest_framework.decorators import permission_classes
+from rest_framework.decorators import permission_classes, authentication_classes
 
-from natour.api.pagination import CustomPagination
+from natour.api.authentication import ClaimsJWTAuthentication
+from natour.api.pagination import CustomPagination, KeysetPagination
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.serializers import user
 from natour.api.serializers.point import (CreatePointSerializer, PointInfoSerializer,
-                                          PointOnMapSerializer,
+                                          PointOnMapSerializer, PointMarkerSerializer,
+                                          PointClusterSerializer,
                                           PointApprovalSerializer, PointStatusUser,
-                                          PointMapSearchSerializer)
-from natour.api.models import Point
+                                          PointMapSearchSerializer, NearbyPointSerializer)
+from natour.api.models import Point, PointCluster, PointTypes
+from natour.api.methods.email_outbox import enqueue_email
+from natour.api.methods.geo_grid import MAX_BBOX_POINTS, parse_bbox, filter_bbox
+from natour.api.methods.point_clusters import (MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM,
+                                               tile_ranges)
+from natour.api.methods.nearby import find_nearby, MAX_RADIUS_KM, MAX_NEAREST
+from natour.api.methods.view_counter import record_view, pending_views, merge_pending_views
 from natour.api.schemas.point_schemas import (
     create_point_schema,
     get_point_info_schema,
     get_all_points_schema,
     show_points_on_map_schema,
+    show_points_in_bbox_schema,
+    show_point_clusters_schema,
     point_approval_schema,
     search_point_schema,
+    search_nearby_points_schema,
     change_point_status_schema,
     delete_point_schema,
     delete_my_point_schema,
@@ -42,6 +47,11 @@ from natour.api.schemas.point_schemas import (
 )
 
 from natour.api.utils.get_ip import get_client_ip
+from natour.api.utils.photo_storage import photo_variant_param
+from natour.api.utils.counting import count_listing
+from natour.api.utils.response_cache import (cached_response, ROLE_SCOPE, MAP_NAMESPACE,
+                                             POINT_LISTINGS_NAMESPACE, POINT_LISTINGS_TIMEOUT)
+from natour.api.utils.email_templates import render_email
 
 logger = logging.getLogger("django")
 
@@ -158,13 +168,15 @@ def get_point_info(request, point_id):
     """
     Get information about a specific point.
     """
+    photo_variant = photo_variant_param(request)
     try:
         point = (Point.objects
                  .select_related('user')
                  .prefetch_related('photos', 'reviews__user')
                  .get(id=point_id))
+        merge_pending_views([point])
 
-        serializer = PointInfoSerializer(point)
+        serializer = PointInfoSerializer(point, context={'photo_variant': photo_variant})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     except Point.DoesNotExist:
@@ -179,25 +191,28 @@ def get_point_info(request, point_id):
 
 
 @get_all_points_schema
-@vary_on_headers("Authorization")
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 @api_logger("all_points_retrieval")
+@cached_response(POINT_LISTINGS_NAMESPACE, timeout=POINT_LISTINGS_TIMEOUT, scope=ROLE_SCOPE)
 def get_all_points(request):
     """
     Get all points created by all users.
     """
-    if 'page' not in request.query_params:
+    if 'page' not in request.query_params and not KeysetPagination.wants_cursor(request):
         return Response(
-            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N."},
+            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N ou ?cursor=."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    photo_variant = photo_variant_param(request)
     queryset = (Point.objects
                 .select_related('user')
+                .prefetch_related('photos')
                 .only('id', 'name', 'description', 'latitude', 'longitude',
                       'point_type', 'status', 'is_active', 'created_at',
-                      'avg_rating', 'user_id', 'user__username'))
+                      'avg_rating', 'rating_count', 'rating_1', 'rating_2',
+                      'rating_3', 'rating_4', 'rating_5', 'views', 'user_id', 'user__username'))
 
     point_name = request.query_params.get('name')
     if point_name:
@@ -217,13 +232,30 @@ def get_all_points(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    filtered = bool(point_name) or status_param is not None
+
+    if KeysetPagination.wants_cursor(request):
+        total_points = None
+        if KeysetPagination.wants_count(request):
+            total_points, _estimated = count_listing('points', queryset, filtered)
+
+        paginator = KeysetPagination(ordering=('name', 'id'))
+        page = paginator.paginate_queryset(queryset, request, count=total_points)
+        serializer = PointInfoSerializer(merge_pending_views(page), many=True,
+                                         context={'photo_variant': photo_variant})
+        return paginator.get_paginated_response(serializer.data)
+
     queryset = queryset.order_by('name')
 
+    total_points, estimated = count_listing('points', queryset, filtered)
+
     paginator = CustomPagination()
-    page = paginator.paginate_queryset(queryset, request)
+    page = paginator.paginate_queryset(queryset, request, count=total_points)
     if page:
-        serializer = PointInfoSerializer(page, many=True)
+        serializer = PointInfoSerializer(merge_pending_views(page), many=True,
+                                         context={'photo_variant': photo_variant})
         response = paginator.get_paginated_response(serializer.data)
+        response.data['count_estimated'] = estimated
         return response
     return Response(
         {"detail": "Nenhum resultado encontrado.", "total_points": 0},
@@ -293,38 +325,27 @@ def delete_point(request, point_id):
     point = get_object_or_404(Point, id=point_id)
     user = point.user
 
-    html_content = render_to_string(
-        'email_templates/delete_point.html',
+    html_content = render_email(
+        'delete_point.html',
         {
             'username': user.username,
             'point_name': point.name,
         }
     )
 
-    try:
-        msg = EmailMultiAlternatives(
+    with transaction.atomic():
+        enqueue_email(
             subject="Natour - Ponto Removido",
             body="Seu ponto foi removido.",
-            from_email="natourproject@gmail.com",
             to=[user.email],
+            html_content=html_content,
         )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(
-            "Point deletion email sent to '%s' (user ID: %s).",
-            user.email, user.id
-        )
-    except SMTPException as e:
-        logger.error(
-            "Failed to send point deletion email to '%s' (user ID: %s). Error: %s",
-            user.email, user.id, str(e)
-        )
-        return Response(
-            {"detail": f"Erro ao enviar email: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        point.delete()
+    logger.info(
+        "Point deletion email queued to '%s' (user ID: %s).",
+        user.email, user.id
+    )
 
-    point.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -362,25 +383,31 @@ def add_view(request, point_id):
     """
     user = request.user
 
-    point = get_object_or_404(Point, id=point_id)
+    stored_views = (Point.objects
+                    .filter(id=point_id)
+                    .values_list('views', flat=True)
+                    .first())
+    if stored_views is None and not Point.objects.filter(id=point_id).exists():
+        return Response(
+            {"detail": "Ponto não encontrado."},
+            status=status.HTTP_404_NOT_FOUND
+        )
 
-    previous_views = point.views
-    point.views += 1
-    point.save()
+    record_view(point_id)
+    views = (stored_views or 0) + pending_views([point_id]).get(point_id, 0)
 
     ip = get_client_ip(request)
 
     logger.info(
-        "User '%s' (ID: %s) from IP: %s incremented view count for Point ID: %s | Previous views: %d | New views: %d",
+        "User '%s' (ID: %s) from IP: %s incremented view count for Point ID: %s | Views: %d",
         user.username,
         user.id,
         ip,
         point_id,
-        previous_views,
-        point.views,
+        views,
     )
 
-    return Response({"views": point.views}, status=status.HTTP_200_OK)
+    return Response({"views": views}, status=status.HTTP_200_OK)
 
 
 @edit_point_schema
@@ -435,10 +462,11 @@ def edit_point(request, point_id):
 
 
 @show_points_on_map_schema
-@cache_page(60)
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated])
 @api_logger("points_map_view")
+@cached_response(MAP_NAMESPACE, local=True)
 def show_points_on_map(request):
     """
     Get all points to display on the map.
@@ -463,11 +491,88 @@ def show_points_on_map(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@show_points_in_bbox_schema
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated])
+@api_logger("points_bbox_view")
+def show_points_in_bbox(request):
+    """
+    Get the points inside a map viewport (bounding box), up to MAX_BBOX_POINTS.
+    """
+    try:
+        bbox = parse_bbox(request.query_params)
+    except ValueError as e:
+        return Response(
+            {"detail": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = filter_bbox(
+        Point.objects.filter(is_active=True, status=True), *bbox)
+    points = list(queryset
+                  .only('id', 'name', 'latitude', 'longitude', 'point_type')
+                  .order_by('name')[:MAX_BBOX_POINTS + 1])
+    truncated = len(points) > MAX_BBOX_POINTS
+
+    serializer = PointMarkerSerializer(points[:MAX_BBOX_POINTS], many=True)
+
+    logger.info(
+        "Viewport points retrieved successfully. Count: %d | Truncated: %s",
+        len(serializer.data), truncated
+    )
+    response = Response(serializer.data, status=status.HTTP_200_OK)
+    response['X-Result-Truncated'] = 'true' if truncated else 'false'
+    return response
+
+
+@show_point_clusters_schema
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated])
+@api_logger("points_clusters_view")
+@cached_response(MAP_NAMESPACE, local=True)
+def show_point_clusters(request):
+    """
+    Get the precomputed point clusters of a zoom level, grouped by point type.
+    """
+    try:
+        zoom = int(request.query_params.get('zoom', ''))
+    except ValueError:
+        return Response(
+            {"detail": "Parâmetro 'zoom' deve ser um número inteiro."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    zoom = min(max(zoom, MIN_CLUSTER_ZOOM), MAX_CLUSTER_ZOOM)
+
+    queryset = PointCluster.objects.filter(zoom=zoom)
+
+    if 'min_lat' in request.query_params:
+        try:
+            bbox = parse_bbox(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        x_range, y_range = tile_ranges(*bbox, zoom)
+        queryset = queryset.filter(tile_x__range=x_range, tile_y__range=y_range)
+
+    serializer = PointClusterSerializer(queryset, many=True)
+
+    logger.info(
+        "Map clusters retrieved successfully. Zoom: %d | Count: %d",
+        zoom, len(serializer.data)
+    )
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 @search_point_schema
-@cache_page(60)
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated])
 @api_logger("point_search")
+@cached_response(MAP_NAMESPACE)
 def search_point(request):
     """
     Search point by name.
@@ -508,3 +613,93 @@ def search_point(request):
         {"detail": "Nenhum ponto encontrado."},
         status=status.HTTP_404_NOT_FOUND
     )
+
+
+@search_nearby_points_schema
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated])
+@api_logger("point_nearby_search")
+def search_nearby_points(request):
+    """
+    Search the points closest to a coordinate, by radius or k-nearest.
+    """
+    params = request.query_params
+
+    try:
+        latitude = float(params['lat'])
+        longitude = float(params['lng'])
+    except KeyError:
+        return Response(
+            {"detail": "Parâmetros 'lat' e 'lng' são obrigatórios."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ValueError:
+        return Response(
+            {"detail": "Coordenadas devem ser números válidos."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return Response(
+            {"detail": "Coordenadas fora dos limites válidos."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        radius_km = float(params['radius']) if 'radius' in params else None
+        k = int(params['k']) if 'k' in params else None
+    except ValueError:
+        return Response(
+            {"detail": "Parâmetros 'radius' e 'k' devem ser números válidos."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if radius_km is None and k is None:
+        radius_km = 10.0
+
+    if radius_km is not None and not 0 < radius_km <= MAX_RADIUS_KM:
+        return Response(
+            {"detail": f"Raio deve estar entre 0 e {MAX_RADIUS_KM:g} km."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if k is not None and not 0 < k <= MAX_NEAREST:
+        return Response(
+            {"detail": f"Parâmetro 'k' deve estar entre 1 e {MAX_NEAREST}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = Point.objects.filter(is_active=True, status=True)
+
+    point_type = params.get('point_type')
+    if point_type:
+        if point_type not in PointTypes.values:
+            return Response(
+                {"detail": "Tipo de ponto inválido. Escolha uma das opções disponíveis."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = queryset.filter(point_type=point_type)
+
+    open_now = params.get('open_now', '').lower() == 'true'
+
+    nearest = find_nearby(queryset, latitude, longitude,
+                          radius_km=radius_km, k=k, open_now=open_now)
+
+    # Points deleted or hidden since the search are left out.
+    points = queryset.in_bulk([point_id for point_id, _distance in nearest])
+    results = []
+    for point_id, distance in nearest:
+        point = points.get(point_id)
+        if point is None:
+            continue
+        point.distance_km = round(distance, 3)
+        results.append(point)
+
+    serializer = NearbyPointSerializer(results, many=True)
+
+    logger.info(
+        "Nearby search around (%s, %s) returned %d results.",
+        latitude, longitude, len(results)
+    )
+    return Response(serializer.data, status=status.HTTP_200_OK)
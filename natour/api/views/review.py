@@ -3,7 +3,7 @@ Views for managing point reviews in the Natour API.
 """
 # pylint: disable=no-member
 import logging
-from django.db import models
+from django.db import transaction
 from rest_framework.decorators import api_view
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
@@ -11,16 +11,18 @@ from rest_framework import status
 from rest_framework.generics import get_object_or_404
 from rest_framework.decorators import permission_classes
 
-from natour.api.pagination import CustomPagination
+from natour.api.pagination import CustomPagination, KeysetPagination
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.serializers.review import CreateReviewSerializer, ReviewSerializer
 from natour.api.models import Point, PointReview
+from natour.api.methods.ratings import add_rating
 from natour.api.schemas.review_schemas import (
     add_review_schema,
     get_user_reviews_schema
 )
 
 from natour.api.utils.get_ip import get_client_ip
+from natour.api.utils.counting import count_listing
 
 logger = logging.getLogger("django")
 
@@ -36,10 +38,9 @@ def add_review(request, point_id):
     user = request.user
     ip = get_client_ip(request)
 
-    point = get_object_or_404(Point, id=point_id)
+    point = get_object_or_404(Point.objects.only('id'), id=point_id)
 
-    existing_review = point.reviews.filter(user=user).first()
-    if existing_review:
+    if point.reviews.filter(user=user).exists():
         return Response(
             {"detail": "Você já avaliou este ponto."},
             status=status.HTTP_400_BAD_REQUEST
@@ -47,11 +48,9 @@ def add_review(request, point_id):
 
     serializer = CreateReviewSerializer(data=request.data)
     if serializer.is_valid():
-        review = serializer.save(user=user, point=point)
-
-        avg = point.reviews.aggregate(models.Avg('rating'))['rating__avg'] or 0
-        point.avg_rating = round(avg)
-        point.save(update_fields=['avg_rating'])
+        with transaction.atomic():
+            review = serializer.save(user=user, point=point)
+            add_rating(point.id, review.rating)
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -66,19 +65,33 @@ def get_user_reviews(request):
     """
     Gets reviews created by users.
     """
-    if 'page' not in request.query_params:
+    if 'page' not in request.query_params and not KeysetPagination.wants_cursor(request):
         return Response(
-            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N."},
+            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N ou ?cursor=."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     reviews = PointReview.objects.select_related('user', 'point').all()
 
+    if KeysetPagination.wants_cursor(request):
+        total_reviews = None
+        if KeysetPagination.wants_count(request):
+            total_reviews, _estimated = count_listing('reviews', reviews, filtered=False)
+
+        paginator = KeysetPagination(ordering=('-created_at', 'id'))
+        page = paginator.paginate_queryset(reviews, request, count=total_reviews)
+        serializer = ReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    total_reviews, estimated = count_listing('reviews', reviews, filtered=False)
+
     paginator = CustomPagination()
-    page = paginator.paginate_queryset(reviews, request)
+    page = paginator.paginate_queryset(reviews, request, count=total_reviews)
     if page:
         serializer = ReviewSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['count_estimated'] = estimated
+        return response
 
     return Response(
         {"detail": "Nenhuma avaliação encontrada."},
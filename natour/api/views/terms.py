@@ -3,8 +3,6 @@ Views for terms and conditions in the Natour API.
 """
 # pylint: disable=no-member
 import logging
-import threading
-from django.views.decorators.cache import cache_page
 from django.db import transaction
 from django_ratelimit.decorators import ratelimit
 
@@ -12,13 +10,14 @@ from rest_framework.decorators import api_view
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import permission_classes
+from rest_framework.decorators import permission_classes, authentication_classes
 
-from natour.api.models import Terms
+from natour.api.authentication import ClaimsJWTAuthentication
+from natour.api.models import MailingKind, Terms
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.serializers.terms import (CreateTermsSerializer, GetTermsSerializer,
                                           UpdateTermsSerializer)
-from natour.api.methods.send_terms_email import send_updated_terms_email
+from natour.api.methods.mailing import start_mailing
 from natour.api.schemas.terms_schemas import (
     create_terms_schema,
     get_terms_schema,
@@ -26,6 +25,7 @@ from natour.api.schemas.terms_schemas import (
 )
 
 from natour.api.utils.get_ip import get_client_ip
+from natour.api.utils.response_cache import cached_response, TERMS_NAMESPACE
 
 logger = logging.getLogger("django")
 
@@ -66,10 +66,11 @@ def create_terms(request):
 
 
 @get_terms_schema
-@cache_page(60)
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([AllowAny])
 @api_logger("terms_retrieval")
+@cached_response(TERMS_NAMESPACE, local=True)
 def get_terms(request, term_id):
     """
     Endpoint to retrieve terms and conditions.
@@ -123,14 +124,7 @@ def update_terms(request, term_id):
             if serializer.is_valid():
                 serializer.save()
 
-                try:
-                    threading.Thread(
-                        target=send_updated_terms_email, daemon=True).start()
-                except Exception as e:
-                    logger.error(
-                        "Failed to start email notification thread for Terms ID: %s. Error: %s",
-                        term_id, str(e)
-                    )
+                start_mailing(MailingKind.UPDATED_TERMS)
 
                 return Response(serializer.data, status=status.HTTP_200_OK)
 
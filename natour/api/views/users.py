@@ -3,13 +3,7 @@ Views for user management in the Natour API.
 """
 import logging
 
-from smtplib import SMTPException
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django.db import transaction
-from django.db.models import Count
 
 from django_ratelimit.decorators import ratelimit
 from rest_framework.decorators import api_view
@@ -19,7 +13,7 @@ from rest_framework import status
 from rest_framework.decorators import permission_classes
 from rest_framework.generics import get_object_or_404
 
-from natour.api.pagination import CustomPagination
+from natour.api.pagination import CustomPagination, KeysetPagination
 from natour.api.models import CustomUser
 from natour.api.utils.logging_decorators import api_logger, log_validation_error
 from natour.api.serializers.user import (CustomUserInfoSerializer, UpdateUserSerializer,
@@ -40,17 +34,30 @@ from natour.api.schemas.user_schemas import (
 )
 
 from natour.api.utils.get_ip import get_client_ip
+from natour.api.utils.photo_storage import photo_variant_param
+from natour.api.utils.counting import count_listing
+from natour.api.utils.response_cache import (cached_response, ROLE_SCOPE, USER_SCOPE,
+                                             POINT_LISTINGS_NAMESPACE, POINT_LISTINGS_TIMEOUT,
+                                             USERS_NAMESPACE, USER_INFO_NAMESPACE)
+from natour.api.methods.email_outbox import enqueue_email
 from natour.api.methods.new_password import create_new_password
+from natour.api.methods.view_counter import merge_pending_views
+from natour.api.utils.email_templates import render_email
 
 logger = logging.getLogger("django")
 
+USERS_ORDERINGS = {
+    'username': ('username', 'id'),
+    'points_count': ('points_count', 'id'),
+    '-points_count': ('-points_count', 'id'),
+}
+
 
 @get_my_info_schema
-@cache_page(60)
-@vary_on_headers("Authorization")
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @api_logger("get_user_info")
+@cached_response(USER_INFO_NAMESPACE, scope=USER_SCOPE)
 def get_my_info(request):
     """
     Endpoint to get the authenticated user's information.
@@ -93,37 +100,25 @@ def delete_user_account(request, user_id):
         target_user.username, target_user.id, target_user.email
     )
 
-    html_content = render_to_string(
-        'email_templates/delete_user_account.html',
+    html_content = render_email(
+        'delete_user_account.html',
         {
             'username': target_user.username
         }
     )
 
-    try:
-        msg = EmailMultiAlternatives(
+    with transaction.atomic():
+        enqueue_email(
             subject="Natour - Conta excluída",
             body="Sua conta foi excluída.",
-            from_email="natourproject@gmail.com",
             to=[target_user.email],
+            html_content=html_content,
         )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(
-            "Account deletion email sent to '%s' (user ID: %s).",
-            target_user.email, target_user.id
-        )
-    except SMTPException as e:
-        logger.error(
-            "Failed to send account deletion email to '%s' (user ID: %s). Error: %s",
-            target_user.email, target_user.id, str(e)
-        )
-        return Response(
-            {"detail": f"Erro ao enviar email: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
-
-    target_user.delete()
+        target_user.delete()
+    logger.info(
+        "Account deletion email queued to '%s' (user ID: %s).",
+        target_user.email, target_user.id
+    )
     logger.info(
         "Admin '%s' (ID: %s) successfully deleted user account: '%s' (ID: %s, email: %s).",
         admin.username, admin.id, target_user.username, target_user.id, target_user.email
@@ -161,45 +156,77 @@ def update_my_info(request):
 
 
 @get_all_users_schema
-@vary_on_headers("Authorization")
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 @api_logger("get_all_users")
+@cached_response(USERS_NAMESPACE, scope=ROLE_SCOPE)
 def get_all_users(request):
     """
     Endpoint to get a list of all users.
     """
-    if 'page' not in request.query_params:
+    if 'page' not in request.query_params and not KeysetPagination.wants_cursor(request):
         return Response(
-            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N."},
+            {"detail": "Você deve fornecer o parâmetro de paginação ?page=N ou ?cursor=."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    queryset = CustomUser.objects.select_related('role').annotate(
-        points_count=Count('points')
-    ).only(
-        'id', 'username', 'email', 'is_active', 'created_at', 'role__name'
-    )
-
-    queryset = queryset.exclude(role__id=2)
+    users = CustomUser.objects.exclude(role__id=2)
 
     username = request.query_params.get('username')
     if username:
-        queryset = queryset.filter(username__istartswith=username)
+        users = users.filter(username__istartswith=username)
     email = request.query_params.get('email')
     if email:
-        queryset = queryset.filter(email__istartswith=email)
+        users = users.filter(email__istartswith=email)
+
+    min_points = request.query_params.get('min_points')
+    if min_points is not None:
+        try:
+            users = users.filter(points_count__gte=int(min_points))
+        except ValueError:
+            return Response(
+                {"detail": "Parâmetro 'min_points' deve ser um número inteiro."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    ordering = USERS_ORDERINGS.get(request.query_params.get('ordering', 'username'))
+    if ordering is None:
+        return Response(
+            {"detail": "Parâmetro 'ordering' deve ser 'username', 'points_count' ou '-points_count'."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    filtered = bool(username or email) or min_points is not None
+
+    queryset = users.select_related('role').only(
+        'id', 'username', 'email', 'is_active', 'is_staff', 'points_count',
+        'created_at', 'role__name'
+    )
+
+    if KeysetPagination.wants_cursor(request):
+        total_users = None
+        if KeysetPagination.wants_count(request):
+            total_users, _estimated = count_listing('users', users, filtered)
 
-    queryset = queryset.order_by('username')
+        paginator = KeysetPagination(ordering=ordering)
+        page = paginator.paginate_queryset(queryset, request, count=total_users)
+        serializer = AllUsersSerializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        if paginator.count is not None:
+            response.data['total_users'] = paginator.count
+        return response
+
+    queryset = queryset.order_by(*ordering)
 
-    total_users = queryset.count()
+    total_users, estimated = count_listing('users', users, filtered)
 
     paginator = CustomPagination()
-    page = paginator.paginate_queryset(queryset, request)
+    page = paginator.paginate_queryset(queryset, request, count=total_users)
     if page:
         serializer = AllUsersSerializer(page, many=True)
         response = paginator.get_paginated_response(serializer.data)
         response.data['total_users'] = total_users
+        response.data['count_estimated'] = estimated
         return Response(response.data, status=status.HTTP_200_OK)
     return Response(
         {"detail": "Nenhum resultado encontrado.", "total_users": 0},
@@ -245,8 +272,8 @@ def change_user_status(request, user_id):
                 'active' if new_status else 'inactive'
             )
 
-            html_content = render_to_string(
-                'email_templates/user_status_change.html',
+            html_content = render_email(
+                'user_status_change.html',
                 {
                     'username': target_user.username,
                     'status_class': 'ativo' if target_user.is_active else 'inativo',
@@ -255,25 +282,16 @@ def change_user_status(request, user_id):
                 }
             )
 
-            try:
-                msg = EmailMultiAlternatives(
-                    subject="Natour - Status da Conta",
-                    body=f"Sua conta foi {'ativada' if target_user.is_active else 'desativada'}.",
-                    from_email="natourproject@gmail.com",
-                    to=[target_user.email],
-                )
-                msg.attach_alternative(html_content, "text/html")
-                msg.send()
-                logger.info(
-                    "Status change email sent to user '%s' (ID: %s, email: %s).",
-                    target_user.username, target_user.id, target_user.email
-                )
-            except SMTPException as e:
-                logger.error(
-                    "Failed to send user status change email to '%s' (ID: %s, email: %s). Error: %s",
-                    target_user.username, target_user.id, target_user.email, str(
-                        e)
-                )
+            enqueue_email(
+                subject="Natour - Status da Conta",
+                body=f"Sua conta foi {'ativada' if target_user.is_active else 'desativada'}.",
+                to=[target_user.email],
+                html_content=html_content,
+            )
+            logger.info(
+                "Status change email queued to user '%s' (ID: %s, email: %s).",
+                target_user.username, target_user.id, target_user.email
+            )
 
             return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -300,11 +318,10 @@ def get_user_details(request, user_id):
 
 
 @get_user_points_schema
-@cache_page(60)
-@vary_on_headers("Authorization")
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 @api_logger("get_user_points")
+@cached_response(POINT_LISTINGS_NAMESPACE, timeout=POINT_LISTINGS_TIMEOUT, scope=ROLE_SCOPE)
 def get_user_points(request, user_id):
     """
     Endpoint to get all points created by a specific user.
@@ -327,7 +344,7 @@ def get_user_points(request, user_id):
 
     points_amount = points.count()
 
-    serializer = UserPointSerializer(points, many=True)
+    serializer = UserPointSerializer(merge_pending_views(points), many=True)
     return Response({
         "count": points_amount,
         "points": serializer.data
@@ -335,20 +352,22 @@ def get_user_points(request, user_id):
 
 
 @get_my_points_schema
-@vary_on_headers("Authorization")
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @api_logger("get_my_points")
+@cached_response(POINT_LISTINGS_NAMESPACE, timeout=POINT_LISTINGS_TIMEOUT, scope=USER_SCOPE)
 def get_my_points(request):
     """
     Endpoint to get all points created by the authenticated user.
     """
     user = request.user
+    photo_variant = photo_variant_param(request)
 
     points = (user.points
               .prefetch_related('photos', 'reviews')
               .only('id', 'name', 'description', 'latitude', 'longitude',
-                    'point_type', 'is_active', 'created_at', 'avg_rating')
+                    'point_type', 'is_active', 'created_at', 'avg_rating', 'rating_count', 'rating_1', 'rating_2',
+                    'rating_3', 'rating_4', 'rating_5', 'views')
               .order_by('-created_at'))
 
     point_name = request.query_params.get('name')
@@ -376,7 +395,8 @@ def get_my_points(request):
         )
 
     points_amount = points.count()
-    serializer = PointInfoSerializer(points, many=True)
+    serializer = PointInfoSerializer(merge_pending_views(points), many=True,
+                                     context={'photo_variant': photo_variant})
     return Response({
         "count": points_amount,
         "points": serializer.data
@@ -449,39 +469,28 @@ def reset_user_password(request, user_id):
     user = get_object_or_404(CustomUser, id=user_id)
 
     new_password = create_new_password()
-    user.set_password(new_password)
-    user.save()
 
-    html_content = render_to_string(
-        'email_templates/change_user_password.html',
+    html_content = render_email(
+        'change_user_password.html',
         {
             'username': user.username,
             'new_password': new_password,
         }
     )
 
-    try:
-        msg = EmailMultiAlternatives(
+    with transaction.atomic():
+        user.set_password(new_password)
+        user.save()
+        enqueue_email(
             subject="Natour - Nova senha!",
             body="Sua foi redefinida.",
-            from_email="natourproject@gmail.com",
             to=[user.email],
+            html_content=html_content,
         )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(
-            "Password change email sent to '%s' (user ID: %s).",
-            user.email, user.id
-        )
-    except SMTPException as e:
-        logger.error(
-            "Failed to send password change email to '%s' (user ID: %s). Error: %s",
-            user.email, user.id, str(e)
-        )
-        return Response(
-            {"detail": f"Erro ao enviar email: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    logger.info(
+        "Password change email queued to '%s' (user ID: %s).",
+        user.email, user.id
+    )
 
     return Response(
         {"detail": "Senha redefinida com sucesso."},
@@ -79,7 +79,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'natour.api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -98,7 +98,7 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=90),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
-    "UPDATE_LAST_LOGIN": True,
+    "UPDATE_LAST_LOGIN": False,  # Buffered by record_login, see flush_last_logins.
 
     "ALGORITHM": "HS256",
     "VERIFYING_KEY": "",
@@ -159,6 +159,12 @@ WSGI_APPLICATION = 'natour.wsgi.application'
 
 AUTH_USER_MODEL = 'api.CustomUser'
 
+AUTHENTICATION_BACKENDS = ['natour.api.backends.PooledModelBackend']
+
+# Password hashing pool of the logins.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=2, cast=int)
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', default=8, cast=int)
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -240,6 +246,24 @@ CLOUDINARY_STORAGE = {
 }
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Photo uploads: staged on disk by the views, sent by process_photo_uploads.
+PHOTO_STORAGE_BACKEND = config('PHOTO_STORAGE_BACKEND',
+                               default='natour.api.utils.photo_storage.CloudinaryPhotoStorage')
+# Cloudinary folder of the photo images, the only one collect_orphan_photos lists.
+PHOTO_STORAGE_FOLDER = config('PHOTO_STORAGE_FOLDER', default='natour/photos')
+PHOTO_STAGING_DIR = config('PHOTO_STAGING_DIR', default=str(BASE_DIR / 'photo_staging'))
+PHOTO_LOCAL_STORAGE_DIR = config('PHOTO_LOCAL_STORAGE_DIR', default=str(BASE_DIR / 'local_photos'))
+PHOTO_LOCAL_STORAGE_URL = config('PHOTO_LOCAL_STORAGE_URL', default='/local_photos/')
+
+# Photo normalization before upload (see natour.api.utils.image_normalization).
+PHOTO_NORMALIZE_WORKERS = config('PHOTO_NORMALIZE_WORKERS', default=2, cast=int)
+PHOTO_MAX_DIMENSION = config('PHOTO_MAX_DIMENSION', default=2048, cast=int)
+PHOTO_OUTPUT_FORMAT = config('PHOTO_OUTPUT_FORMAT', default='WEBP')
+PHOTO_OUTPUT_QUALITY = config('PHOTO_OUTPUT_QUALITY', default=82, cast=int)
+# Also reuse the stored image of photos of the same point or user that only look
+# the same (same perceptual hash).
+PHOTO_PERCEPTUAL_DEDUP = config('PHOTO_PERCEPTUAL_DEDUP', default=False, cast=bool)
+
 # Email settings for Brevo
 EMAIL_BACKEND = "anymail.backends.sendinblue.EmailBackend"
 
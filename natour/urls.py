@@ -30,14 +30,16 @@ from .api.views.users import (get_my_info, delete_my_account, update_my_info,
                               get_user_points, get_my_points, update_my_password,
                               reset_user_password, get_user_details)
 
-from .api.views.photo import create_photo, update_photo, get_photo, delete_photo
+from .api.views.photo import (create_photo, update_photo, get_photo, delete_photo,
+                              get_photo_upload_status)
 
 from .api.views.terms import create_terms, get_terms, update_terms
 
 from .api.views.point import (create_point, get_point_info, get_all_points,
                               change_point_status, delete_point, delete_my_point,
                               add_view, edit_point, point_approval, show_points_on_map,
-                              search_point)
+                              show_points_in_bbox, show_point_clusters, search_point,
+                              search_nearby_points)
 
 from .api.views.review import add_review, get_user_reviews
 
@@ -104,9 +106,12 @@ urlpatterns = [
          add_view, name='add_view'),
     path('points/<int:point_id>/edit/', edit_point, name='edit_point'),
     path('points/map/', show_points_on_map, name='show_points_on_map'),
+    path('points/map/bbox/', show_points_in_bbox, name='show_points_in_bbox'),
+    path('points/map/clusters/', show_point_clusters, name='show_point_clusters'),
     path('points/<int:point_id>/approve/',
          point_approval, name='point_approval'),
     path('points/search/', search_point, name='search_point'),
+    path('points/search/nearby/', search_nearby_points, name='search_nearby_points'),
 
     # Terms and Conditions URLs
     path('terms/create/', create_terms, name='create_terms'),
@@ -130,4 +135,6 @@ urlpatterns = [
          update_photo, name='point-photo-update'),
     path('photos/', get_photo, name='photo-list'),
     path('photos/delete/', delete_photo, name='photo-delete'),
+    path('photos/<int:photo_id>/status/',
+         get_photo_upload_status, name='photo-upload-status'),
 ]
@@ -2,11 +2,21 @@
 Test cases for authentication functionality
 """
 # pylint: disable=no-member
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
 from django.urls import reverse
 from django.core.cache import cache
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from natour.api.methods.last_login import PENDING_LOGINS_KEY, flush_last_logins
 from natour.api.models import CustomUser, Role
+from natour.api.views.auth import MyTokenObtainPairSerializer
+from natour.api.utils.local_cache import local_cache
+from natour.api.utils.redis_buffers import flushing_key, get_redis
 
 
 class AuthTests(APITestCase):
@@ -82,6 +92,125 @@ class AuthTests(APITestCase):
         self.assertTrue('access' in response.data)
         self.assertTrue('refresh' in response.data)
 
+    def test_authenticated_user_cached_until_changed(self):
+        """
+        Ensure the authenticated user is served from the cache and dropped from
+        it when the user changes.
+        """
+        access = RefreshToken.for_user(self.test_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('get_refresh_token')
+
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+
+        CustomUser.objects.filter(id=self.test_user.id).update(is_active=False)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+
+        self.test_user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user.save()
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_authenticated_user_cached_without_password(self):
+        """
+        Ensure only the fields the authentication needs are cached, and that a
+        user served from the cache still works as the request user.
+        """
+        access = RefreshToken.for_user(self.test_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('get_refresh_token')
+        self.client.post(url)
+
+        cached = cache.get(f'auth_user:{self.test_user.id}')
+        self.assertEqual(set(cached), {'id', 'username', 'is_active', 'is_staff', 'role_id'})
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RefreshToken(response.data['refresh'])['email'], self.test_user.email)
+
+    def test_revocation_outlives_refresh_tokens(self):
+        """
+        Ensure access tokens minted from the refresh token of a deactivated
+        user are rejected for as long as that refresh token lives.
+        """
+        refresh = MyTokenObtainPairSerializer.get_token(self.test_user)
+
+        self.test_user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('show_points_in_bbox'), {
+            'min_lat': -1, 'min_lng': -1, 'max_lat': 1, 'max_lng': 1})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertGreaterEqual(cache.ttl(f'revoked_tokens:{self.test_user.id}'),
+                                timedelta(days=364).total_seconds())
+
+    def test_login_rehashes_outdated_password(self):
+        """
+        Ensure login upgrades a password hashed with an outdated hasher.
+        """
+        CustomUser.objects.filter(id=self.test_user.id).update(
+            password=make_password('Aa12345678!', hasher='pbkdf2_sha1'))
+
+        url = reverse('login')
+        data = {
+            "email": "vitorantunes2003@gmail.com",
+            "password": "Aa12345678!"
+        }
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.test_user.refresh_from_db()
+        self.assertTrue(self.test_user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.test_user.check_password('Aa12345678!'))
+
+    def test_token_obtain_uses_hashing_pool(self):
+        """
+        Ensure the token obtain view authenticates through the pooled backend.
+        """
+        url = reverse('token_obtain_pair')
+        response = self.client.post(url, {'username': 'testuser', 'password': 'Aa12345678!'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RefreshToken(response.data['refresh'])['role'], 'user')
+
+        response = self.client.post(url, {'username': 'testuser', 'password': 'wrong'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_last_login_written_behind(self):
+        """
+        Ensure login buffers last_login and the flush command stores it.
+        """
+        url = reverse('login')
+        data = {
+            "email": "vitorantunes2003@gmail.com",
+            "password": "Aa12345678!"
+        }
+        self.assertEqual(self.client.post(url, data, format='json').status_code,
+                         status.HTTP_200_OK)
+
+        self.test_user.refresh_from_db()
+        self.assertIsNone(self.test_user.last_login)
+
+        call_command('flush_last_logins', stdout=StringIO())
+        self.test_user.refresh_from_db()
+        self.assertIsNotNone(self.test_user.last_login)
+
+    def test_flush_last_logins_recovers_leftover_flush(self):
+        """
+        Ensure logins left by an interrupted flush are stored, even with no
+        new logins pending.
+        """
+        moment = datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+        get_redis().hset(flushing_key(PENDING_LOGINS_KEY), self.test_user.id, moment.isoformat())
+
+        self.assertEqual(flush_last_logins(), 1)
+        self.assertEqual(flush_last_logins(), 0)
+        self.test_user.refresh_from_db()
+        self.assertEqual(self.test_user.last_login, moment)
+
     def test_login_with_invalid_credentials(self):
         """
         Test login with invalid credentials.
@@ -140,4 +269,5 @@ class AuthTests(APITestCase):
         CustomUser.objects.all().delete()
         Role.objects.all().delete()
         cache.clear()
+        local_cache.clear()
         return super().tearDown()
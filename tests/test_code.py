@@ -2,11 +2,22 @@
 Test cases for verification code functionality
 """
 # pylint: disable=no-member
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import override_settings
+from django.template.loader import get_template
 from django.urls import reverse
 from django.core.cache import cache
+from django.utils import timezone
+from prometheus_client import REGISTRY
 from rest_framework import status
 from rest_framework.test import APITestCase
-from natour.api.models import CustomUser, Role
+from natour.api.models import CustomUser, Role, OutboundEmail, EmailStatus
+from natour.api.methods.email_outbox import MAX_ATTEMPTS, claim_due_emails, enqueue_email
+from natour.api.utils.email_templates import render_email
+from natour.api.utils.local_cache import local_cache
 
 
 class CodeTests(APITestCase):
@@ -46,6 +57,90 @@ class CodeTests(APITestCase):
             status.HTTP_500_INTERNAL_SERVER_ERROR
         ])
 
+    def test_verification_code_delivered_by_outbox(self):
+        """
+        Test that the code email is queued by the view and sent by the worker.
+        """
+        url = reverse('send_verification_code')
+        response = self.client.post(url, {'email': 'test@example.com', 'username': 'newuser'},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get(to=['test@example.com'])
+        self.assertIn(cache.get('verification_code:test@example.com'), queued.html_body)
+
+        call_command('send_outbound_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, EmailStatus.SENT)
+        self.assertEqual(queued.html_body, '')
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                       EMAIL_HOST='127.0.0.1', EMAIL_PORT=1, EMAIL_TIMEOUT=1)
+    def test_outbox_retries_and_dead_letters(self):
+        """
+        Test that failed deliveries are retried later and dead-lettered after
+        the last attempt.
+        """
+        email = OutboundEmail.objects.create(
+            subject='Natour', body='Teste', from_email='natourproject@gmail.com',
+            to=['test@example.com']
+        )
+
+        call_command('send_outbound_emails', stdout=StringIO())
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        OutboundEmail.objects.filter(id=email.id).update(
+            attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        call_command('send_outbound_emails', stdout=StringIO())
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.DEAD)
+        self.assertNotEqual(email.last_error, '')
+        self.assertEqual((email.body, email.html_body), ('', ''))
+
+    def test_outbox_reclaims_expired_leases(self):
+        """
+        Test that emails claimed by a worker are left alone during its lease
+        and sent by another worker once the lease expires.
+        """
+        email = enqueue_email('Natour', 'Teste', ['test@example.com'])
+        self.assertEqual(claim_due_emails(), [email])
+
+        call_command('send_outbound_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        OutboundEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        call_command('send_outbound_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.SENT)
+
+    def test_email_templates_compiled_once(self):
+        """
+        Test that email templates are compiled once, by the cached template
+        loader, and their renders timed.
+        """
+        self.assertIs(get_template('email_templates/validation_code.html').template,
+                      get_template('email_templates/validation_code.html').template)
+
+        labels = {'template': 'validation_code.html'}
+        before = REGISTRY.get_sample_value('natour_email_render_seconds_count', labels) or 0
+        html = render_email('validation_code.html',
+                            {'username': 'newuser', 'verification_code': '123456'})
+
+        self.assertIn('123456', html)
+        self.assertEqual(
+            REGISTRY.get_sample_value('natour_email_render_seconds_count', labels), before + 1)
+
     def test_send_verification_code_no_email(self):
         """
         Test sending verification code without email should fail.
@@ -137,4 +232,5 @@ class CodeTests(APITestCase):
         CustomUser.objects.all().delete()
         Role.objects.all().delete()
         cache.clear()
+        local_cache.clear()
         return super().tearDown()
@@ -0,0 +1,481 @@
+"""
+Test cases for photo upload functionality
+"""
+# pylint: disable=no-member
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from cloudinary import CloudinaryResource
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from natour.api.models import (CustomUser, PendingAssetDeletion, Photo, Point, Role,
+                               UploadStatus)
+from natour.api.utils.local_cache import local_cache
+from natour.api.utils.photo_storage import CloudinaryPhotoStorage
+
+
+class PhotoTests(APITestCase):
+    """
+    Test the photo views and the upload worker.
+    """
+
+    def setUp(self):
+        """
+        Set up test data and a local photo storage.
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.storage_dir = os.path.join(self.temp_dir, 'storage')
+        self.staging_dir = os.path.join(self.temp_dir, 'staging')
+        self.storage_settings = override_settings(
+            PHOTO_STORAGE_BACKEND='natour.api.utils.photo_storage.LocalPhotoStorage',
+            PHOTO_LOCAL_STORAGE_DIR=self.storage_dir,
+            PHOTO_STAGING_DIR=self.staging_dir,
+            PHOTO_NORMALIZE_WORKERS=0,
+        )
+        self.storage_settings.enable()
+
+        self.user_role, _created = Role.objects.get_or_create(
+            id=1,
+            defaults={'name': 'user'}
+        )
+
+        self.test_user = CustomUser.objects.create_user(
+            username='testuser',
+            email='user@example.com',
+            password='Aa12345678!',
+            role=self.user_role
+        )
+
+    def _create_point(self):
+        return Point.objects.create(
+            user=self.test_user, name='Test Point', description='Test description',
+            point_type='trail', latitude=-22.9068, longitude=-43.1729,
+            zip_code='22071-900', city='Rio de Janeiro', neighborhood='Copacabana',
+            state='Rio de Janeiro', street='Rua Test', number='123',
+            week_start='2025-01-01', week_end='2025-12-31',
+            open_time='08:00:00', close_time='18:00:00', is_active=True, status=True
+        )
+
+    def _upload_point_photos(self, amount):
+        point = self._create_point()
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('point-photo-upload', kwargs={'point_id': point.id})
+        for index in range(amount):
+            self.client.post(url, {'image': self._image((index * 50, 0, 0))}, format='multipart')
+        call_command('process_photo_uploads', stdout=StringIO())
+        return list(Photo.objects.filter(point=point).order_by('id'))
+
+    def _image(self, color='red', size=(64, 48), exif=None):
+        content = BytesIO()
+        Image.new('RGB', size, color).save(content, 'JPEG', exif=exif or Image.Exif())
+        return SimpleUploadedFile('photo.jpg', content.getvalue(), content_type='image/jpeg')
+
+    def _upload_user_photo(self):
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('user-photo-upload', kwargs={'user_id': self.test_user.id})
+        return self.client.post(url, {'image': self._image()}, format='multipart')
+
+    def _unavailable_storage(self):
+        broken_dir = os.path.join(self.temp_dir, 'not_a_directory')
+        with open(broken_dir, 'w', encoding='utf-8'):
+            pass
+        return override_settings(PHOTO_LOCAL_STORAGE_DIR=broken_dir)
+
+    def _stored_files(self):
+        if not os.path.isdir(self.storage_dir):
+            return []
+        return os.listdir(self.storage_dir)
+
+    def test_create_photo_uploaded_by_worker(self):
+        """
+        Test that a new photo is accepted at once and uploaded by the worker.
+        """
+        response = self._upload_user_photo()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['upload_status'], UploadStatus.PENDING)
+        photo = Photo.objects.get(id=response.data['id'])
+        self.assertTrue(os.path.exists(photo.staged_file))
+        self.assertEqual(self._stored_files(), [])
+
+        call_command('process_photo_uploads', stdout=StringIO())
+
+        status_url = reverse('photo-upload-status', kwargs={'photo_id': photo.id})
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['upload_status'], UploadStatus.READY)
+        self.assertIsNotNone(response.data['image_url'])
+        self.assertFalse(os.path.exists(photo.staged_file))
+        self.assertEqual(self._stored_files(), [f"{response.data['public_id']}.webp"])
+
+    def test_update_photo_replaces_image_after_upload(self):
+        """
+        Test that the previous image is kept until the new one is uploaded.
+        """
+        photo_id = self._upload_user_photo().data['id']
+        call_command('process_photo_uploads', stdout=StringIO())
+        old_public_id = Photo.objects.get(id=photo_id).public_id
+
+        url = reverse('user-photo-update',
+                      kwargs={'user_id': self.test_user.id, 'photo_id': photo_id})
+        response = self.client.put(url, {'image': self._image('blue')},
+                                   format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['public_id'], old_public_id)
+
+        call_command('process_photo_uploads', stdout=StringIO())
+
+        photo = Photo.objects.get(id=photo_id)
+        self.assertEqual(photo.upload_status, UploadStatus.READY)
+        self.assertNotEqual(photo.public_id, old_public_id)
+        self.assertEqual(self._stored_files(), [f'{photo.public_id}.webp'])
+
+    def test_uploaded_image_normalized(self):
+        """
+        Test that the worker stores a downsized WebP copy of the image, in its
+        process pool, without the EXIF metadata.
+        """
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        exif[0x0112] = 6
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('user-photo-upload', kwargs={'user_id': self.test_user.id})
+        response = self.client.post(
+            url, {'image': self._image(size=(3000, 1000), exif=exif)}, format='multipart')
+
+        with override_settings(PHOTO_NORMALIZE_WORKERS=1, PHOTO_MAX_DIMENSION=600):
+            call_command('process_photo_uploads', stdout=StringIO())
+
+        photo = Photo.objects.get(id=response.data['id'])
+        self.assertEqual(photo.upload_status, UploadStatus.READY)
+        with Image.open(os.path.join(self.storage_dir, f'{photo.public_id}.webp')) as image:
+            self.assertEqual(image.format, 'WEBP')
+            # Turned upright by the orientation tag, then downsized.
+            self.assertEqual(image.size, (200, 600))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+    def test_upload_rejects_non_images(self):
+        """
+        Test that files which are not images are refused by the views.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('user-photo-upload', kwargs={'user_id': self.test_user.id})
+        image = SimpleUploadedFile('photo.jpg', b'not-an-image', content_type='image/jpeg')
+        response = self.client.post(url, {'image': image}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Photo.objects.exists())
+
+    def test_undecodable_staged_image_fails_at_once(self):
+        """
+        Test that a staged image the worker can not decode is not retried.
+        """
+        photo_id = self._upload_user_photo().data['id']
+        staged_file = Photo.objects.get(id=photo_id).staged_file
+        with open(staged_file, 'wb') as staged:
+            staged.write(b'truncated')
+
+        call_command('process_photo_uploads', stdout=StringIO())
+
+        photo = Photo.objects.get(id=photo_id)
+        self.assertEqual(photo.upload_status, UploadStatus.FAILED)
+        self.assertEqual(photo.upload_attempts, 1)
+        self.assertFalse(os.path.exists(staged_file))
+
+    def test_failed_upload_is_retried(self):
+        """
+        Test that an upload failing in the storage stays pending for a retry.
+        """
+        photo_id = self._upload_user_photo().data['id']
+
+        with self._unavailable_storage():
+            call_command('process_photo_uploads', stdout=StringIO())
+
+        photo = Photo.objects.get(id=photo_id)
+        self.assertEqual(photo.upload_status, UploadStatus.PENDING)
+        self.assertEqual(photo.upload_attempts, 1)
+        self.assertNotEqual(photo.upload_error, '')
+
+        call_command('process_photo_uploads', stdout=StringIO())
+        self.assertEqual(Photo.objects.get(id=photo_id).upload_status, UploadStatus.READY)
+
+    def test_staged_image_discarded_with_photo(self):
+        """
+        Test that deleting a photo before its upload drops the staged image.
+        """
+        photo = Photo.objects.get(id=self._upload_user_photo().data['id'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.delete()
+
+        self.assertFalse(os.path.exists(photo.staged_file))
+
+    def test_point_photos_served_from_stored_urls(self):
+        """
+        Test that point photos are served from the URLs stored at upload time,
+        in the variant asked.
+        """
+        photo = self._upload_point_photos(1)[0]
+        self.assertEqual(photo.image_url, f'/local_photos/{photo.public_id}.webp')
+        self.assertEqual(set(photo.variants), {'thumbnail', 'card', 'full'})
+
+        Photo.objects.filter(id=photo.id).update(
+            image_url='https://img.example/full.jpg',
+            variants={'thumbnail': 'https://img.example/thumb.jpg'})
+        url = reverse('get_point_info', kwargs={'point_id': photo.point_id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['photos'][0]['url'], 'https://img.example/full.jpg')
+
+        response = self.client.get(url, {'photo_variant': 'thumbnail'})
+        self.assertEqual(response.data['photos'][0]['url'], 'https://img.example/thumb.jpg')
+
+        response = self.client.get(url, {'photo_variant': 'huge'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_photos_in_bulk(self):
+        """
+        Test that several photos and their images are deleted at once.
+        """
+        photos = self._upload_point_photos(3)
+
+        response = self.client.delete(
+            reverse('photo-delete'),
+            {'ids': [p.id for p in photos], 'public_ids': [p.public_id for p in photos]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [p.id for p in photos])
+        self.assertTrue(all(r['deleted'] for r in response.data['results']))
+        self.assertFalse(Photo.objects.exists())
+        self.assertEqual(self._stored_files(), [])
+        self.assertFalse(PendingAssetDeletion.objects.exists())
+
+    def test_delete_photos_keeps_failed_ones(self):
+        """
+        Test that photos whose image could not be deleted are kept and reported.
+        """
+        photos = self._upload_point_photos(2)
+
+        with self._unavailable_storage():
+            response = self.client.delete(
+                reverse('photo-delete'),
+                {'ids': [p.id for p in photos], 'public_ids': [p.public_id for p in photos]},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertFalse(any(r['deleted'] for r in response.data['results']))
+        self.assertEqual(Photo.objects.count(), 2)
+
+    def test_delete_photos_without_image(self):
+        """
+        Test that photos whose upload failed or is pending are deleted by id.
+        """
+        point = self._create_point()
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('point-photo-upload', kwargs={'point_id': point.id})
+        failed_id = self.client.post(url, {'image': self._image()}, format='multipart').data['id']
+        Photo.objects.filter(id=failed_id).update(upload_status=UploadStatus.FAILED)
+        pending_id = self.client.post(url, {'image': self._image()}, format='multipart').data['id']
+        staged_file = Photo.objects.get(id=pending_id).staged_file
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse('photo-delete'),
+                {'ids': [failed_id, pending_id], 'public_ids': ['', '']},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Photo.objects.exists())
+        self.assertFalse(os.path.exists(staged_file))
+
+        photo = self._upload_point_photos(1)[0]
+        response = self.client.delete(
+            reverse('photo-delete'), {'ids': [photo.id], 'public_ids': ['']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Photo.objects.filter(id=photo.id).exists())
+
+    def test_duplicate_photos_share_image(self):
+        """
+        Test that photos of the same image share one stored image, deleted
+        only with the last photo referring to it.
+        """
+        point = self._create_point()
+        other_point = self._create_point()
+        self.client.force_authenticate(user=self.test_user)
+        for target in (point, point, other_point):
+            url = reverse('point-photo-upload', kwargs={'point_id': target.id})
+            self.client.post(url, {'image': self._image()}, format='multipart')
+        call_command('process_photo_uploads', stdout=StringIO())
+
+        photos = list(Photo.objects.order_by('id'))
+        self.assertEqual({p.upload_status for p in photos}, {UploadStatus.READY})
+        self.assertEqual(len({p.content_hash for p in photos}), 1)
+        self.assertEqual(len({p.public_id for p in photos}), 1)
+        self.assertEqual(self._stored_files(), [f'{photos[0].public_id}.webp'])
+
+        # A later upload of the same image does not reach the storage either.
+        self.client.post(url, {'image': self._image()}, format='multipart')
+        with self._unavailable_storage():
+            call_command('process_photo_uploads', stdout=StringIO())
+        self.assertEqual(Photo.objects.filter(public_id=photos[0].public_id,
+                                              upload_status=UploadStatus.READY).count(), 4)
+
+        response = self.client.delete(
+            reverse('photo-delete'),
+            {'ids': [p.id for p in photos], 'public_ids': [p.public_id for p in photos]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self._stored_files()), 1)
+
+        remaining = Photo.objects.get()
+        remaining.point.delete()
+        call_command('collect_orphan_photos', stdout=StringIO())
+        self.assertEqual(self._stored_files(), [])
+
+    def test_photos_without_content_hash_not_shared(self):
+        """
+        Test that photos staged without a content hash are uploaded on their
+        own, instead of sharing each other's or an older photo's image.
+        """
+        legacy = self._upload_point_photos(1)[0]
+        Photo.objects.filter(id=legacy.id).update(content_hash='')
+        url = reverse('point-photo-upload', kwargs={'point_id': legacy.point_id})
+        for color in ('green', 'blue'):
+            self.client.post(url, {'image': self._image(color)}, format='multipart')
+        Photo.objects.exclude(id=legacy.id).update(content_hash='')
+
+        call_command('process_photo_uploads', stdout=StringIO())
+
+        photos = list(Photo.objects.order_by('id'))
+        self.assertEqual({p.upload_status for p in photos}, {UploadStatus.READY})
+        self.assertEqual(len({p.public_id for p in photos}), 3)
+        self.assertEqual(len(self._stored_files()), 3)
+
+    def test_perceptual_duplicates_share_image(self):
+        """
+        Test that, when enabled, photos of the same point that only look the
+        same share one stored image, unlike those of other points.
+        """
+        point = self._create_point()
+        other_point = self._create_point()
+        self.client.force_authenticate(user=self.test_user)
+        for target, size in ((point, (400, 300)), (point, (200, 150)), (other_point, (100, 75))):
+            url = reverse('point-photo-upload', kwargs={'point_id': target.id})
+            self.client.post(url, {'image': self._image(size=size)}, format='multipart')
+
+        with override_settings(PHOTO_PERCEPTUAL_DEDUP=True):
+            call_command('process_photo_uploads', stdout=StringIO())
+
+        photos = list(Photo.objects.order_by('id'))
+        self.assertEqual(len({p.content_hash for p in photos}), 3)
+        self.assertEqual(len({p.perceptual_hash for p in photos}), 1)
+        self.assertEqual(photos[0].public_id, photos[1].public_id)
+        self.assertNotEqual(photos[0].public_id, photos[2].public_id)
+        self.assertEqual(len(self._stored_files()), 2)
+
+    def test_cascaded_photos_collected(self):
+        """
+        Test that images of photos deleted with their point are deleted by
+        the garbage collector.
+        """
+        photo = self._upload_point_photos(1)[0]
+
+        photo.point.delete()
+        self.assertTrue(PendingAssetDeletion.objects.filter(public_id=photo.public_id).exists())
+
+        call_command('collect_orphan_photos', stdout=StringIO())
+
+        self.assertEqual(self._stored_files(), [])
+        self.assertFalse(PendingAssetDeletion.objects.exists())
+
+    def test_unreferenced_images_collected(self):
+        """
+        Test that old stored images no photo refers to are deleted, while
+        recent ones and referenced ones are kept.
+        """
+        photo = self._upload_point_photos(1)[0]
+        for name in ('old_orphan.jpg', 'new_orphan.jpg'):
+            with open(os.path.join(self.storage_dir, name), 'wb') as image:
+                image.write(b'image-bytes')
+        two_days_ago = time.time() - 2 * 24 * 3600
+        for name in ('old_orphan.jpg', f'{photo.public_id}.webp'):
+            os.utime(os.path.join(self.storage_dir, name), (two_days_ago, two_days_ago))
+
+        call_command('collect_orphan_photos', stdout=StringIO())
+        self.assertEqual(len(self._stored_files()), 3)
+
+        call_command('collect_orphan_photos', '--delete-orphans', '--dry-run', stdout=StringIO())
+        self.assertEqual(len(self._stored_files()), 3)
+
+        call_command('collect_orphan_photos', '--delete-orphans', '--page-size', '1',
+                     stdout=StringIO())
+
+        self.assertEqual(sorted(self._stored_files()),
+                         sorted(['new_orphan.jpg', f'{photo.public_id}.webp']))
+
+    def test_admin_saved_photo_kept_by_collector(self):
+        """
+        Test that a photo saved with an image but no public_id, as the admin
+        does, still protects its image from the garbage collector.
+        """
+        os.makedirs(self.storage_dir)
+        with open(os.path.join(self.storage_dir, 'admin_image.jpg'), 'wb') as image:
+            image.write(b'image-bytes')
+        two_days_ago = time.time() - 2 * 24 * 3600
+        os.utime(os.path.join(self.storage_dir, 'admin_image.jpg'), (two_days_ago, two_days_ago))
+
+        photo = Photo(point=self._create_point(),
+                      image=CloudinaryResource(public_id='admin_image', format='jpg'))
+        photo.save()
+        self.assertEqual(Photo.objects.get(id=photo.id).public_id, 'admin_image')
+
+        call_command('collect_orphan_photos', '--delete-orphans', stdout=StringIO())
+        self.assertEqual(self._stored_files(), ['admin_image.jpg'])
+
+    @override_settings(PHOTO_STORAGE_FOLDER='natour/photos')
+    def test_cloudinary_storage_scoped_to_folder(self):
+        """
+        Test that Cloudinary uploads go to, and the listing only covers, the
+        photo folder.
+        """
+        storage = CloudinaryPhotoStorage()
+        page = {'resources': [{'public_id': 'natour/photos/abc',
+                               'created_at': '2025-01-01T00:00:00Z'}]}
+        with patch('natour.api.utils.photo_storage.uploader.upload_resource') as upload, \
+                patch('natour.api.utils.photo_storage.api.resources',
+                      return_value=page) as resources:
+            storage.upload('photo.webp')
+            pages = list(storage.list_assets(10))
+
+        self.assertEqual(upload.call_args.kwargs['folder'], 'natour/photos')
+        self.assertEqual(resources.call_args.kwargs['prefix'], 'natour/photos/')
+        self.assertEqual([public_id for public_id, _created in pages[0]], ['natour/photos/abc'])
+
+    def tearDown(self):
+        """
+        Clean up after tests.
+        """
+        CustomUser.objects.all().delete()
+        Role.objects.all().delete()
+        cache.clear()
+        local_cache.clear()
+        self.storage_settings.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        return super().tearDown()
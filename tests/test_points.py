@@ -2,10 +2,21 @@
 Test cases for point management functionality
 """
 # pylint: disable=no-member
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
-from natour.api.models import CustomUser, Role, Point
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from natour.api.models import CustomUser, Role, Point, PointCluster
+from natour.api.methods.view_counter import PENDING_VIEWS_KEY, flush_views
+from natour.api.views.auth import MyTokenObtainPairSerializer
+from natour.api.utils.local_cache import local_cache
+from natour.api.utils.redis_buffers import flushing_key, get_redis
+from natour.api.utils.response_cache import response_cache_key, MAP_NAMESPACE
 
 
 class PointTests(APITestCase):
@@ -132,6 +143,48 @@ class PointTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_all_points_with_cursor(self):
+        """
+        Test walking all points with cursor pagination.
+        """
+        for name in ('Alpha Point', 'Beta Point'):
+            Point.objects.create(
+                user=self.test_user, name=name, description='Another point',
+                point_type='park', week_start='monday', week_end='sunday',
+                open_time='08:00:00', close_time='18:00:00'
+            )
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_points')
+        response = self.client.get(url, {'cursor': '', 'page_size': 2, 'count': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([p['name'] for p in response.data['results']],
+                         ['Alpha Point', 'Beta Point'])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual([p['name'] for p in response.data['results']], ['Test Point'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'])
+
+        self.assertEqual([p['name'] for p in response.data['results']],
+                         ['Alpha Point', 'Beta Point'])
+
+    def test_get_all_points_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected.
+        """
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_points')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_point_approval_as_admin(self):
         """
         Test approving a point as admin.
@@ -243,10 +296,75 @@ class PointTests(APITestCase):
         response = self.client.put(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['views'], initial_views + 1)
+
+        call_command('flush_point_views', stdout=StringIO())
 
         self.test_point.refresh_from_db()
         self.assertEqual(self.test_point.views, initial_views + 1)
 
+    def test_flush_views_skipped_while_another_flush_runs(self):
+        """
+        Test that a flush does not apply the views another flush is applying.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        self.client.put(reverse('add_view', kwargs={'point_id': self.test_point.id}))
+
+        lock = get_redis().lock(f'{PENDING_VIEWS_KEY}:lock', timeout=60)
+        lock.acquire()
+        try:
+            self.assertEqual(flush_views(), (0, 0))
+        finally:
+            lock.release()
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.views, 0)
+
+        self.assertEqual(flush_views(), (1, 1))
+        self.assertEqual(flush_views(), (0, 0))
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.views, 1)
+
+    def test_flush_views_recovers_leftover_flush(self):
+        """
+        Test that views left by an interrupted flush are flushed, even with
+        no new views pending.
+        """
+        get_redis().hset(flushing_key(PENDING_VIEWS_KEY), self.test_point.id, 3)
+
+        self.assertEqual(flush_views(), (1, 3))
+        self.assertEqual(flush_views(), (0, 0))
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.views, 3)
+
+    def test_add_view_merges_pending_views(self):
+        """
+        Test that buffered views are visible before being flushed.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('add_view', kwargs={'point_id': self.test_point.id})
+        self.client.put(url)
+        response = self.client.put(url)
+        self.assertEqual(response.data['views'], 2)
+
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.views, 0)
+
+        url = reverse('get_point_info', kwargs={'point_id': self.test_point.id})
+        response = self.client.get(url)
+        self.assertEqual(response.data['views'], 2)
+
+    def test_add_view_nonexistent_point(self):
+        """
+        Test incrementing the view count of a missing point.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('add_view', kwargs={'point_id': 99999})
+        response = self.client.put(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_show_points_on_map(self):
         """
         Test getting points for map display.
@@ -260,6 +378,78 @@ class PointTests(APITestCase):
         self.assertIsInstance(response.data, list)
         self.assertGreater(len(response.data), 0)
 
+    def test_map_cache_invalidated_by_point_changes(self):
+        """
+        Test that cached map responses are served until a point changes.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('show_points_on_map')
+
+        self.assertEqual(len(self.client.get(url).data), 1)
+
+        Point.objects.filter(id=self.test_point.id).update(name='Renamed Point')
+        self.assertEqual(self.client.get(url).data[0]['name'], 'Test Point')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse('change_point_status', kwargs={'point_id': self.test_point.id}),
+                {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_map_cache_serves_stale_while_rebuilding(self):
+        """
+        Test that an expired entry is served while another worker rebuilds it.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('show_points_on_map')
+        self.client.get(url)
+
+        key = response_cache_key(MAP_NAMESPACE, Request(APIRequestFactory().get(url)))
+        generation, _fresh_until, data, status_code = cache.get(key)
+        cache.set(key, (generation, 0, data, status_code))
+        local_cache.delete(key)
+        Point.objects.filter(id=self.test_point.id).update(name='Renamed Point')
+
+        lock = cache.lock(f'{key}:lock', timeout=30)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertEqual(self.client.get(url).data[0]['name'], 'Test Point')
+        lock.release()
+
+        self.assertEqual(self.client.get(url).data[0]['name'], 'Renamed Point')
+
+    def test_map_authorized_from_token_claims(self):
+        """
+        Test that the map authorizes tokens from their claims, without
+        queries, until the user is deactivated.
+        """
+        access = MyTokenObtainPairSerializer.get_token(self.test_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('show_points_on_map')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.test_user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_map_requires_authentication(self):
+        """
+        Test that a cached map response is not served to anonymous users.
+        """
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('show_points_on_map')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_change_point_status(self):
         """
         Test changing point status (user deactivating their own point).
@@ -279,6 +469,170 @@ class PointTests(APITestCase):
         self.test_point.refresh_from_db()
         self.assertFalse(self.test_point.is_active)
 
+    def test_show_points_in_bbox(self):
+        """
+        Test getting only the points inside a map viewport.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('show_points_in_bbox')
+        response = self.client.get(url, {
+            'min_lat': -23.5, 'min_lng': -43.5, 'max_lat': -22.5, 'max_lng': -43.0
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.test_point.id])
+
+        response = self.client.get(url, {
+            'min_lat': -24.0, 'min_lng': -47.0, 'max_lat': -23.0, 'max_lng': -46.0
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_show_points_in_bbox_zoomed_out(self):
+        """
+        Test that tall viewports are resolved with the coarse grid and that
+        the amount of points returned is capped.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('show_points_in_bbox')
+        bbox = {'min_lat': -35.0, 'min_lng': -50.0, 'max_lat': -5.0, 'max_lng': -40.0}
+        response = self.client.get(url, bbox)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.test_point.id])
+        self.assertEqual(set(response.data[0]),
+                         {'id', 'name', 'point_type', 'latitude', 'longitude'})
+        self.assertEqual(response['X-Result-Truncated'], 'false')
+
+        with patch('natour.api.views.point.MAX_BBOX_POINTS', 0):
+            response = self.client.get(url, bbox)
+        self.assertEqual(response.data, [])
+        self.assertEqual(response['X-Result-Truncated'], 'true')
+
+    def test_show_points_in_bbox_invalid(self):
+        """
+        Test that an incomplete or inverted bounding box is rejected.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('show_points_in_bbox')
+        response = self.client.get(url, {'min_lat': -23.5, 'min_lng': -43.5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {
+            'min_lat': -22.0, 'min_lng': -43.5, 'max_lat': -23.0, 'max_lng': -43.0
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_show_point_clusters(self):
+        """
+        Test getting the map clusters of a zoom level.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('show_point_clusters')
+        response = self.client.get(url, {'zoom': 4})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['count'], 1)
+        self.assertEqual(response.data[0]['point_type'], 'trail')
+        self.assertAlmostEqual(response.data[0]['latitude'], -22.9068)
+
+    def test_point_clusters_follow_point_changes(self):
+        """
+        Test that clusters are updated when points are approved, moved or deleted.
+        """
+        hidden_point = Point.objects.create(
+            user=self.test_user, name='Hidden Point', description='Pending approval',
+            point_type='trail', latitude=-22.9, longitude=-43.2,
+            week_start='monday', week_end='sunday',
+            open_time='08:00:00', close_time='18:00:00'
+        )
+        self.assertEqual(PointCluster.objects.get(zoom=4).count, 1)
+
+        hidden_point.is_active = True
+        hidden_point.status = True
+        hidden_point.save()
+        self.assertEqual(PointCluster.objects.get(zoom=4).count, 2)
+
+        hidden_point.latitude = 10.0
+        hidden_point.save()
+        self.assertEqual(PointCluster.objects.filter(zoom=4).count(), 2)
+
+        hidden_point.delete()
+        self.test_user.delete()
+        self.assertFalse(PointCluster.objects.exists())
+
+    def test_search_nearby_points(self):
+        """
+        Test searching points near a coordinate by radius and k-nearest.
+        """
+        far_point = Point.objects.create(
+            user=self.test_user, name='Far Point', description='Far away',
+            point_type='park', latitude=-22.5, longitude=-43.1,
+            week_start='monday', week_end='sunday',
+            open_time='00:00:00', close_time='23:59:59',
+            is_active=True, status=True
+        )
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('search_nearby_points')
+        response = self.client.get(url, {'lat': -22.91, 'lng': -43.17, 'radius': 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.test_point.id])
+        self.assertLess(response.data[0]['distance_km'], 1)
+
+        response = self.client.get(url, {'lat': -22.91, 'lng': -43.17, 'k': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data],
+                         [self.test_point.id, far_point.id])
+
+        response = self.client.get(url, {'lat': -22.91, 'lng': -43.17, 'k': 2,
+                                         'point_type': 'park'})
+
+        self.assertEqual([p['id'] for p in response.data], [far_point.id])
+
+    def test_search_nearby_points_skips_vanished_points(self):
+        """
+        Test that points deleted or hidden after the nearby search are left
+        out of the results.
+        """
+        hidden_point = Point.objects.create(
+            user=self.test_user, name='Hidden Point', description='Hidden',
+            point_type='park', latitude=-22.9, longitude=-43.17,
+            week_start='monday', week_end='sunday',
+            open_time='00:00:00', close_time='23:59:59',
+            is_active=True, status=False
+        )
+        self.client.force_authenticate(user=self.test_user)
+
+        nearest = [(self.test_point.id, 0.5), (hidden_point.id, 0.7), (999999, 1.0)]
+        with patch('natour.api.views.point.find_nearby', return_value=nearest):
+            response = self.client.get(reverse('search_nearby_points'),
+                                       {'lat': -22.91, 'lng': -43.17, 'k': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.test_point.id])
+
+    def test_search_nearby_points_invalid(self):
+        """
+        Test that nearby search rejects missing coordinates and invalid limits.
+        """
+        self.client.force_authenticate(user=self.test_user)
+
+        url = reverse('search_nearby_points')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'lat': -22.91, 'lng': -43.17, 'radius': 1000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'lat': -22.91, 'lng': -43.17, 'point_type': 'beach'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def tearDown(self):
         """
         Clean up after tests.
@@ -286,4 +640,6 @@ class PointTests(APITestCase):
         CustomUser.objects.all().delete()
         Role.objects.all().delete()
         Point.objects.all().delete()
+        cache.clear()
+        local_cache.clear()
         return super().tearDown()
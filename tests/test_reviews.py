@@ -2,9 +2,14 @@
 Test cases for review functionality
 """
 # pylint: disable=no-member
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Value
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from natour.api.methods.ratings import average_rating
 from natour.api.models import CustomUser, Role, Point, PointReview
 
 
@@ -169,6 +174,77 @@ class ReviewTests(APITestCase):
 
         self.test_point.refresh_from_db()
         self.assertEqual(self.test_point.avg_rating, 3.0)
+        self.assertEqual(self.test_point.rating_sum, 6)
+        self.assertEqual(self.test_point.rating_count, 2)
+        self.assertEqual((self.test_point.rating_2, self.test_point.rating_4), (1, 1))
+
+    def test_rebuild_rating_aggregates(self):
+        """
+        Test that the rebuild command recomputes aggregates from the reviews.
+        """
+        PointReview.objects.create(user=self.test_user, point=self.test_point, rating=5)
+        PointReview.objects.create(user=self.other_user, point=self.test_point, rating=2)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.rating_count, 2)
+        self.assertEqual(self.test_point.rating_sum, 7)
+        self.assertEqual((self.test_point.rating_2, self.test_point.rating_5), (1, 1))
+        self.assertEqual(self.test_point.avg_rating, 4)
+
+    def test_rebuild_rounds_like_new_reviews(self):
+        """
+        Test that the rebuild rounds a tied average like adding reviews does.
+        """
+        url = reverse('add_review', kwargs={'point_id': self.test_point.id})
+        for user, rating in ((self.test_user, 3), (self.other_user, 2)):
+            self.client.force_authenticate(user=user)
+            self.client.post(url, {'rating': rating}, format='json')
+
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.avg_rating, 3)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.avg_rating, 3)
+
+        # 1.5 -> 2 and 2.4 -> 2, whatever the database rounds floats like.
+        for total, amount, expected in ((3, 2, 2), (12, 5, 2), (23, 5, 5)):
+            Point.objects.filter(id=self.test_point.id).update(
+                avg_rating=average_rating(Value(total), Value(amount)))
+            self.test_point.refresh_from_db()
+            self.assertEqual(self.test_point.avg_rating, expected)
+
+    def test_deleted_users_reviews_leave_the_ratings(self):
+        """
+        Test that the reviews of a deleted user are removed from the rating
+        aggregates of the point.
+        """
+        third_user = CustomUser.objects.create_user(
+            username='thirduser', email='third@example.com',
+            password='Aa12345678!', role=self.user_role)
+        url = reverse('add_review', kwargs={'point_id': self.test_point.id})
+        for user, rating in ((self.other_user, 5), (third_user, 2)):
+            self.client.force_authenticate(user=user)
+            self.client.post(url, {'rating': rating}, format='json')
+        self.test_point.refresh_from_db()
+        self.assertEqual(self.test_point.avg_rating, 4)
+
+        self.other_user.delete()
+
+        self.test_point.refresh_from_db()
+        self.assertEqual((self.test_point.rating_sum, self.test_point.rating_count), (2, 1))
+        self.assertEqual((self.test_point.rating_5, self.test_point.rating_2), (0, 1))
+        self.assertEqual(self.test_point.avg_rating, 2)
+
+        third_user.delete()
+
+        self.test_point.refresh_from_db()
+        self.assertEqual((self.test_point.rating_sum, self.test_point.rating_count), (0, 0))
+        self.assertEqual(self.test_point.rating_2, 0)
+        self.assertEqual(self.test_point.avg_rating, 0)
 
     def test_add_review_empty_comment(self):
         """
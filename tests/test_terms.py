@@ -2,11 +2,59 @@
 Test cases for terms functionality
 """
 # pylint: disable=no-member
+import smtplib
+import time
+from io import StringIO
+
+from anymail.exceptions import AnymailRecipientsRefused, AnymailRequestsAPIError
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from requests import Response
 from rest_framework import status
 from rest_framework.test import APITestCase
-from natour.api.models import CustomUser, Role, Terms
+from natour.api.models import (CustomUser, Role, Terms, MailingJob, MailingStatus,
+                               OutboundEmail)
+from natour.api.utils.local_cache import (local_cache, tiered_get, tiered_set,
+                                          wait_until_subscribed)
+from natour.api.utils.redis_buffers import get_redis
+
+
+def api_error(status_code):
+    """
+    Returns the error anymail raises for a Brevo API response of status_code.
+    """
+    response = Response()
+    response.status_code = status_code
+    response.reason = 'Error'
+    response._content = b'{"code": "invalid_parameter"}'  # pylint: disable=protected-access
+    return AnymailRequestsAPIError('Brevo API error', response=response)
+
+
+class RefusingEmailBackend(EmailBackend):
+    """
+    In-memory email backend that fails like the real ones for some addresses:
+    'refused@' ones are rejected by the Brevo API, 'invalid@' ones get a 400
+    from it, 'smtp@' ones are refused by an SMTP server and 'locked@' ones
+    get a 401 (a broken account, not a bad email).
+    """
+    ERRORS = {
+        'refused@': AnymailRecipientsRefused,
+        'invalid@': lambda: api_error(400),
+        'smtp@': lambda: smtplib.SMTPRecipientsRefused({'smtp@': (550, b'No such user')}),
+        'locked@': lambda: api_error(401),
+    }
+
+    def send_messages(self, messages):
+        for message in messages:
+            for address in message.to:
+                for prefix, error in self.ERRORS.items():
+                    if address.startswith(prefix):
+                        raise error()
+        return super().send_messages(messages)
 
 
 class TermsTests(APITestCase):
@@ -156,6 +204,124 @@ class TermsTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['content'], "New content")
 
+    def test_update_terms_mailing(self):
+        """
+        Ensure that updating terms starts a mailing to the active users, sent
+        by the worker.
+        """
+        inactive = CustomUser.objects.create_user(
+            username='inactive_user', email='inactive@gmail.com',
+            password='Aa12345678!', role=self.user_role, is_active=False
+        )
+        self.client.force_authenticate(user=self.test_master_user)
+        terms = Terms.objects.create(content="Old content")
+        self.client.put(reverse('update_terms', kwargs={'term_id': terms.id}),
+                        {"content": "New content"}, format='json')
+
+        job = MailingJob.objects.get()
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('run_mailing_jobs', '--chunk-size', '1', stdout=StringIO())
+
+        recipients = sorted(msg.to[0] for msg in mail.outbox)
+        self.assertEqual(recipients, ['natourmaster@gmail.com', 'user@gmail.com'])
+        self.assertNotIn(inactive.email, recipients)
+        html = {msg.to[0]: msg.alternatives[0][0] for msg in mail.outbox}
+        self.assertIn('Olá, test_user!', html['user@gmail.com'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, MailingStatus.DONE)
+        self.assertEqual(job.sent, 2)
+
+    def test_mailing_resumes_from_checkpoint(self):
+        """
+        Ensure that an interrupted mailing only sends to the users after its
+        checkpoint.
+        """
+        first_id = min(self.test_user.id, self.test_master_user.id)
+        MailingJob.objects.create(kind='updated_terms', last_user_id=first_id, sent=1)
+
+        call_command('run_mailing_jobs', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            mail.outbox[0].to,
+            [CustomUser.objects.get(id=max(self.test_user.id, self.test_master_user.id)).email])
+        self.assertEqual(MailingJob.objects.get().sent, 2)
+
+    @override_settings(EMAIL_BACKEND='tests.test_terms.RefusingEmailBackend')
+    def test_mailing_skips_refused_recipients(self):
+        """
+        Ensure that an address refused by the mail server does not stop the
+        mailing and is handed to the outbox.
+        """
+        self.test_user.email = 'refused@gmail.com'
+        self.test_user.save()
+        for prefix in ('invalid', 'smtp'):
+            CustomUser.objects.create_user(
+                username=f'{prefix}_user', email=f'{prefix}@gmail.com',
+                password='Aa12345678!', role=self.user_role)
+        job = MailingJob.objects.create(kind='updated_terms')
+
+        call_command('run_mailing_jobs', '--chunk-size', '1', stdout=StringIO())
+
+        self.assertEqual([msg.to for msg in mail.outbox], [['natourmaster@gmail.com']])
+        job.refresh_from_db()
+        self.assertEqual(job.status, MailingStatus.DONE)
+        self.assertEqual(job.attempts, 0)
+        self.assertEqual(
+            sorted(address for email in OutboundEmail.objects.all() for address in email.to),
+            ['invalid@gmail.com', 'refused@gmail.com', 'smtp@gmail.com'])
+
+    @override_settings(EMAIL_BACKEND='tests.test_terms.RefusingEmailBackend')
+    def test_mailing_stops_on_account_errors(self):
+        """
+        Ensure that an API error that is not about the email stops the
+        mailing, to be resumed from the same user.
+        """
+        self.test_user.email = 'locked@gmail.com'
+        self.test_user.save()
+        job = MailingJob.objects.create(kind='updated_terms')
+
+        call_command('run_mailing_jobs', '--chunk-size', '1', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.status, MailingStatus.PENDING)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_get_terms_cache_invalidated_by_update(self):
+        """
+        Ensure that cached terms are served until the terms change.
+        """
+        terms = Terms.objects.create(content="Old content")
+        url = reverse('get_terms', kwargs={'term_id': terms.id})
+        self.client.get(url, format='json')
+
+        Terms.objects.filter(id=terms.id).update(content="Silent change")
+        self.assertEqual(self.client.get(url, format='json').data['content'], "Old content")
+
+        terms.content = "New content"
+        with self.captureOnCommitCallbacks(execute=True):
+            terms.save()
+        self.assertEqual(self.client.get(url, format='json').data['content'], "New content")
+
+    def test_local_cache_dropped_by_other_workers(self):
+        """
+        Ensure that an invalidation published by another worker drops the
+        value from the local tier.
+        """
+        self.assertTrue(wait_until_subscribed(timeout=5))
+        tiered_set('terms_test_key', 'cached', timeout=60)
+        cache.delete('terms_test_key')
+        self.assertEqual(tiered_get('terms_test_key'), 'cached')
+
+        get_redis().publish('local_cache:invalidate', 'terms_test_key')
+        for _attempt in range(50):
+            if local_cache.get('terms_test_key') is None:
+                break
+            time.sleep(0.05)
+        self.assertIsNone(tiered_get('terms_test_key'))
+
     def test_update_terms_unauthorized(self):
         """
         Ensure that only authorized master users can update terms.
@@ -177,4 +343,6 @@ class TermsTests(APITestCase):
         """
         Terms.objects.all().delete()
         Role.objects.all().delete()
+        cache.clear()
+        local_cache.clear()
         return super().tearDown()
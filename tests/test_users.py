@@ -2,11 +2,15 @@
 Test cases for user management functionality
 """
 # pylint: disable=no-member
+from io import StringIO
+
+from django.core.management import call_command
 from django.urls import reverse
 from django.core.cache import cache
 from rest_framework import status
 from rest_framework.test import APITestCase
 from natour.api.models import CustomUser, Role, Point
+from natour.api.utils.local_cache import local_cache
 
 
 class UsersTests(APITestCase):
@@ -85,6 +89,43 @@ class UsersTests(APITestCase):
         self.assertEqual(response.data['username'], 'testuser')
         self.assertEqual(response.data['email'], 'user@example.com')
 
+    def test_get_my_info_cached_per_user(self):
+        """
+        Test that cached profiles are never shared between users and are
+        invalidated when the user changes.
+        """
+        url = reverse('get_my_info')
+        self.client.force_authenticate(user=self.test_user)
+        self.client.get(url)
+
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(url).data['username'], 'otheruser')
+
+        self.client.force_authenticate(user=self.test_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse('update_my_info'), {'username': 'updateduser'},
+                            format='json')
+        self.assertEqual(self.client.get(url).data['username'], 'updateduser')
+
+    def test_get_all_users_shared_between_admins(self):
+        """
+        Test that the users listing cached for an admin is served to the other
+        admins, whatever their tokens.
+        """
+        other_admin = CustomUser.objects.create_user(
+            username='otheradmin', email='otheradmin@example.com',
+            password='Aa12345678!', role=self.master_role, is_staff=True
+        )
+        url = reverse('get_all_users')
+        self.client.force_authenticate(user=self.master_user)
+        self.client.get(url, {'page': 1})
+
+        CustomUser.objects.filter(id=self.other_user.id).update(username='silentchange')
+
+        self.client.force_authenticate(user=other_admin)
+        usernames = [u['username'] for u in self.client.get(url, {'page': 1}).data['results']]
+        self.assertIn('otheruser', usernames)
+
     def test_get_my_info_unauthenticated(self):
         """
         Test getting user info without authentication should fail.
@@ -139,6 +180,100 @@ class UsersTests(APITestCase):
         self.assertIn('results', response.data)
         self.assertIn('total_users', response.data)
 
+    def test_get_all_users_total_follows_creations(self):
+        """
+        Test that the cached users total is invalidated when a user is created.
+        """
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_users')
+        response = self.client.get(url, {'page': 1})
+        total = response.data['total_users']
+        self.assertEqual(response.data['count'], total)
+        self.assertFalse(response.data['count_estimated'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create_user(
+                username='newuser',
+                email='new@example.com',
+                password='Aa12345678!',
+                role=self.user_role
+            )
+
+        response = self.client.get(url, {'page': 1})
+        self.assertEqual(response.data['total_users'], total + 1)
+
+    def test_get_all_users_total_follows_role_changes(self):
+        """
+        Test that the cached users total, which leaves admins out, is
+        invalidated when a user becomes an admin.
+        """
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_users')
+        total = self.client.get(url, {'page': 1}).data['total_users']
+
+        self.other_user.role = self.master_role
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_user.save()
+
+        self.assertEqual(self.client.get(url, {'page': 1}).data['total_users'], total - 1)
+
+    def test_points_count_follows_points(self):
+        """
+        Test that the denormalized points_count follows point creation and deletion.
+        """
+        self.test_user.refresh_from_db()
+        self.assertEqual(self.test_user.points_count, 1)
+
+        self.test_point.delete()
+        self.test_user.refresh_from_db()
+        self.assertEqual(self.test_user.points_count, 0)
+
+    def test_get_all_users_ordered_by_points_count(self):
+        """
+        Test sorting and filtering the users listing on points_count.
+        """
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_users')
+        response = self.client.get(url, {'page': 1, 'ordering': '-points_count'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], self.test_user.id)
+        self.assertEqual(response.data['results'][0]['points'], 1)
+
+        response = self.client.get(url, {'page': 1, 'min_points': 1})
+        self.assertEqual([u['id'] for u in response.data['results']], [self.test_user.id])
+
+        response = self.client.get(url, {'page': 1, 'ordering': 'email'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconcile_points_count(self):
+        """
+        Test that the reconciliation command fixes a drifted points_count.
+        """
+        CustomUser.objects.filter(id=self.test_user.id).update(points_count=7)
+
+        call_command('reconcile_points_count', stdout=StringIO())
+
+        self.test_user.refresh_from_db()
+        self.assertEqual(self.test_user.points_count, 1)
+
+    def test_get_all_users_with_cursor(self):
+        """
+        Test getting all users with cursor pagination.
+        """
+        self.client.force_authenticate(user=self.master_user)
+
+        url = reverse('get_all_users')
+        response = self.client.get(url, {'cursor': ''})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('results', response.data)
+        self.assertIn('next', response.data)
+        self.assertNotIn('count', response.data)
+
     def test_get_all_users_without_page_param(self):
         """
         Test getting all users without page parameter should fail.
@@ -243,4 +378,5 @@ class UsersTests(APITestCase):
         CustomUser.objects.all().delete()
         Role.objects.all().delete()
         cache.clear()
+        local_cache.clear()
         return super().tearDown()